@@ -0,0 +1,350 @@
+import json
+import os
+from datetime import datetime
+
+from config import Config, logger
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+# Numeric features summarized with moments and quantile sketches
+NUMERIC_FEATURES = [
+    feature for feature in Config.EXPECTED_FEATURES if not feature.startswith("ocean_proximity_")
+]
+CATEGORY_PREFIX = "ocean_proximity_"
+PSI_EPSILON = 1e-4
+
+
+class RunningMoments:
+    """
+    Count, mean, variance, min and max of a stream, mergeable across chunks
+    (Chan et al. parallel variance).
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values):
+            mean = float(values.mean())
+            self._combine(
+                len(values),
+                mean,
+                float(((values - mean) ** 2).sum()),
+                float(values.min()),
+                float(values.max()),
+            )
+
+    def merge(self, other: "RunningMoments"):
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningMoments":
+        return cls(data["count"], data["mean"], data["m2"], data["min"], data["max"])
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (merging t-digest with the k1 scale function).
+
+    Points are sorted and grouped so that every centroid covers at most one
+    unit of k(q) = compression / (2 pi) * asin(2q - 1), which keeps centroids
+    small in the tails and the sketch size bounded by `compression`.
+    """
+
+    def __init__(self, compression: float = 200, means=None, weights=None, minimum=None, maximum=None):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        quantiles = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * quantiles - 1, -1, 1))
+        buckets = np.floor(k).astype(np.int64)
+        buckets -= buckets.min()
+
+        bucket_weights = np.bincount(buckets, weights=weights)
+        bucket_sums = np.bincount(buckets, weights=weights * means)
+        non_empty = bucket_weights > 0
+        self.weights = bucket_weights[non_empty]
+        self.means = bucket_sums[non_empty] / self.weights
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.min = float(values.min()) if self.min is None else min(self.min, float(values.min()))
+        self.max = float(values.max()) if self.max is None else max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other: "TDigest"):
+        if not len(other.weights):
+            return
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _knots(self):
+        centers = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0.0], centers, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return ranks, values
+
+    def quantile(self, q):
+        ranks, values = self._knots()
+        return np.interp(np.asarray(q) * self.count, ranks, values)
+
+    def cdf(self, x):
+        ranks, values = self._knots()
+        return np.interp(x, values, ranks) / self.count
+
+    def to_dict(self) -> dict:
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        return cls(data["compression"], data["means"], data["weights"], data["min"], data["max"])
+
+
+class DriftProfile:
+    """
+    Streaming summary of a dataset: moments and a t-digest per numeric feature,
+    `ocean_proximity` category counts and, optionally, a prediction sketch.
+    Profiles of different chunks or uploads can be merged.
+    """
+
+    def __init__(self):
+        self.moments = {feature: RunningMoments() for feature in NUMERIC_FEATURES}
+        self.digests = {feature: TDigest() for feature in NUMERIC_FEATURES}
+        self.categories = {}
+        self.prediction_moments = RunningMoments()
+        self.prediction_digest = TDigest()
+
+    @property
+    def count(self) -> int:
+        return next(iter(self.moments.values())).count
+
+    def update(self, X):
+        """
+        Add a chunk of preprocessed features (Config.EXPECTED_FEATURES columns).
+        """
+        for feature in NUMERIC_FEATURES:
+            values = X[feature].to_numpy(dtype=np.float64)
+            self.moments[feature].update(values)
+            self.digests[feature].update(values)
+        for column in X.columns:
+            if column.startswith(CATEGORY_PREFIX):
+                category = column[len(CATEGORY_PREFIX) :]
+                self.categories[category] = self.categories.get(category, 0) + int(
+                    X[column].astype(bool).sum()
+                )
+
+    def update_predictions(self, predictions):
+        self.prediction_moments.update(predictions)
+        self.prediction_digest.update(predictions)
+
+    def merge(self, other: "DriftProfile"):
+        for feature in NUMERIC_FEATURES:
+            self.moments[feature].merge(other.moments[feature])
+            self.digests[feature].merge(other.digests[feature])
+        for category, count in other.categories.items():
+            self.categories[category] = self.categories.get(category, 0) + count
+        self.prediction_moments.merge(other.prediction_moments)
+        self.prediction_digest.merge(other.prediction_digest)
+
+    def to_dict(self) -> dict:
+        return {
+            "moments": {f: m.to_dict() for f, m in self.moments.items()},
+            "digests": {f: d.to_dict() for f, d in self.digests.items()},
+            "categories": dict(self.categories),
+            "prediction_moments": self.prediction_moments.to_dict(),
+            "prediction_digest": self.prediction_digest.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DriftProfile":
+        profile = cls()
+        for feature in NUMERIC_FEATURES:
+            if feature in data["moments"]:
+                profile.moments[feature] = RunningMoments.from_dict(data["moments"][feature])
+                profile.digests[feature] = TDigest.from_dict(data["digests"][feature])
+        profile.categories = dict(data["categories"])
+        profile.prediction_moments = RunningMoments.from_dict(data["prediction_moments"])
+        profile.prediction_digest = TDigest.from_dict(data["prediction_digest"])
+        return profile
+
+
+def _population_stability_index(expected, actual) -> float:
+    expected = np.clip(np.asarray(expected, dtype=np.float64), PSI_EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), PSI_EPSILON, None)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+def compare_distributions(current_moments, current_digest, baseline_moments, baseline_digest) -> dict:
+    """
+    Compare one numeric distribution against its baseline using only sketches.
+
+    Returns:
+        dict: Standardized mean shift, a Kolmogorov-Smirnov style distance and the
+        population stability index over baseline deciles.
+    """
+    if current_moments.count == 0 or baseline_moments.count == 0:
+        return {"count": current_moments.count, "drift": None}
+
+    baseline_std = np.sqrt(baseline_moments.variance) or 1.0
+    grid = np.unique(
+        np.concatenate(
+            [
+                baseline_digest.quantile(np.linspace(0.01, 0.99, 99)),
+                current_digest.quantile(np.linspace(0.01, 0.99, 99)),
+            ]
+        )
+    )
+    ks = float(np.max(np.abs(current_digest.cdf(grid) - baseline_digest.cdf(grid))))
+
+    edges = np.unique(baseline_digest.quantile(np.linspace(0.1, 0.9, 9)))
+    bins = np.concatenate([[0.0], baseline_digest.cdf(edges), [1.0]])
+    current_bins = np.concatenate([[0.0], current_digest.cdf(edges), [1.0]])
+    psi = _population_stability_index(np.diff(bins), np.diff(current_bins))
+
+    return {
+        "count": current_moments.count,
+        "mean": current_moments.mean,
+        "baseline_mean": baseline_moments.mean,
+        "mean_shift_std": (current_moments.mean - baseline_moments.mean) / baseline_std,
+        "ks": ks,
+        "psi": psi,
+        "drift": psi > Config.DRIFT_PSI_THRESHOLD,
+    }
+
+
+def compare_profiles(current: DriftProfile, baseline: DriftProfile) -> dict:
+    """
+    Compare a profile against the training baseline, feature by feature.
+
+    Returns:
+        dict: Per-feature, category and prediction drift statistics.
+    """
+    features = {
+        feature: compare_distributions(
+            current.moments[feature],
+            current.digests[feature],
+            baseline.moments[feature],
+            baseline.digests[feature],
+        )
+        for feature in NUMERIC_FEATURES
+    }
+
+    categories = sorted(set(current.categories) | set(baseline.categories))
+    current_total = sum(current.categories.values()) or 1
+    baseline_total = sum(baseline.categories.values()) or 1
+    current_share = [current.categories.get(c, 0) / current_total for c in categories]
+    baseline_share = [baseline.categories.get(c, 0) / baseline_total for c in categories]
+    category_psi = _population_stability_index(baseline_share, current_share)
+
+    return {
+        "features": features,
+        "ocean_proximity": {
+            "frequencies": dict(zip(categories, current_share)),
+            "baseline_frequencies": dict(zip(categories, baseline_share)),
+            "psi": category_psi,
+            "drift": category_psi > Config.DRIFT_PSI_THRESHOLD,
+        },
+        "predictions": compare_distributions(
+            current.prediction_moments,
+            current.prediction_digest,
+            baseline.prediction_moments,
+            baseline.prediction_digest,
+        ),
+    }
+
+
+def build_baseline(data_file: str = Config.DATA_FILE, baseline_file: str = Config.DRIFT_BASELINE_FILE) -> DriftProfile:
+    """
+    Profile the training data (and the served model's predictions on it) and
+    store the result as the drift baseline.
+    """
+    # Imported here to keep this module free of the preprocessing/model imports
+    from analytics.preprocessor import iter_preprocess_housing_data
+    from models.registry import load_registry
+    from models.serving import get_model
+
+    profile = DriftProfile()
+    live_model = next(model for model in load_registry() if not model["shadow"])
+    try:
+        model = get_model(live_model["path"])
+    except FileNotFoundError:
+        logger.warning("Model not found, the drift baseline will have no prediction sketch.")
+        model = None
+
+    for X, _ in iter_preprocess_housing_data(data_file, profile=profile):
+        if model is not None:
+            profile.update_predictions(model.predict(X.to_numpy(dtype=np.float32)))
+
+    with open(baseline_file, "w") as f:
+        json.dump(
+            {"created_at": datetime.now().isoformat(), "source": data_file, "profile": profile.to_dict()},
+            f,
+        )
+    logger.info(f"Drift baseline built from {data_file} ({profile.count} rows) in {baseline_file}")
+    return profile
+
+
+def load_baseline(baseline_file: str = Config.DRIFT_BASELINE_FILE) -> DriftProfile:
+    """
+    Load the stored drift baseline, building it from the training data on first use.
+    """
+    if not os.path.exists(baseline_file):
+        return build_baseline(baseline_file=baseline_file)
+    with open(baseline_file) as f:
+        return DriftProfile.from_dict(json.load(f)["profile"])
+
+
+if __name__ == "__main__":
+    build_baseline()
@@ -0,0 +1,101 @@
+from config import Config, logger
+from utils.cache import LRUCache
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+GRID_ZOOM_LEVELS = range(Config.GRID_MIN_ZOOM, Config.GRID_MAX_ZOOM + 1)
+
+# Responses of the grid endpoint, cleared whenever a rollup is written
+grid_cache = LRUCache(max_size=Config.GRID_CACHE_SIZE, ttl=Config.GRID_CACHE_TTL)
+
+
+def cell_indices(longitudes, latitudes, zoom: int):
+    """
+    Map coordinates to grid cells of a zoom level.
+
+    At zoom `z` the world is split into 2**z columns of longitude and 2**z rows
+    of latitude, so every zoom level halves the cell size of the previous one.
+
+    Returns:
+        tuple: Arrays of cell columns (x) and rows (y).
+    """
+    n_cells = 2**zoom
+    cell_x = np.floor((np.asarray(longitudes) + 180.0) / 360.0 * n_cells)
+    cell_y = np.floor((np.asarray(latitudes) + 90.0) / 180.0 * n_cells)
+    return (
+        np.clip(cell_x, 0, n_cells - 1).astype(np.int64),
+        np.clip(cell_y, 0, n_cells - 1).astype(np.int64),
+    )
+
+
+def cell_bounds(zoom: int, cell_x: int, cell_y: int) -> list:
+    """
+    Bounding box of a grid cell as [min_lon, min_lat, max_lon, max_lat].
+    """
+    lon_size, lat_size = 360.0 / 2**zoom, 180.0 / 2**zoom
+    return [
+        -180.0 + cell_x * lon_size,
+        -90.0 + cell_y * lat_size,
+        -180.0 + (cell_x + 1) * lon_size,
+        -90.0 + (cell_y + 1) * lat_size,
+    ]
+
+
+def compute_grid_rollup(longitudes, latitudes, predictions, zooms=GRID_ZOOM_LEVELS):
+    """
+    Bin predictions into the grid of every zoom level and aggregate each cell.
+
+    Args:
+        longitudes (array-like): Longitudes of the predicted rows.
+        latitudes (array-like): Latitudes of the predicted rows.
+        predictions (array-like): Predicted values.
+        zooms (iterable): Zoom levels to compute.
+
+    Returns:
+        pd.DataFrame: One row per non-empty cell with `zoom`, `cell_x`, `cell_y`,
+        `count`, `sum`, `min` and `max`. Counts, sums, minima and maxima can be
+        merged with later rollups, the mean is `sum / count`.
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    frames = []
+    for zoom in zooms:
+        cell_x, cell_y = cell_indices(longitudes, latitudes, zoom)
+        frame = (
+            pd.DataFrame({"cell_x": cell_x, "cell_y": cell_y, "value": predictions})
+            .groupby(["cell_x", "cell_y"], sort=False)["value"]
+            .agg(["count", "sum", "min", "max"])
+            .reset_index()
+        )
+        frame.insert(0, "zoom", zoom)
+        frames.append(frame)
+
+    rollup = pd.concat(frames, ignore_index=True)
+    logger.info(f"Computed grid rollup: {len(rollup)} cells over {len(frames)} zoom levels.")
+    return rollup
+
+
+def parse_bbox(bbox: str) -> tuple:
+    """
+    Parse "min_lon,min_lat,max_lon,max_lat" into floats.
+
+    Raises:
+        ValueError: If the bounding box is malformed.
+    """
+    values = [float(value) for value in bbox.split(",")]
+    if len(values) != 4:
+        raise ValueError("Bounding box needs four values: min_lon,min_lat,max_lon,max_lat.")
+    min_lon, min_lat, max_lon, max_lat = values
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("Bounding box is out of range or inverted.")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def bbox_cell_range(zoom: int, bbox: tuple) -> tuple:
+    """
+    Range of cells (x_min, x_max, y_min, y_max) covering a bounding box at a zoom level.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    (x_min, x_max), (y_min, y_max) = cell_indices([min_lon, max_lon], [min_lat, max_lat], zoom)
+    return int(x_min), int(x_max), int(y_min), int(y_max)
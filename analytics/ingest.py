@@ -0,0 +1,213 @@
+import functools
+import gzip
+import importlib.util
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from analytics.drift import DriftProfile
+from analytics.preprocessor import iter_preprocess_housing_data
+from config import Config, logger
+from database_handler.db_queries import insert_data_to_mongo
+from monitoring.tracing import current_traceparent, parse_traceparent, span
+
+# Multithreaded pyarrow CSV parser when installed, pandas' C parser otherwise
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def expand_upload(path: str, name: str, workdir: str) -> list:
+    """
+    Turn an uploaded file into the CSV sources it contains.
+
+    Plain, gzip and zstd CSV files are a single source. Zip members are read in
+    place by the workers; tar archives can only be read sequentially, so their
+    CSV members are streamed out to `workdir` first.
+
+    Args:
+        path (str): Local path of the uploaded file.
+        name (str): Original file name, used to detect the format.
+        workdir (str): Directory for extracted tar members.
+
+    Returns:
+        list: Sources as dicts with `name`, `path` and `member` (zip member or None).
+    """
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return [
+                {"name": f"{name}/{info.filename}", "path": path, "member": info.filename}
+                for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(CSV_SUFFIXES)
+            ]
+
+    if lower.endswith(TAR_SUFFIXES):
+        sources = []
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.lower().endswith(CSV_SUFFIXES):
+                    continue
+                # Flatten member paths so that archive contents cannot escape workdir
+                target = os.path.join(
+                    workdir, f"{len(sources)}_{os.path.basename(member.name)}"
+                )
+                with archive.extractfile(member) as src, open(target, "wb") as dst:
+                    while chunk := src.read(1024 * 1024):
+                        dst.write(chunk)
+                sources.append({"name": f"{name}/{member.name}", "path": target, "member": None})
+        return sources
+
+    return [{"name": name, "path": path, "member": None}]
+
+
+@contextmanager
+def open_source(source: dict):
+    """
+    Open a source as a binary stream, decompressing gzip and zstd on the fly.
+
+    Raises:
+        ValueError: If a zstd file is uploaded but `zstandard` is not installed.
+    """
+    with ExitStack() as stack:
+        if source["member"] is None:
+            stream = stack.enter_context(open(source["path"], "rb"))
+        else:
+            archive = stack.enter_context(zipfile.ZipFile(source["path"]))
+            stream = stack.enter_context(archive.open(source["member"]))
+
+        lower = source["name"].lower()
+        if lower.endswith(".gz"):
+            stream = stack.enter_context(gzip.GzipFile(fileobj=stream))
+        elif lower.endswith(".zst"):
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError(f"Reading '{source['name']}' requires the zstandard package.")
+            stream = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(stream))
+        yield stream
+
+
+def estimate_upload_memory_mb(filenames: list, workers: int = Config.UPLOAD_WORKERS) -> float:
+    """
+    Estimated peak memory of ingesting the uploaded files, for admission control.
+
+    Each worker process holds about one preprocessed chunk, so the estimate is
+    the number of workers the upload can keep busy times UPLOAD_WORKER_MEMORY_MB.
+    Archives may hold any number of files and are assumed to use every worker.
+    """
+    workers = workers or os.cpu_count() or 1
+    archives = any(name.lower().endswith((".zip",) + TAR_SUFFIXES) for name in filenames)
+    busy = workers if archives else min(len(filenames), workers)
+    return max(busy, 1) * Config.UPLOAD_WORKER_MEMORY_MB
+
+
+def frame_to_records(X, y) -> list:
+    """
+    Build MongoDB documents from preprocessed features and target.
+
+    Each column buffer is converted to Python values once, instead of going
+    through per-row Series as `DataFrame.to_dict(orient="records")` does.
+
+    Returns:
+        list: One dict per row with the feature columns and `target`.
+    """
+    names = list(X.columns) + ["target"]
+    columns = [X[column].to_numpy().tolist() for column in X.columns] + [y.to_numpy().tolist()]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def ingest_source(
+    source: dict,
+    db_name: str,
+    collection_name: str,
+    engine: str = CSV_ENGINE,
+    traceparent: str = None,
+) -> dict:
+    """
+    Parse, preprocess and insert one source. Runs in a worker process.
+
+    Args:
+        traceparent (str, optional): Trace of the upload request, continued
+            in the worker process.
+
+    Returns:
+        dict: Per-file stats (`file`, `rows`, `seconds`, `engine`), the drift
+        profile of the file, and `error` if it failed.
+    """
+    start = time.perf_counter()
+    profile = DriftProfile()
+    stats = {"file": source["name"], "rows": 0, "engine": engine}
+    with span(
+        "ingest.file", parent=parse_traceparent(traceparent), file=source["name"], engine=engine
+    ) as current:
+        insert_seconds = 0.0
+        try:
+            current.set_attribute("bytes", os.path.getsize(source["path"]))
+            with open_source(source) as stream:
+                for X, y in iter_preprocess_housing_data(
+                    stream, profile=profile, engine=engine, name=source["name"]
+                ):
+                    insert_start = time.perf_counter()
+                    records = frame_to_records(X, y)
+                    insert_data_to_mongo(records, db_name, collection_name)
+                    insert_seconds += time.perf_counter() - insert_start
+                    stats["rows"] += len(records)
+        except Exception as e:
+            logger.error(f"Failed to ingest '{source['name']}': {e}")
+            stats["error"] = str(e)
+            current.record_exception(e)
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        current.set_attributes(
+            {
+                "rows": stats["rows"],
+                "parse_seconds": round(stats["seconds"] - insert_seconds, 3),
+                "insert_seconds": round(insert_seconds, 3),
+            }
+        )
+    stats["profile"] = profile.to_dict()
+    return stats
+
+
+def ingest_files(
+    uploads: list,
+    db_name: str,
+    collection_name: str,
+    workdir: str,
+    workers: int = Config.UPLOAD_WORKERS,
+):
+    """
+    Ingest uploaded files (plain or compressed CSVs and archives) in parallel.
+
+    Args:
+        uploads (list): (local path, original file name) pairs.
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection name.
+        workdir (str): Scratch directory for extracted archive members.
+        workers (int): Worker processes, None for one per core.
+
+    Returns:
+        tuple: Per-file stats (without profiles) and the merged DriftProfile.
+    """
+    sources = [
+        source for path, name in uploads for source in expand_upload(path, name, workdir)
+    ]
+    logger.info(f"Ingesting {len(sources)} files into {db_name}.{collection_name}")
+
+    args = (sources, [db_name] * len(sources), [collection_name] * len(sources))
+    # Worker processes do not share context variables; hand the trace over explicitly
+    ingest = functools.partial(ingest_source, traceparent=current_traceparent())
+    if workers == 1 or len(sources) <= 1:
+        results = list(map(ingest, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(ingest, *args))
+
+    profile = DriftProfile()
+    for stats in results:
+        profile.merge(DriftProfile.from_dict(stats.pop("profile")))
+    return results, profile
@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from analytics.scoring import refresh_read_models, score_documents
+from config import Config, logger
+from database_handler.db_connector import get_mongo_client
+from database_handler.db_queries import save_to_postgres
+from monitoring.tracing import current_traceparent, parse_traceparent, span
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+
+def plan_partitions(collection, partitions: int) -> list:
+    """
+    Split a collection into contiguous `_id` ranges of about equal size.
+
+    The boundaries come from `$bucketAuto` over `_id` alone, which MongoDB
+    answers from the `_id` index. The first range is open below and the last
+    open above, so documents inserted meanwhile still belong to a range.
+
+    Args:
+        collection: pymongo collection.
+        partitions (int): Requested number of ranges.
+
+    Returns:
+        list: (lower, upper) bounds as `{"_id": {"$gte": lower, "$lt": upper}}`,
+        None meaning unbounded; empty for an empty collection.
+    """
+    buckets = list(
+        collection.aggregate(
+            [
+                {"$project": {"_id": 1}},
+                {"$bucketAuto": {"groupBy": "$_id", "buckets": max(partitions, 1)}},
+            ],
+            allowDiskUse=True,
+        )
+    )
+    if not buckets:
+        return []
+    # Bucket minima are the split points; every bucket ends where the next begins
+    splits = [bucket["_id"]["min"] for bucket in buckets[1:]]
+    return list(zip([None] + splits, splits + [None]))
+
+
+def range_filter(lower, upper) -> dict:
+    bounds = {}
+    if lower is not None:
+        bounds["$gte"] = lower
+    if upper is not None:
+        bounds["$lt"] = upper
+    return {"_id": bounds} if bounds else {}
+
+
+def score_partition(
+    db_name: str,
+    collection_name: str,
+    lower,
+    upper,
+    quantiles: tuple = (),
+    std: bool = False,
+    timestamp: datetime = None,
+    batch_size: int = Config.PROCESS_BATCH_SIZE,
+    traceparent: str = None,
+    table_name: str = Config.POSTGRES_table,
+) -> dict:
+    """
+    Score one `_id` range. Runs in a worker process with its own MongoDB
+    client, PostgreSQL connections and model copy.
+
+    Documents are streamed from the cursor in batches; each batch is scored
+    and upserted, and committed, on its own, so a range is not one
+    transaction: batches committed before a failure stay in the table.
+    Idempotency is what makes that safe. Upserts are keyed by source document
+    and model version, so a retried range, or a later `/process` run after a
+    range failed for good, overwrites those rows instead of duplicating them.
+
+    Returns:
+        dict: Rows and seconds of the range, plus longitudes, latitudes and
+        predictions of the served rows for the read models.
+    """
+    start = time.perf_counter()
+    served = {"longitudes": [], "latitudes": [], "predictions": []}
+    rows = 0
+    with span(
+        "process.partition",
+        parent=parse_traceparent(traceparent),
+        lower=str(lower),
+        upper=str(upper),
+    ) as current:
+        client = get_mongo_client()
+        try:
+            cursor = client[db_name][collection_name].find(
+                range_filter(lower, upper), batch_size=batch_size
+            )
+            batch = []
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    rows += _score_batch(batch, quantiles, std, timestamp, table_name, served)
+                    batch = []
+            if batch:
+                rows += _score_batch(batch, quantiles, std, timestamp, table_name, served)
+        finally:
+            client.close()
+        current.set_attribute("rows", rows)
+
+    return {
+        "rows": rows,
+        "seconds": round(time.perf_counter() - start, 3),
+        **{
+            key: np.concatenate(arrays) if arrays else np.empty(0)
+            for key, arrays in served.items()
+        },
+    }
+
+
+def _score_batch(
+    batch: list, quantiles: tuple, std: bool, timestamp, table_name: str, served: dict
+) -> int:
+    df = score_documents(batch, quantiles=quantiles, std=std, timestamp=timestamp)
+    save_to_postgres(df, Config.POSTGRES_DB, table_name)
+    rows = df[~df["shadow"]]
+    served["longitudes"].append(rows["longitude"].to_numpy(dtype=np.float64))
+    served["latitudes"].append(rows["latitude"].to_numpy(dtype=np.float64))
+    served["predictions"].append(rows["predictions"].to_numpy(dtype=np.float64))
+    return len(batch)
+
+
+def score_collection_parallel(
+    db_name: str,
+    collection_name: str,
+    quantiles: tuple = (),
+    std: bool = False,
+    workers: int = Config.PROCESS_WORKERS,
+    partitions: int = None,
+    table_name: str = Config.POSTGRES_table,
+    retries: int = Config.PROCESS_PARTITION_RETRIES,
+) -> dict:
+    """
+    Score a collection on a process pool, one `_id` range per task.
+
+    Each range is retried on its own, up to `retries` times, when it fails or
+    its worker dies. The read models (spatial index, grid rollup, drift
+    sketch) are refreshed once all ranges succeeded, if they were written to
+    POSTGRES_table.
+
+    Args:
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection name.
+        quantiles (tuple): Prediction interval quantiles.
+        std (bool): Add the standard deviation across trees.
+        workers (int): Worker processes, None for one per core.
+        partitions (int): Number of ranges; defaults to PROCESS_PARTITIONS_PER_WORKER per worker.
+        table_name (str): Predictions table.
+        retries (int): Retries per range.
+
+    Returns:
+        dict: Total `rows`, per-range `partitions` stats and the `failed` ranges.
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * Config.PROCESS_PARTITIONS_PER_WORKER
+
+    client = get_mongo_client()
+    try:
+        with span("process.plan_partitions", partitions=partitions):
+            ranges = plan_partitions(client[db_name][collection_name], partitions)
+    finally:
+        client.close()
+    if not ranges:
+        return {"rows": 0, "partitions": [], "failed": []}
+    logger.info(f"Scoring {db_name}.{collection_name} in {len(ranges)} ranges on {workers} workers")
+
+    # One timestamp for the whole run, so all rows count as the latest run
+    timestamp = datetime.now()
+    traceparent = current_traceparent()
+    attempts = {index: 0 for index in range(len(ranges))}
+    results, failed = {}, []
+
+    def task_args(index):
+        lower, upper = ranges[index]
+        return (
+            db_name,
+            collection_name,
+            lower,
+            upper,
+            quantiles,
+            std,
+            timestamp,
+            Config.PROCESS_BATCH_SIZE,
+            traceparent,
+            table_name,
+        )
+
+    # Every round submits the ranges still pending; a broken pool fails its
+    # unfinished ranges, which are then retried on a fresh pool
+    pending = list(attempts)
+    while pending:
+        retry = []
+        outcomes = []
+        if workers == 1:
+            for index in pending:
+                try:
+                    outcomes.append((index, score_partition(*task_args(index)), None))
+                except Exception as e:
+                    outcomes.append((index, None, e))
+        else:
+            # Spawned, not forked, workers: the API process has threads (event
+            # loop, executors, MongoDB monitors) whose locks a fork could copy held
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                futures = {
+                    executor.submit(score_partition, *task_args(index)): index for index in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        outcomes.append((futures[future], future.result(), None))
+                    except Exception as e:
+                        outcomes.append((futures[future], None, e))
+
+        for index, result, error in outcomes:
+            attempts[index] += 1
+            if error is None:
+                results[index] = result
+            elif attempts[index] <= retries:
+                logger.warning(
+                    f"Range {index} failed (attempt {attempts[index]}), retrying: {error}"
+                )
+                retry.append(index)
+            else:
+                logger.error(f"Range {index} failed after {attempts[index]} attempts: {error}")
+                failed.append(
+                    {"partition": index, "attempts": attempts[index], "error": str(error)}
+                )
+        pending = retry
+
+    stats = [
+        {
+            "partition": index,
+            "rows": result["rows"],
+            "seconds": result["seconds"],
+            "attempts": attempts[index],
+        }
+        for index, result in sorted(results.items())
+    ]
+    if failed:
+        logger.warning(f"{len(failed)} of {len(ranges)} ranges failed; read models not refreshed")
+    elif table_name == Config.POSTGRES_table:
+        ordered = [results[index] for index in sorted(results)]
+        longitudes, latitudes, predictions = (
+            np.concatenate([result[key] for result in ordered])
+            for key in ("longitudes", "latitudes", "predictions")
+        )
+        refresh_read_models(longitudes, latitudes, predictions)
+    return {"rows": sum(stat["rows"] for stat in stats), "partitions": stats, "failed": failed}
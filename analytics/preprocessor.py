@@ -1,14 +1,34 @@
-import pandas as pd
-from typing import Tuple
+from __future__ import annotations
+
+import csv
+import io
+import os
+from typing import Iterator, Tuple
 from config import logger, Config
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
+TARGET = "median_house_value"
+COLUMN_RENAMES = {
+    "lat": "latitude",
+    "bedrooms": "total_bedrooms",
+    "median_age": "housing_median_age",
+    "pop": "population",
+    "rooms": "total_rooms",
+}
 
-def preprocess_housing_data(input_data_path: str) -> Tuple[pd.DataFrame, pd.Series]:
+
+def preprocess_housing_data(
+    input_data_path: str, profile=None
+) -> Tuple[pd.DataFrame, pd.Series]:
     """
     Preprocess the housing data to prepare it for model training or inference.
 
     Args:
         input_data_path (str): Path to the input CSV file.
+        profile (DriftProfile, optional): Drift sketch updated with the features.
 
     Returns:
         Tuple[pd.DataFrame, pd.Series]: Processed features (X) and target (y).
@@ -35,6 +55,138 @@ def preprocess_housing_data(input_data_path: str) -> Tuple[pd.DataFrame, pd.Seri
         logger.error(f"Error loading file '{input_data_path}': {e}")
         raise
 
+    X, y = transform_housing_data(df, input_data_path)
+    if profile is not None:
+        profile.update(X)
+
+    logger.info("Data preprocessing completed successfully.")
+    return X, y
+
+
+def iter_preprocess_housing_data(
+    input_data_path,
+    chunksize: int = Config.PREPROCESS_CHUNK_SIZE,
+    profile=None,
+    engine: str = None,
+    name: str = None,
+) -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+    """
+    Streaming equivalent of `preprocess_housing_data`: read and preprocess the
+    file in chunks so that memory stays bounded by the chunk size.
+
+    Args:
+        input_data_path (str or file-like): Path to, or open stream of, the input CSV.
+        chunksize (int): Rows per chunk.
+        profile (DriftProfile, optional): Drift sketch updated chunk by chunk.
+        engine (str, optional): pandas CSV engine. "pyarrow" streams the file
+            with pyarrow's multithreaded block reader instead (see `_arrow_chunks`).
+        name (str, optional): Name used in messages, defaults to the path.
+
+    Yields:
+        Tuple[pd.DataFrame, pd.Series]: Processed features (X) and target (y) of a chunk.
+
+    Raises:
+        FileNotFoundError: If the input file is not found.
+        ValueError: If the target column is missing or the file format is invalid.
+    """
+    name = name or str(input_data_path)
+    logger.info(f"Starting chunked preprocessing for file: {name}")
+    try:
+        if engine == "pyarrow":
+            chunks = _arrow_chunks(input_data_path, chunksize)
+        else:
+            chunks = pd.read_csv(input_data_path, chunksize=chunksize, engine=engine)
+        for chunk in chunks:
+            X, y = transform_housing_data(chunk, name)
+            if profile is not None:
+                profile.update(X)
+            yield X, y
+    except FileNotFoundError:
+        logger.error(f"Input file not found at path: {name}")
+        raise
+    except pd.errors.ParserError:
+        logger.error(f"Invalid file format for file: {name}")
+        raise ValueError(f"Invalid file format for file: {name}")
+
+
+def _arrow_chunks(input_data_path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV with `pyarrow.csv.open_csv`, which parses one block at a time,
+    and yield it as frames of `chunksize` rows.
+
+    pyarrow infers column types from the first block only, so a column that
+    starts with integers (or "Null") and has decimals further down would fail
+    on a later block. The header is read first and the numeric columns of the
+    schema are declared float64 up front; "Null" is read as a missing value
+    like pandas' `df.replace("Null", 0)` would treat it.
+
+    Raises:
+        pd.errors.ParserError: If pyarrow cannot parse the file.
+    """
+    import pyarrow
+    from pyarrow import csv as arrow_csv
+
+    if isinstance(input_data_path, (str, os.PathLike)):
+        stream = open(input_data_path, "rb")
+    else:
+        # Decompression readers do not all implement readline
+        stream = io.BufferedReader(input_data_path)
+    with stream:
+        header = stream.readline().decode("utf-8-sig").splitlines()
+        names = next(csv.reader(header), [])
+        if not names:
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+        numeric = {
+            column for column in Config.EXPECTED_FEATURES
+            if not column.startswith("ocean_proximity_")
+        } | {TARGET}
+        column_types = {
+            name: pyarrow.float64()
+            for name in names
+            if COLUMN_RENAMES.get(name.lower(), name.lower()) in numeric
+        }
+        null_values = arrow_csv.ConvertOptions().null_values + ["Null"]
+        try:
+            reader = arrow_csv.open_csv(
+                stream,
+                read_options=arrow_csv.ReadOptions(column_names=names),
+                convert_options=arrow_csv.ConvertOptions(
+                    column_types=column_types, null_values=null_values, strings_can_be_null=True
+                ),
+            )
+            pending, rows = [], 0
+            for batch in reader:
+                pending.append(batch)
+                rows += batch.num_rows
+                while rows >= chunksize:
+                    table = pyarrow.Table.from_batches(pending, schema=reader.schema)
+                    yield table.slice(0, chunksize).to_pandas()
+                    rest = table.slice(chunksize)
+                    pending, rows = rest.to_batches(), rest.num_rows
+            if rows:
+                yield pyarrow.Table.from_batches(pending, schema=reader.schema).to_pandas()
+        except pyarrow.ArrowInvalid as e:
+            raise pd.errors.ParserError(str(e)) from e
+
+
+def transform_housing_data(
+    df: pd.DataFrame, input_data_path: str = "<frame>", compact: bool = Config.COMPACT_DTYPES
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Clean, encode and align a loaded frame (steps 2-9 of the preprocessing).
+
+    Args:
+        df (pd.DataFrame): Raw rows as read from the CSV file.
+        input_data_path (str): Source of the rows, used in messages.
+        compact (bool): Emit float32 features, uint8 one-hot columns and a
+            float64 target instead of the loaded dtypes (see `compact_features`).
+
+    Returns:
+        Tuple[pd.DataFrame, pd.Series]: Processed features (X) and target (y).
+
+    Raises:
+        ValueError: If the target column is missing or there are too few columns.
+    """
     # Step 2: Validate minimum columns
     if df.shape[1] < 2:
         logger.error(f"Insufficient columns in file: {input_data_path}")
@@ -45,18 +197,20 @@ def preprocess_housing_data(input_data_path: str) -> Tuple[pd.DataFrame, pd.Seri
     logger.debug(f"Normalized column names: {list(df.columns)}")
 
     # Step 4: Rename columns for consistency
-    column_renames = {
-        "lat": "latitude",
-        "bedrooms": "total_bedrooms",
-        "median_age": "housing_median_age",
-        "pop": "population",
-        "rooms": "total_rooms",
-    }
-    df.rename(columns=column_renames, inplace=True)
+    df.rename(columns=COLUMN_RENAMES, inplace=True)
     logger.debug(f"Renamed columns: {list(df.columns)}")
 
     # Step 5: Encode categorical variables
     if "ocean_proximity" in df.columns:
+        # "<1H OCEAN", "NEAR BAY" and "NEAR OCEAN" would otherwise produce dummies
+        # that never match Config.EXPECTED_FEATURES and be zero-filled by step 9
+        df["ocean_proximity"] = (
+            df["ocean_proximity"]
+            .astype("string")
+            .str.upper()
+            .str.replace("<", "_LT_", regex=False)
+            .str.replace(" ", "_", regex=False)
+        )
         df = pd.get_dummies(df, columns=["ocean_proximity"], drop_first=False)
         logger.debug(
             f"Encoded 'ocean_proximity' column. Current columns: {list(df.columns)}"
@@ -65,14 +219,15 @@ def preprocess_housing_data(input_data_path: str) -> Tuple[pd.DataFrame, pd.Seri
         logger.warning("'ocean_proximity' column not found. Skipping encoding.")
 
     # Step 6: Handle missing or unexpected values
-    df.replace("Null", 0, inplace=True)
-    df.fillna(0, inplace=True)
-    logger.debug(
-        "Handled missing and unexpected values (replaced 'Null', filled NaNs)."
-    )
+    if not compact:
+        df.replace("Null", 0, inplace=True)
+        df.fillna(0, inplace=True)
+        logger.debug(
+            "Handled missing and unexpected values (replaced 'Null', filled NaNs)."
+        )
 
     # Step 7: Validate target column
-    target = "median_house_value"
+    target = TARGET
     if target not in df.columns:
         logger.error(f"Target column '{target}' not found in the dataset.")
         raise ValueError(f"Target column '{target}' not found in the dataset.")
@@ -92,5 +247,32 @@ def preprocess_housing_data(input_data_path: str) -> Tuple[pd.DataFrame, pd.Seri
     X = X[Config.EXPECTED_FEATURES]
     logger.info(f"Aligned features with the expected schema. Final shape: {X.shape}")
 
-    logger.info("Data preprocessing completed successfully.")
+    if compact:
+        # Unparseable values such as "Null" are coerced to NaN and filled with 0
+        X = compact_features(X)
+        y = pd.to_numeric(y, errors="coerce").fillna(0).astype(np.float64)
+        logger.debug("Converted features to float32/uint8 and the target to float64.")
     return X, y
+
+
+def compact_features(X: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert features to compact dtypes: float32 for numeric columns (the
+    precision of the model and of the REAL columns in PostgreSQL) and uint8
+    for the one-hot `ocean_proximity_*` columns. Values that are not numbers
+    become 0.
+
+    Args:
+        X (pd.DataFrame): Features in any dtypes.
+
+    Returns:
+        pd.DataFrame: The same columns in compact dtypes.
+    """
+    columns = {}
+    for column in X.columns:
+        values = pd.to_numeric(X[column], errors="coerce").fillna(0)
+        if column.startswith("ocean_proximity_"):
+            columns[column] = values.to_numpy(dtype=np.uint8)
+        else:
+            columns[column] = values.to_numpy(dtype=np.float32)
+    return pd.DataFrame(columns, index=X.index)
@@ -0,0 +1,176 @@
+from datetime import datetime
+
+from analytics.drift import DriftProfile
+from analytics.grid_rollup import compute_grid_rollup, grid_cache
+from analytics.spatial_index import prediction_index
+from config import Config, logger
+from database_handler.db_queries import save_to_postgres, save_grid_rollup, save_drift_profile
+from models.registry import score_with_registry
+from monitoring.tracing import span
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def estimate_scoring_memory_mb(n_documents: int) -> float:
+    """
+    Estimated peak memory of scoring a collection with `/process`, for admission
+    control: the documents as returned by `find()` plus the feature matrix and
+    predictions, PROCESS_BYTES_PER_DOCUMENT per document.
+    """
+    return n_documents * Config.PROCESS_BYTES_PER_DOCUMENT / 2**20
+
+
+def documents_to_features(documents: list):
+    """
+    Extract the model features from raw documents, one column at a time,
+    straight into float32 (uint8 for one-hot columns). Unlike building a frame
+    of whole documents, this never materializes the other fields or an object
+    array of all values. Missing fields become 0.
+
+    Args:
+        documents (list): Documents as stored by /upload.
+
+    Returns:
+        pd.DataFrame: Features in Config.EXPECTED_FEATURES order.
+    """
+    columns = {}
+    for column in Config.EXPECTED_FEATURES:
+        dtype = np.uint8 if column.startswith("ocean_proximity_") else np.float32
+        try:
+            values = np.fromiter(
+                (document.get(column, 0) for document in documents), dtype=dtype, count=len(documents)
+            )
+            if dtype is np.float32:
+                # Nulls arrive as NaN
+                values[np.isnan(values)] = 0
+            columns[column] = values
+        except (TypeError, ValueError):
+            # Documents written before compact uploads may hold strings or nulls
+            values = pd.Series([document.get(column) for document in documents])
+            columns[column] = pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=dtype)
+    return pd.DataFrame(columns)
+
+
+def score_documents(
+    documents: list,
+    quantiles: tuple = Config.PREDICTION_QUANTILES,
+    std: bool = Config.PREDICTION_STD,
+    timestamp: datetime = None,
+):
+    """
+    Score raw MongoDB documents with every active model version.
+
+    Args:
+        documents (list): Documents as stored by /upload.
+        quantiles (tuple): Quantiles of the per-tree predictions to add, e.g.
+            (0.05, 0.95) for a 90% interval.
+        std (bool): Add the standard deviation across trees.
+        timestamp (datetime, optional): `prediction_timestamp` of the rows, so
+            that batches of one run share it; defaults to now.
+
+    Returns:
+        pd.DataFrame: Scored rows with `source_id`, `predictions`, `model_version`,
+        `shadow` and `prediction_timestamp` columns, plus the requested interval
+        columns. `source_id` is the document `_id`, or a hash of the features
+        for documents without one.
+    """
+    if Config.COMPACT_DTYPES:
+        keys = [document.get("_id") for document in documents]
+        has_ids = bool(documents) and all(key is not None for key in keys)
+        if not has_ids:
+            keys = list(range(len(documents)))
+        with span("scoring.features", rows=len(documents)):
+            df = documents_to_features(documents)
+    else:
+        df = pd.DataFrame(documents)
+        has_ids = "_id" in df.columns
+        if has_ids:
+            keys = df.pop("_id").tolist()
+        else:
+            keys = df.index.tolist()
+
+        missing_cols = [col for col in Config.EXPECTED_FEATURES if col not in df.columns]
+        for col in missing_cols:
+            df[col] = 0
+        df = df[Config.EXPECTED_FEATURES]
+
+    # Key predictions by their source document so that rescoring replaces them
+    if has_ids:
+        df.index = [str(key) for key in keys]
+    else:
+        df.index = pd.util.hash_pandas_object(df, index=False).map("{:016x}".format)
+
+    logger.info(f"Generating predictions for {len(df)} documents...")
+    with span("scoring.predict", rows=len(df), quantiles=len(quantiles), std=std):
+        df = score_with_registry(df, keys, quantiles=quantiles, std=std)
+    df = df.rename_axis("source_id").reset_index()
+    df["prediction_timestamp"] = timestamp or datetime.now()
+    return df
+
+
+def store_predictions(df, incremental: bool = False, table_name: str = Config.POSTGRES_table):
+    """
+    Save scored rows to PostgreSQL and refresh the derived read models: the
+    spatial index, the grid rollup and the prediction drift sketch.
+
+    Args:
+        df (pd.DataFrame): Rows returned by `score_documents`.
+        incremental (bool): The rows extend earlier predictions (e.g. from the
+            change stream) instead of replacing them (a full /process run).
+        table_name (str): Predictions table. The read models describe
+            POSTGRES_table only and are left alone for any other table.
+    """
+    logger.info(f"Saving predictions to PostgreSQL table {table_name}...")
+    save_to_postgres(df, Config.POSTGRES_DB, table_name)
+    logger.info("Predictions saved to PostgreSQL successfully.")
+    if table_name != Config.POSTGRES_table:
+        return
+
+    served = df[~df["shadow"]]
+    refresh_read_models(
+        served["longitude"], served["latitude"], served["predictions"], incremental
+    )
+
+
+def refresh_read_models(longitudes, latitudes, predictions, incremental: bool = False):
+    """
+    Refresh the spatial index, the grid rollup and the prediction drift sketch
+    from served predictions. Failures are logged, not raised: the predictions
+    themselves are already stored.
+
+    Args:
+        longitudes, latitudes, predictions: Aligned arrays of the served rows.
+        incremental (bool): Add to the read models instead of replacing them.
+    """
+    try:
+        update_index = prediction_index.add if incremental else prediction_index.replace
+        update_index(longitudes, latitudes, predictions)
+    except Exception as e:
+        logger.warning(f"Failed to update the spatial index: {e}")
+
+    try:
+        rollup = compute_grid_rollup(longitudes, latitudes, predictions)
+        save_grid_rollup(
+            rollup,
+            Config.POSTGRES_DB,
+            Config.POSTGRES_GRID_TABLE,
+            mode="merge" if incremental else "replace",
+        )
+        grid_cache.clear()
+    except Exception as e:
+        logger.warning(f"Failed to update the prediction grid rollup: {e}")
+
+    try:
+        profile = DriftProfile()
+        profile.update_predictions(predictions)
+        save_drift_profile(
+            profile.to_dict(),
+            "predictions",
+            "change_stream" if incremental else "process",
+            Config.MONGO_DB_NAME,
+            Config.DRIFT_COLLECTION,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to store the prediction drift profile: {e}")
@@ -0,0 +1,131 @@
+import threading
+
+from config import Config, logger
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+sklearn_neighbors = lazy_import("sklearn.neighbors")
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class PredictionSpatialIndex:
+    """
+    In-memory nearest-neighbour index over predicted points.
+
+    Points are kept in immutable segments, each with its own ball tree over
+    (latitude, longitude) in radians using the haversine metric. Adding a batch
+    builds one tree for that batch only; once there are more than
+    `max_segments` segments they are merged into a single tree. Queries search
+    every segment and merge the results.
+    """
+
+    def __init__(self, max_segments: int = Config.SPATIAL_INDEX_MAX_SEGMENTS):
+        self.max_segments = max_segments
+        self._segments = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(segment["predictions"]) for segment in self._segments)
+
+    @staticmethod
+    def _build_segment(longitudes, latitudes, predictions):
+        coordinates = np.column_stack(
+            [np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)]
+        )
+        if not len(coordinates):
+            return None
+        return {
+            "tree": sklearn_neighbors.BallTree(np.radians(coordinates), metric="haversine"),
+            "coordinates": coordinates,
+            "predictions": np.asarray(predictions, dtype=np.float64),
+        }
+
+    @staticmethod
+    def _merge_segments(segments):
+        coordinates = np.concatenate([segment["coordinates"] for segment in segments])
+        predictions = np.concatenate([segment["predictions"] for segment in segments])
+        return PredictionSpatialIndex._build_segment(
+            coordinates[:, 1], coordinates[:, 0], predictions
+        )
+
+    def replace(self, longitudes, latitudes, predictions):
+        """
+        Replace the whole index with a new set of points.
+        """
+        segment = self._build_segment(longitudes, latitudes, predictions)
+        with self._lock:
+            self._segments = [segment] if segment is not None else []
+        logger.info(f"Spatial index rebuilt with {len(self)} points.")
+
+    def add(self, longitudes, latitudes, predictions):
+        """
+        Add a batch of points as a new segment, merging segments when there are too many.
+        """
+        segment = self._build_segment(longitudes, latitudes, predictions)
+        if segment is None:
+            return
+        with self._lock:
+            segments = self._segments + [segment]
+            if len(segments) > self.max_segments:
+                segments = [self._merge_segments(segments)]
+            self._segments = segments
+        logger.debug(f"Spatial index holds {len(self)} points in {len(segments)} segments.")
+
+    def clear(self):
+        with self._lock:
+            self._segments = []
+
+    def _results(self, segment, indices, distances):
+        return [
+            {
+                "longitude": float(segment["coordinates"][i, 1]),
+                "latitude": float(segment["coordinates"][i, 0]),
+                "prediction": float(segment["predictions"][i]),
+                "distance_km": float(distance * EARTH_RADIUS_KM),
+            }
+            for i, distance in zip(indices, distances)
+        ]
+
+    def query_radius(self, longitude: float, latitude: float, radius_km: float, limit: int = None) -> list:
+        """
+        Find the points within `radius_km` of a location, nearest first.
+
+        Args:
+            longitude (float): Longitude of the query point in degrees.
+            latitude (float): Latitude of the query point in degrees.
+            radius_km (float): Search radius in kilometres.
+            limit (int, optional): Maximum number of points to return.
+
+        Returns:
+            list: Points with their prediction and distance, sorted by distance.
+        """
+        point = np.radians([[latitude, longitude]])
+        results = []
+        for segment in self._segments:
+            indices, distances = segment["tree"].query_radius(
+                point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+            )
+            # Sorted per segment, so only the nearest `limit` of each can make the cut
+            results.extend(self._results(segment, indices[0][:limit], distances[0][:limit]))
+        results.sort(key=lambda result: result["distance_km"])
+        return results[:limit] if limit else results
+
+    def query_knn(self, longitude: float, latitude: float, k: int) -> list:
+        """
+        Find the `k` points nearest to a location.
+
+        Returns:
+            list: Points with their prediction and distance, sorted by distance.
+        """
+        point = np.radians([[latitude, longitude]])
+        results = []
+        for segment in self._segments:
+            n_neighbours = min(k, len(segment["predictions"]))
+            distances, indices = segment["tree"].query(point, k=n_neighbours)
+            results.extend(self._results(segment, indices[0], distances[0]))
+        results.sort(key=lambda result: result["distance_km"])
+        return results[:k]
+
+
+prediction_index = PredictionSpatialIndex()
@@ -0,0 +1,126 @@
+"""
+Overload a running service with heavy requests and check that it stays up.
+
+    python -m benchmarks.load_test --url http://localhost:8000 --endpoint upload --requests 50
+
+Fires `--requests` concurrent calls at /api/process or /api/upload (with a
+synthetic CSV) while probing /api/health/live every `--probe-interval`
+seconds. Reports the status codes of the burst, the Retry-After values of
+rejected calls, the liveness probe latencies and the admission metrics.
+Without admission control, the burst ends in 500s or a killed container;
+with it, the excess is answered quickly with 429/503 and every probe passes.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.synthetic import generate_housing_csv
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+async def heavy_call(http: httpx.AsyncClient, endpoint: str, csv_path: str) -> dict:
+    start = time.perf_counter()
+    try:
+        if endpoint == "upload":
+            with open(csv_path, "rb") as f:
+                response = await http.post(
+                    "/api/upload", files={"file": (os.path.basename(csv_path), f, "text/csv")}
+                )
+        else:
+            response = await http.get("/api/process")
+        status = response.status_code
+        retry_after = response.headers.get("Retry-After")
+    except httpx.HTTPError as e:
+        status, retry_after = type(e).__name__, None
+    return {"status": status, "seconds": time.perf_counter() - start, "retry_after": retry_after}
+
+
+async def probe_liveness(http: httpx.AsyncClient, interval: float, done: asyncio.Event) -> list:
+    probes = []
+    while not done.is_set():
+        start = time.perf_counter()
+        try:
+            ok = (await http.get("/api/health/live", timeout=5)).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        probes.append({"ok": ok, "seconds": time.perf_counter() - start})
+        await asyncio.sleep(interval)
+    return probes
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.requests + 8)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as http:
+        done = asyncio.Event()
+        prober = asyncio.create_task(probe_liveness(http, args.probe_interval, done))
+        start = time.perf_counter()
+        calls = await asyncio.gather(
+            *(heavy_call(http, args.endpoint, args.csv) for _ in range(args.requests))
+        )
+        elapsed = time.perf_counter() - start
+        done.set()
+        probes = await prober
+        admission = (await http.get("/api/admission")).json()
+
+    by_status = {}
+    for call in calls:
+        by_status.setdefault(str(call["status"]), []).append(call["seconds"])
+    probe_seconds = [probe["seconds"] for probe in probes]
+    return {
+        "endpoint": args.endpoint,
+        "requests": args.requests,
+        "seconds": round(elapsed, 2),
+        "statuses": dict(Counter(str(call["status"]) for call in calls)),
+        "latency": {
+            status: {"p50": percentile(seconds, 0.5), "max": round(max(seconds), 4)}
+            for status, seconds in by_status.items()
+        },
+        "retry_after": dict(Counter(call["retry_after"] for call in calls if call["retry_after"])),
+        "liveness": {
+            "probes": len(probes),
+            "failed": sum(not probe["ok"] for probe in probes),
+            "p50": percentile(probe_seconds, 0.5),
+            "p99": percentile(probe_seconds, 0.99),
+        },
+        "admission": admission,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=("process", "upload"), default="upload")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows of the uploaded CSV.")
+    parser.add_argument("--csv", help="CSV to upload; a synthetic one is generated by default.")
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    if args.endpoint == "upload" and not args.csv:
+        args.csv = os.path.join("benchmarks", ".data", f"housing_{args.rows}.csv")
+        if not os.path.exists(args.csv):
+            generate_housing_csv(args.csv, args.rows)
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Peak memory of the upload and /process data paths, with and without compact dtypes.
+
+    python -m benchmarks.peak_memory --rows 10000000
+
+Every (mode, stage) pair runs in a fresh interpreter, so each peak RSS is
+measured independently. The upload stage preprocesses the file in chunks and
+builds the MongoDB documents (without sending them). The /process stage holds
+all documents in memory, as returned by `find()`, and scores them; the same
+documents are used in both modes, so `scoring_rss_increase_mb` isolates what
+scoring adds on top of them.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import generate_housing_csv
+
+MODES = {"legacy": "false", "compact": "true"}
+STAGES = ("upload", "process")
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def upload(csv_path: str, compact: bool) -> int:
+    from analytics.drift import DriftProfile
+    from analytics.ingest import frame_to_records
+    from analytics.preprocessor import iter_preprocess_housing_data
+    from database_handler.db_queries import add_geo_locations
+
+    rows = 0
+    for X, y in iter_preprocess_housing_data(csv_path, profile=DriftProfile()):
+        if compact:
+            records = frame_to_records(X, y)
+        else:
+            records = X.assign(target=y).to_dict(orient="records")
+        add_geo_locations(records)
+        rows += len(records)
+    return rows
+
+
+def stored_documents(csv_path: str) -> list:
+    """
+    Documents as `find()` returns them: numeric fields, a GeoJSON location and
+    an ObjectId, all fresh Python objects. Identical for both modes.
+    """
+    from bson import ObjectId
+
+    from analytics.ingest import frame_to_records
+    from analytics.preprocessor import compact_features, iter_preprocess_housing_data
+    from database_handler.db_queries import add_geo_locations
+
+    documents = []
+    for X, y in iter_preprocess_housing_data(csv_path):
+        records = frame_to_records(compact_features(X), y)
+        add_geo_locations(records)
+        for record in records:
+            record["_id"] = ObjectId()
+        documents.extend(records)
+    return documents
+
+
+def run_stage(stage: str, csv_path: str) -> dict:
+    from config import Config
+
+    compact = Config.COMPACT_DTYPES
+    start = time.perf_counter()
+    result = {"stage": stage, "mode": "compact" if compact else "legacy"}
+
+    if stage == "upload":
+        result["rows"] = upload(csv_path, compact)
+    else:
+        from analytics.scoring import score_documents
+
+        documents = stored_documents(csv_path)
+        result["rows"] = len(documents)
+        result["documents_rss_mb"] = round(current_rss_mb(), 1)
+        start = time.perf_counter()
+        score_documents(documents)
+        result["scoring_rss_increase_mb"] = round(peak_rss_mb() - result["documents_rss_mb"], 1)
+
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def prepare_model(workdir: str) -> str:
+    """
+    Train a small forest and write a registry serving it, so that /process can
+    be measured without a trained production model.
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    from analytics.preprocessor import preprocess_housing_data
+
+    X, y = preprocess_housing_data(os.path.join("data", "housing.csv"))
+    model = RandomForestRegressor(n_estimators=20, max_depth=10, random_state=0, n_jobs=-1)
+    model.fit(X.to_numpy(dtype="float32"), y)
+
+    model_path = os.path.join(workdir, "model.joblib")
+    joblib.dump(model, model_path)
+    registry_path = os.path.join(workdir, "registry.json")
+    with open(registry_path, "w") as f:
+        json.dump({"models": [{"version": "bench", "path": model_path, "weight": 1.0}]}, f)
+    return registry_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", ".data"))
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--child", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.csv)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    csv_path = os.path.join(args.workdir, f"housing_{args.rows}.csv")
+    if not os.path.exists(csv_path):
+        generate_housing_csv(csv_path, args.rows)
+    registry_path = prepare_model(args.workdir)
+
+    results = []
+    for stage in args.stages:
+        for mode, compact in MODES.items():
+            env = dict(
+                os.environ,
+                COMPACT_DTYPES=compact,
+                MODEL_REGISTRY_FILE=registry_path,
+                LOG_LEVEL="WARNING",
+            )
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.peak_memory", "--child", stage, "--csv", csv_path],
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode != 0:
+                results.append({"stage": stage, "mode": mode, "error": completed.stderr[-2000:]})
+            else:
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            print(json.dumps(results[-1]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
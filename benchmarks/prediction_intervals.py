@@ -0,0 +1,71 @@
+"""
+Overhead of prediction intervals over a plain forest `predict`.
+
+    python -m benchmarks.prediction_intervals --rows 1000000 --trees 100
+
+Both paths score the same float32 matrix of synthetic rows with the same
+forest; the interval path also returns the requested quantiles and the
+standard deviation across trees.
+"""
+
+import argparse
+import json
+import time
+
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+
+def best_time(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    from sklearn.ensemble import RandomForestRegressor
+
+    from analytics.preprocessor import preprocess_housing_data
+    from models.registry import feature_matrix
+    from models.uncertainty import parse_quantiles, predict_with_intervals
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--quantiles", default="0.05,0.95")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    X_train, y_train = preprocess_housing_data("data/housing.csv")
+    model = RandomForestRegressor(
+        n_estimators=args.trees, max_depth=args.max_depth, random_state=0, n_jobs=-1
+    ).fit(feature_matrix(X_train), y_train)
+    rng = np.random.default_rng(0)
+    X = feature_matrix(X_train.iloc[rng.integers(0, len(X_train), args.rows)])
+    quantiles = parse_quantiles(args.quantiles)
+
+    predict_seconds = best_time(lambda: model.predict(X), args.repeat)
+    intervals_seconds = best_time(
+        lambda: predict_with_intervals(model, X, quantiles, std=True), args.repeat
+    )
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "trees": args.trees,
+                "quantiles": quantiles,
+                "predict_seconds": round(predict_seconds, 3),
+                "intervals_seconds": round(intervals_seconds, 3),
+                "overhead": round(intervals_seconds / predict_seconds - 1, 3),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Replay captured traffic against a running service and report per-endpoint latency.
+
+    python -m benchmarks.replay traffic.jsonl --url http://localhost:8000 --concurrency 16
+    python -m benchmarks.replay traffic.jsonl --rate 50 --output after.json --compare before.json
+    python -m benchmarks.replay traffic.jsonl --speed 2 --methods GET
+
+The input is a capture written with TRAFFIC_CAPTURE_ENABLED (see
+`monitoring.traffic`). Requests are replayed in their recorded order in one
+of three ways:
+- Default: a closed loop of `--concurrency` clients, each sending its next
+  request as soon as the previous one is answered.
+- `--rate`: an open loop sending requests at a fixed rate per second.
+- `--speed`: the recorded timing, compressed by a factor.
+Request bodies are read from the capture's body directory; requests whose
+body was too large to be stored are skipped.
+
+The report gives, per endpoint and overall: request count, throughput,
+status codes, error rate (5xx and transport errors) and latency
+percentiles next to the recorded ones. With `--compare`, every endpoint is
+compared with an earlier report; the run exits with status 1 if one got
+slower than `--tolerance` or its error rate grew.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.load_test import percentile
+from config import Config
+
+
+def load_traffic(path: str, body_dir: str, methods=None, limit: int = None):
+    """
+    Read a capture, keeping the requests that can be replayed.
+
+    Returns:
+        tuple: The records in order, and the number skipped for lack of a stored body.
+    """
+    records, skipped = [], 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if methods and record["method"] not in methods:
+                continue
+            body = record.get("body")
+            if body and not (
+                body.get("file") and os.path.exists(os.path.join(body_dir, body["file"]))
+            ):
+                skipped += 1
+                continue
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    return records, skipped
+
+
+def endpoint(record: dict) -> str:
+    return f"{record['method']} {record['path']}"
+
+
+async def send(http: httpx.AsyncClient, record: dict, body_dir: str) -> dict:
+    content = None
+    if record.get("body"):
+        path = os.path.join(body_dir, record["body"]["file"])
+        content = await asyncio.to_thread(_read_bytes, path)
+
+    start = time.perf_counter()
+    try:
+        response = await http.request(
+            record["method"],
+            record["path"],
+            params=record.get("query") or None,
+            headers=record.get("headers") or None,
+            content=content,
+        )
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return {
+        "endpoint": endpoint(record),
+        "status": status,
+        "seconds": time.perf_counter() - start,
+        "recorded_ms": record.get("duration_ms"),
+    }
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def replay(
+    http: httpx.AsyncClient,
+    records: list,
+    body_dir: str,
+    concurrency: int = 8,
+    rate: float = None,
+    speed: float = None,
+) -> list:
+    """
+    Send `records` through `http`, closed-loop with `concurrency` clients or
+    open-loop at `rate` requests per second or at `speed` times the recorded pace.
+
+    Returns:
+        list: One result per request: `endpoint`, `status`, `seconds` and the
+        recorded duration `recorded_ms`, in completion order.
+    """
+    if rate is None and speed is None:
+        pending = iter(records)
+        results = []
+
+        async def client():
+            for record in pending:
+                results.append(await send(http, record, body_dir))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = records[0]["ts"] if records else 0
+    tasks = []
+    for index, record in enumerate(records):
+        offset = index / rate if rate else (record["ts"] - first) / speed
+        delay = start + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(http, record, body_dir)))
+    return list(await asyncio.gather(*tasks))
+
+
+def _stats(results: list, seconds: float) -> dict:
+    latencies = [result["seconds"] * 1000 for result in results]
+    recorded = [result["recorded_ms"] for result in results if result["recorded_ms"] is not None]
+    errors = sum(
+        not isinstance(result["status"], int) or result["status"] >= 500 for result in results
+    )
+    return {
+        "requests": len(results),
+        "throughput": round(len(results) / seconds, 2) if seconds else None,
+        "statuses": dict(Counter(str(result["status"]) for result in results)),
+        "error_rate": round(errors / len(results), 4),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": round(max(latencies), 4),
+        },
+        "recorded_latency_ms": {
+            "p50": percentile(recorded, 0.5),
+            "p99": percentile(recorded, 0.99),
+        },
+    }
+
+
+def summarize(results: list, seconds: float) -> dict:
+    """
+    Per-endpoint and overall statistics of a replay. Throughput is requests
+    per second of the whole run; recorded latencies come from the capture.
+    """
+    by_endpoint = {}
+    for result in results:
+        by_endpoint.setdefault(result["endpoint"], []).append(result)
+    return {
+        "seconds": round(seconds, 3),
+        "overall": _stats(results, seconds),
+        "endpoints": {name: _stats(by_endpoint[name], seconds) for name in sorted(by_endpoint)},
+    }
+
+
+def compare_reports(report: dict, previous: dict, tolerance: float) -> list:
+    """
+    Compare the endpoints present in both reports.
+
+    Returns:
+        list: One dict per endpoint with the p50 and p99 ratios, both error
+        rates and whether it is a regression.
+    """
+    comparisons = []
+    for name, stats in report["endpoints"].items():
+        reference = previous.get("endpoints", {}).get(name)
+        if not reference:
+            continue
+        ratios = {
+            q: round(stats["latency_ms"][q] / reference["latency_ms"][q], 3)
+            if reference["latency_ms"][q]
+            else None
+            for q in ("p50", "p99")
+        }
+        comparisons.append(
+            {
+                "endpoint": name,
+                "p50_ratio": ratios["p50"],
+                "p99_ratio": ratios["p99"],
+                "error_rate": stats["error_rate"],
+                "previous_error_rate": reference["error_rate"],
+                "regression": any(ratio and ratio > 1 + tolerance for ratio in ratios.values())
+                or stats["error_rate"] > reference["error_rate"],
+            }
+        )
+    return comparisons
+
+
+async def run(args, records: list) -> dict:
+    limits = httpx.Limits(max_connections=None if args.rate or args.speed else args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as http:
+        start = time.perf_counter()
+        results = await replay(http, records, args.body_dir, args.concurrency, args.rate, args.speed)
+        seconds = time.perf_counter() - start
+    return summarize(results, seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("traffic", nargs="?", default=Config.TRAFFIC_FILE)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--body-dir", default=Config.TRAFFIC_BODY_DIR)
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--rate", type=float, help="Open loop: requests per second.")
+    pacing.add_argument("--speed", type=float, help="Open loop: recorded pace times this factor.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients.")
+    parser.add_argument("--methods", nargs="+", help="Only replay these methods, e.g. GET.")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests.")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="Write the report as JSON to this file.")
+    parser.add_argument("--compare", help="Earlier report to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    records, skipped = load_traffic(args.traffic, args.body_dir, args.methods, args.limit)
+    if not records:
+        sys.exit(f"No replayable requests in {args.traffic}.")
+    report = asyncio.run(run(args, records))
+    report["skipped_without_body"] = skipped
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare_reports(report, json.load(f), args.tolerance)
+        regressions = [c for c in report["comparison"] if c["regression"]]
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
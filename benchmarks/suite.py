@@ -0,0 +1,330 @@
+"""
+Throughput benchmarks of the data path, compared against a stored baseline.
+
+    python -m benchmarks.suite --sizes 10k 1m --output results.json
+    python -m benchmarks.suite --sizes 10k 1m --update-baseline
+    python -m benchmarks.suite --sizes 10k 1m --url http://localhost:8000
+
+For every size, a synthetic housing CSV (see `benchmarks.synthetic`) is timed
+through `preprocess_housing_data`, the model's `predict`,
+`insert_data_to_mongo` and `save_to_postgres`. The database stages write to a
+scratch `benchmark` database / `benchmark_predictions` table and are skipped
+when MongoDB (`MONGO_IP`) or PostgreSQL (`POSTGRES_HOST`) cannot be reached,
+e.g. start them with `docker-compose up mongodb postgresdb`. With `--url`, the
+`/upload` -> `/process` -> `/predicted_data` flow of a running service is
+timed as well, against the same scratch database and table.
+
+The results are written as JSON. When a baseline exists, every stage is
+compared with it and the run exits with status 1 if one is slower by more
+than `--tolerance`. Timings depend on the machine, so no baseline is shipped:
+record one with `--update-baseline` on the machine the comparisons run on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.peak_memory import prepare_model
+from benchmarks.synthetic import generate_housing_csv
+from config import Config, logger
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+STAGES = ("preprocess", "predict", "mongo_insert", "postgres_save", "end_to_end")
+BENCHMARK_DB = "benchmark"
+BENCHMARK_COLLECTION = "data"
+BENCHMARK_TABLE = "benchmark_predictions"
+
+
+def best_time(function, repeat: int, *args):
+    """
+    Run `function(*args)` `repeat` times. Returns the fastest time and the last result.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def stage_result(seconds: float, rows: int, **extra) -> dict:
+    return {
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        **extra,
+    }
+
+
+def mongo_unreachable():
+    """
+    Reason MongoDB cannot be used, or None if it answers a ping.
+    """
+    from database_handler.db_connector import get_mongo_client
+
+    try:
+        client = get_mongo_client(serverSelectionTimeoutMS=2000)
+        client.admin.command("ping")
+        client.close()
+    except Exception as e:
+        return f"MongoDB unreachable: {str(e).strip()[:200]}"
+    return None
+
+
+def postgres_unreachable():
+    """
+    Reason PostgreSQL cannot be used, or None if it accepts a connection.
+    """
+    from database_handler.db_connector import get_postgres_connection
+
+    try:
+        get_postgres_connection(Config.POSTGRES_DB, connect_timeout=2).close()
+    except Exception as e:
+        return f"PostgreSQL unreachable: {str(e).strip()[:200]}"
+    return None
+
+
+def bench_mongo_insert(X, y, repeat: int) -> dict:
+    from analytics.ingest import frame_to_records
+    from database_handler.db_connector import get_mongo_client
+    from database_handler.db_queries import insert_data_to_mongo
+
+    client = get_mongo_client()
+    collection = client[BENCHMARK_DB][BENCHMARK_COLLECTION]
+    timings = []
+    try:
+        for _ in range(repeat):
+            collection.drop()
+            # Documents are rebuilt every round: insert_many adds an _id to each
+            records = frame_to_records(X, y)
+            start = time.perf_counter()
+            insert_data_to_mongo(records, BENCHMARK_DB, BENCHMARK_COLLECTION)
+            timings.append(time.perf_counter() - start)
+    finally:
+        collection.drop()
+        client.close()
+    return stage_result(min(timings), len(X))
+
+
+def bench_postgres_save(X, predictions, repeat: int) -> dict:
+    from database_handler.db_connector import get_postgres_connection
+    from database_handler.db_queries import save_to_postgres
+
+    df = X.assign(
+        source_id=[str(i) for i in range(len(X))],
+        predictions=predictions,
+        model_version="bench",
+        shadow=False,
+        prediction_timestamp=datetime.now(),
+    )
+
+    def drop_table():
+        # psycopg2's connection context manager commits but does not close
+        conn = get_postgres_connection(Config.POSTGRES_DB)
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {BENCHMARK_TABLE};")
+        finally:
+            conn.close()
+
+    timings = []
+    try:
+        for _ in range(repeat):
+            drop_table()
+            start = time.perf_counter()
+            save_to_postgres(df, Config.POSTGRES_DB, BENCHMARK_TABLE)
+            timings.append(time.perf_counter() - start)
+    finally:
+        drop_table()
+    return stage_result(min(timings), len(df))
+
+
+def bench_end_to_end(url: str, csv_path: str, rows: int) -> dict:
+    """
+    Time /upload, /process and /predicted_data of a running service. The rows
+    are uploaded to the `benchmark` database and scored into the scratch
+    `benchmark_predictions` table, so the service's predictions table and
+    read models are left alone; both are emptied again afterwards.
+    """
+    import httpx
+
+    params = {"db_name": BENCHMARK_DB, "collection_name": BENCHMARK_COLLECTION}
+    table = {"table_name": BENCHMARK_TABLE}
+    steps = {}
+    with httpx.Client(base_url=url, timeout=None) as http:
+        http.delete("/api/delete_mongodb/", params={**params, "fast": True})
+        try:
+            start = time.perf_counter()
+            with open(csv_path, "rb") as f:
+                response = http.post(
+                    "/api/upload",
+                    params=params,
+                    files={"file": (os.path.basename(csv_path), f, "text/csv")},
+                )
+            response.raise_for_status()
+            steps["upload"] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            http.get("/api/process", params={**params, **table}).raise_for_status()
+            steps["process"] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            http.get("/api/predicted_data/", params={"limit": 100, **table}).raise_for_status()
+            steps["predicted_data"] = round(time.perf_counter() - start, 4)
+        finally:
+            http.delete("/api/delete_mongodb/", params={**params, "fast": True})
+            http.delete("/api/delete_predictions/", params=table)
+    return stage_result(sum(steps.values()), rows, steps=steps)
+
+
+def run_size(name: str, rows: int, args, model) -> dict:
+    from analytics.preprocessor import preprocess_housing_data
+    from models.registry import feature_matrix
+
+    csv_path = os.path.join(args.workdir, f"housing_{rows}_seed{args.seed}.csv")
+    if not os.path.exists(csv_path):
+        generate_housing_csv(csv_path, rows, seed=args.seed)
+    # Large sizes are timed once; a single run already takes long enough to be stable
+    repeat = args.repeat if rows <= 1_000_000 else 1
+    results = {}
+
+    seconds, (X, y) = best_time(preprocess_housing_data, repeat, csv_path)
+    results["preprocess"] = stage_result(seconds, len(X))
+
+    matrix = feature_matrix(X)
+    seconds, predictions = best_time(model.predict, repeat, matrix)
+    results["predict"] = stage_result(seconds, len(X))
+    del matrix
+
+    for stage, unreachable, bench in (
+        ("mongo_insert", mongo_unreachable, lambda: bench_mongo_insert(X, y, repeat)),
+        ("postgres_save", postgres_unreachable, lambda: bench_postgres_save(X, predictions, repeat)),
+    ):
+        if stage not in args.stages:
+            continue
+        reason = unreachable()
+        results[stage] = {"skipped": reason} if reason else bench()
+
+    if "end_to_end" in args.stages:
+        if args.url:
+            results["end_to_end"] = bench_end_to_end(args.url, csv_path, rows)
+        else:
+            results["end_to_end"] = {"skipped": "No --url of a running service given."}
+
+    for stage, result in results.items():
+        logger.info(f"[{name}] {stage}: {result}")
+    return {stage: result for stage, result in results.items() if stage in args.stages}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit or None,
+        "compact_dtypes": Config.COMPACT_DTYPES,
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare the timings of every (size, stage) present in both runs.
+
+    Args:
+        results (dict): Current run, as written by this module.
+        baseline (dict): Stored run to compare with.
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list: One dict per compared stage with both timings, their ratio and
+        whether it is a regression.
+    """
+    comparisons = []
+    for size, stages in results["sizes"].items():
+        for stage, result in stages.items():
+            reference = baseline.get("sizes", {}).get(size, {}).get(stage, {})
+            if "seconds" not in result or not reference.get("seconds"):
+                continue
+            ratio = result["seconds"] / reference["seconds"]
+            comparisons.append(
+                {
+                    "size": size,
+                    "stage": stage,
+                    "seconds": result["seconds"],
+                    "baseline_seconds": reference["seconds"],
+                    "ratio": round(ratio, 3),
+                    "regression": ratio > 1 + tolerance,
+                }
+            )
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["10k", "1m"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest counts.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="Base URL of a running service for the end-to-end flow.")
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", ".data"))
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", default=os.path.join("benchmarks", "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Store this run as the new baseline."
+    )
+    args = parser.parse_args()
+
+    import joblib
+
+    os.makedirs(args.workdir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as model_dir:
+        prepare_model(model_dir)
+        model = joblib.load(os.path.join(model_dir, "model.joblib"))
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": {name: run_size(name, SIZES[name], args, model) for name in args.sizes},
+    }
+
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["comparison"] = compare_to_baseline(results, baseline, args.tolerance)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Baseline written to {args.baseline}")
+
+    regressions = [c for c in results.get("comparison", []) if c["regression"]]
+    for comparison in regressions:
+        logger.warning(
+            f"Regression in {comparison['stage']} at {comparison['size']}: "
+            f"{comparison['seconds']}s vs {comparison['baseline_seconds']}s"
+        )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+
+from config import Config, logger
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Uppercase headers and short names, as in the files partners upload
+HEADER = [
+    "LONGITUDE",
+    "LAT",
+    "MEDIAN_AGE",
+    "ROOMS",
+    "BEDROOMS",
+    "POP",
+    "HOUSEHOLDS",
+    "MEDIAN_INCOME",
+    "MEDIAN_HOUSE_VALUE",
+    "OCEAN_PROXIMITY",
+    "AGENCY",
+]
+NULLABLE = ["MEDIAN_AGE", "ROOMS", "BEDROOMS", "POP", "HOUSEHOLDS", "MEDIAN_INCOME"]
+
+
+def generate_housing_csv(
+    path: str,
+    rows: int,
+    seed: int = 0,
+    null_fraction: float = 0.001,
+    chunk_size: int = 500_000,
+    template: str = Config.DATA_FILE,
+) -> str:
+    """
+    Write a synthetic housing CSV of any size.
+
+    Rows are resampled from `template` with jittered coordinates, and a
+    fraction of the numeric cells is replaced by the literal `Null`, like in
+    real uploads. The file is written in chunks, so memory does not grow with
+    `rows`.
+
+    Args:
+        path (str): Output CSV path.
+        rows (int): Number of data rows.
+        seed (int): Random seed; the same seed gives the same file.
+        null_fraction (float): Share of nullable cells written as `Null`.
+        chunk_size (int): Rows generated per chunk.
+        template (str): CSV in the upload format to resample from.
+
+    Returns:
+        str: The output path.
+    """
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(template)
+    source.columns = HEADER[: len(source.columns)]
+    for column in NULLABLE:
+        source[column] = pd.to_numeric(source[column], errors="coerce")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = 0
+    with open(path, "w", newline="") as f:
+        while written < rows:
+            n = min(chunk_size, rows - written)
+            chunk = source.iloc[rng.integers(0, len(source), n)].reset_index(drop=True)
+            chunk["LONGITUDE"] = (chunk["LONGITUDE"] + rng.normal(0, 0.01, n)).round(4)
+            chunk["LAT"] = (chunk["LAT"] + rng.normal(0, 0.01, n)).round(4)
+            for column in NULLABLE:
+                values = chunk[column].astype(object)
+                values[rng.random(n) < null_fraction] = "Null"
+                chunk[column] = values
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += n
+
+    logger.info(f"Wrote {rows} synthetic rows to {path}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic housing CSV.")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--null-fraction", type=float, default=0.001)
+    args = parser.parse_args()
+    generate_housing_csv(args.output, args.rows, args.seed, args.null_fraction)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,16 @@ class Config:
     ENV_LOCAL_DOCKER = "0.0.0.0"  # For docker 0.0.0.0, for local localhost
 
     # MongoDB Configuration
-    MONGO_IP = (
-        "mongodb"  # localhost for local debuging / mongodb for dockerized solution
-    )
+    MONGO_IP = os.getenv(
+        "MONGO_IP", "mongodb"
+    )  # localhost for local debuging / mongodb for dockerized solution
     MONGO_DB_NAME = "housing"
     MONGO_COLLECTION = "data"
 
     # PostgreSQL Configuration
     POSTGRES_DB = "predictions"
     POSTGRES_table = "predictions"
+    POSTGRES_GRID_TABLE = "prediction_grid"
     POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
     POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
     POSTGRES_HOST = os.getenv(
@@ -24,9 +25,117 @@ class Config:
 
     # File Paths
     DATA_FILE = os.path.join("data", "housing.csv")
-    MODEL_FILE = os.path.join("models", "model.joblib")
+    MODEL_FILE = os.getenv("MODEL_FILE", os.path.join("models", "model.joblib"))
     PREDICTIONS_FILE = "predictions.csv"
 
+    # Model registry: versions with traffic weights or shadow mode
+    MODEL_REGISTRY_FILE = os.getenv(
+        "MODEL_REGISTRY_FILE", os.path.join("models", "registry.json")
+    )
+    DEFAULT_MODEL_VERSION = os.getenv("DEFAULT_MODEL_VERSION", "default")
+
+    # Prediction intervals from per-tree outputs, e.g. PREDICTION_QUANTILES=0.05,0.95
+    PREDICTION_QUANTILES = tuple(
+        float(q) for q in os.getenv("PREDICTION_QUANTILES", "").split(",") if q.strip()
+    )
+    PREDICTION_STD = os.getenv("PREDICTION_STD", "false").lower() == "true"
+
+    # Spatial index over the latest predictions
+    SPATIAL_INDEX_MAX_SEGMENTS = int(os.getenv("SPATIAL_INDEX_MAX_SEGMENTS", 8))
+
+    # Change stream consumer scoring inserted documents (needs a replica set)
+    CHANGE_STREAM_ENABLED = os.getenv("CHANGE_STREAM_ENABLED", "false").lower() == "true"
+    CHANGE_STREAM_BATCH_SIZE = int(os.getenv("CHANGE_STREAM_BATCH_SIZE", 1000))
+    CHANGE_STREAM_MAX_WAIT = float(os.getenv("CHANGE_STREAM_MAX_WAIT", 2.0))
+    CHANGE_STREAM_STATE_COLLECTION = os.getenv("CHANGE_STREAM_STATE_COLLECTION", "stream_state")
+
+    # Multi-resolution grid rollups of predictions
+    GRID_MIN_ZOOM = int(os.getenv("GRID_MIN_ZOOM", 4))
+    GRID_MAX_ZOOM = int(os.getenv("GRID_MAX_ZOOM", 14))
+    GRID_CACHE_SIZE = int(os.getenv("GRID_CACHE_SIZE", 256))
+    GRID_CACHE_TTL = float(os.getenv("GRID_CACHE_TTL", 30))
+
+    # Conditional GET of read endpoints: rendered responses per query and data
+    # version, and the per-collection write counters behind those versions
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+    # Larger bodies are served but not cached, bounding the cache at SIZE x MAX_BODY_KB
+    RESPONSE_CACHE_MAX_BODY_KB = int(os.getenv("RESPONSE_CACHE_MAX_BODY_KB", 256))
+    VERSION_COLLECTION = os.getenv("VERSION_COLLECTION", "collection_versions")
+    # Seconds a version bump or lookup waits for MongoDB before giving up
+    VERSION_TIMEOUT = float(os.getenv("VERSION_TIMEOUT", 2))
+
+    # Upload ingestion: rows per chunk, worker processes (0 for one per core)
+    PREPROCESS_CHUNK_SIZE = int(os.getenv("PREPROCESS_CHUNK_SIZE", 50000))
+    UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 0)) or None
+    # float32 features and uint8 one-hot columns from preprocessing to the model
+    COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "true").lower() == "true"
+
+    # Drift sketches of uploads and predictions
+    DRIFT_COLLECTION = os.getenv("DRIFT_COLLECTION", "drift_profiles")
+    DRIFT_BASELINE_FILE = os.getenv(
+        "DRIFT_BASELINE_FILE", os.path.join("models", "drift_baseline.json")
+    )
+    DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", 0.2))
+
+    # Background dependency checks answering the health probes
+    HEALTH_CHECKS_ENABLED = os.getenv("HEALTH_CHECKS_ENABLED", "true").lower() == "true"
+    HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 5.0))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2.0))
+
+    # Parallel /process: _id ranges scored on a process pool (0 workers for one
+    # per core), streamed in batches, each range retried on its own
+    PROCESS_PARALLEL = os.getenv("PROCESS_PARALLEL", "false").lower() == "true"
+    PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", 0)) or None
+    PROCESS_PARTITIONS_PER_WORKER = int(os.getenv("PROCESS_PARTITIONS_PER_WORKER", 4))
+    PROCESS_BATCH_SIZE = int(os.getenv("PROCESS_BATCH_SIZE", 50000))
+    PROCESS_PARTITION_RETRIES = int(os.getenv("PROCESS_PARTITION_RETRIES", 2))
+
+    # Admission control of heavy routes: concurrent requests and memory budget
+    # (MB, 0 for none) per route class, plus a bounded queue for the rest
+    ADMISSION_UPLOAD_CONCURRENCY = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", 2))
+    ADMISSION_UPLOAD_MEMORY_MB = float(os.getenv("ADMISSION_UPLOAD_MEMORY_MB", 1024))
+    ADMISSION_PROCESS_CONCURRENCY = int(os.getenv("ADMISSION_PROCESS_CONCURRENCY", 1))
+    ADMISSION_PROCESS_MEMORY_MB = float(os.getenv("ADMISSION_PROCESS_MEMORY_MB", 2048))
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 8))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 30.0))
+    # Memory estimates: per upload worker process, per document scored by /process
+    UPLOAD_WORKER_MEMORY_MB = float(os.getenv("UPLOAD_WORKER_MEMORY_MB", 256))
+    PROCESS_BYTES_PER_DOCUMENT = int(os.getenv("PROCESS_BYTES_PER_DOCUMENT", 2000))
+    # Seconds /process waits for MongoDB to count the documents before admission
+    PROCESS_COUNT_TIMEOUT = float(os.getenv("PROCESS_COUNT_TIMEOUT", 5))
+
+    # On-demand profiling (X-Profile header, /admin/profile); off by default
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+
+    # Tracing: W3C traceparent propagation, spans exported as OTLP/JSON lines
+    # to TRACE_FILE ("file") or the log ("console")
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", 0.1))
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+    SERVICE_NAME = os.getenv("SERVICE_NAME", "housing-api")
+
+    # Traffic capture for replay load tests (benchmarks.replay): one JSON line
+    # per request, request bodies up to TRAFFIC_MAX_BODY_MB stored by hash
+    TRAFFIC_CAPTURE_ENABLED = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+    TRAFFIC_FILE = os.getenv("TRAFFIC_FILE", "traffic.jsonl")
+    TRAFFIC_BODY_DIR = os.getenv("TRAFFIC_BODY_DIR", "traffic_bodies")
+    TRAFFIC_MAX_BODY_MB = float(os.getenv("TRAFFIC_MAX_BODY_MB", 64))
+    TRAFFIC_SAMPLE_RATIO = float(os.getenv("TRAFFIC_SAMPLE_RATIO", 1.0))
+    # Path prefixes not captured, e.g. probes and admin calls
+    TRAFFIC_EXCLUDE = tuple(
+        prefix.strip()
+        for prefix in os.getenv("TRAFFIC_EXCLUDE", "/api/health,/api/ready,/api/admin").split(",")
+        if prefix.strip()
+    )
+
+    # Startup: import heavy modules and load the model in the background
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
     # Expected Features for Model
     EXPECTED_FEATURES = [
         "longitude",
@@ -1,24 +1,27 @@
 import logging
-import psycopg2
 
-from pymongo import MongoClient
 from config import Config
+from utils.lazy_import import lazy_import
+
+psycopg2 = lazy_import("psycopg2")
+pymongo = lazy_import("pymongo")
 
 logger = logging.getLogger(__name__)
 
 
-def get_mongo_client(mongo_uri=f"mongodb://{Config.MONGO_IP}:27017"):
+def get_mongo_client(mongo_uri=f"mongodb://{Config.MONGO_IP}:27017", **options):
     """
     Get a MongoDB client.
 
     Args:
         mongo_uri (str): MongoDB connection string.
+        **options: Extra MongoClient options, e.g. `serverSelectionTimeoutMS`.
 
     Returns:
         MongoClient: MongoDB client instance.
     """
     try:
-        client = MongoClient(mongo_uri)
+        client = pymongo.MongoClient(mongo_uri, **options)
         logger.info("Connected to MongoDB.")
         return client
     except Exception as e:
@@ -26,12 +29,13 @@ def get_mongo_client(mongo_uri=f"mongodb://{Config.MONGO_IP}:27017"):
         raise
 
 
-def get_postgres_connection(db_name: str):
+def get_postgres_connection(db_name: str, **options):
     """
     Get a PostgreSQL connection.
 
     Args:
         db_name (str): PostgreSQL database name.
+        **options: Extra connection parameters, e.g. `connect_timeout`.
         user (str): Database username.
         password (str): Database password.
         host (str): Database host.
@@ -47,6 +51,7 @@ def get_postgres_connection(db_name: str):
             password=Config.POSTGRES_PASSWORD,
             host=Config.POSTGRES_HOST,
             port=Config.POSTGRES_PORT,
+            **options,
         )
         logger.info(f"Connecting to database: {db_name}")
         logger.info("Connected to PostgreSQL.")
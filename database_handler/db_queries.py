@@ -1,14 +1,28 @@
+from __future__ import annotations
+
+import io
 import logging
-import pandas as pd
 from datetime import datetime
 
-from psycopg2.extras import execute_values
 from database_handler.db_connector import get_mongo_client, get_postgres_connection
+from monitoring.tracing import current_span, traced, traced_db
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+pymongo = lazy_import("pymongo")
+psycopg2_extras = lazy_import("psycopg2.extras")
 
 logger = logging.getLogger(__name__)
 
+# GeoJSON point added to raw documents for the 2dsphere index
+GEO_FIELD = "location"
+# Server codes of create_index when an index of that name or key already
+# exists with other options or keys (IndexOptionsConflict, IndexKeySpecsConflict)
+INDEX_CONFLICT_CODES = (85, 86)
+
 
 # MongoDB Queries
+@traced_db("mongodb", "collection_name")
 def insert_data_to_mongo(data, db_name, collection_name):
     """
     Inserts preprocessed data into a MongoDB collection.
@@ -24,12 +38,195 @@ def insert_data_to_mongo(data, db_name, collection_name):
     collection = db[collection_name]
 
     if data:
+        add_geo_locations(data)
+        collection.create_index([(GEO_FIELD, "2dsphere")])
         collection.insert_many(data)
+        current_span().set_attribute("db.rows", len(data))
         logger.info(f"Inserted {len(data)} records into {db_name}.{collection_name}")
 
     client.close()
 
 
+@traced()
+def add_geo_locations(data):
+    """
+    Add a GeoJSON point built from `longitude`/`latitude` to every record with
+    valid coordinates, so the records can be served by a 2dsphere index.
+
+    Args:
+        data (list): List of dictionaries, updated in place.
+    """
+    current_span().set_attribute("rows", len(data))
+    for record in data:
+        longitude, latitude = record.get("longitude"), record.get("latitude")
+        try:
+            if -180 <= longitude <= 180 and -90 <= latitude <= 90:
+                record[GEO_FIELD] = {
+                    "type": "Point",
+                    "coordinates": [float(longitude), float(latitude)],
+                }
+        except TypeError:
+            continue
+
+
+@traced_db("mongodb", "collection_name")
+def find_raw_near(
+    db_name: str,
+    collection_name: str,
+    longitude: float,
+    latitude: float,
+    radius_km: float,
+    limit: int = 100,
+):
+    """
+    Find raw documents within `radius_km` of a point using the 2dsphere index, nearest first.
+
+    Args:
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection name.
+        longitude (float): Longitude of the query point.
+        latitude (float): Latitude of the query point.
+        radius_km (float): Search radius in kilometres.
+        limit (int): Maximum number of documents to return.
+
+    Returns:
+        list: Matching documents with `_id` converted to a string.
+    """
+    client = get_mongo_client()
+    try:
+        collection = client[db_name][collection_name]
+        query = {
+            GEO_FIELD: {
+                "$nearSphere": {
+                    "$geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                    "$maxDistance": radius_km * 1000,
+                }
+            }
+        }
+        documents = list(collection.find(query).limit(limit))
+        for document in documents:
+            document["_id"] = str(document["_id"])
+        current_span().set_attribute("db.rows", len(documents))
+        logger.info(f"Found {len(documents)} documents near ({longitude}, {latitude})")
+        return documents
+    finally:
+        client.close()
+
+
+@traced_db("mongodb", "collection_name")
+def save_drift_profile(profile: dict, kind: str, source: str, db_name: str, collection_name: str):
+    """
+    Store a serialized drift profile (one per upload or scoring run).
+
+    Args:
+        profile (dict): Output of `DriftProfile.to_dict`.
+        kind (str): "upload" for feature sketches, "predictions" for scoring runs.
+        source (str): Where the rows came from, e.g. the uploaded file name.
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection holding the profiles.
+
+    Returns:
+        str: Id of the stored profile.
+    """
+    client = get_mongo_client()
+    try:
+        result = client[db_name][collection_name].insert_one(
+            {"kind": kind, "source": source, "created_at": datetime.now(), "profile": profile}
+        )
+        logger.info(f"Stored {kind} drift profile for {source} in {db_name}.{collection_name}")
+        return str(result.inserted_id)
+    finally:
+        client.close()
+
+
+@traced_db("mongodb", "collection_name")
+def fetch_drift_profiles(db_name: str, collection_name: str, kind: str, limit: int = 0):
+    """
+    Fetch stored drift profiles of a kind, newest first.
+
+    Args:
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection holding the profiles.
+        kind (str): "upload" or "predictions".
+        limit (int): Maximum number of profiles, 0 for all.
+
+    Returns:
+        list: Profile documents with `_id` converted to a string.
+    """
+    client = get_mongo_client()
+    try:
+        documents = list(
+            client[db_name][collection_name]
+            .find({"kind": kind})
+            .sort("created_at", -1)
+            .limit(limit)
+        )
+        for document in documents:
+            document["_id"] = str(document["_id"])
+        current_span().set_attribute("db.rows", len(documents))
+        return documents
+    finally:
+        client.close()
+
+
+@traced_db("mongodb", "collection_name")
+def bump_collection_version(
+    db_name: str, collection_name: str, versions_collection: str, **client_options
+):
+    """
+    Count a write to a collection, so that cached reads of it are invalidated.
+
+    Args:
+        db_name (str): MongoDB database name.
+        collection_name (str): Collection that was written.
+        versions_collection (str): Collection holding one counter per collection.
+        **client_options: MongoClient options, e.g. `serverSelectionTimeoutMS`.
+
+    Returns:
+        int: The new version.
+    """
+    client = get_mongo_client(**client_options)
+    try:
+        document = client[db_name][versions_collection].find_one_and_update(
+            {"_id": collection_name},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now()}},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+        return document["version"]
+    finally:
+        client.close()
+
+
+@traced_db("mongodb", "collection_name")
+def fetch_collection_version(
+    db_name: str, collection_name: str, versions_collection: str, **client_options
+):
+    """
+    Cheap version token of a collection: its write counter and the document
+    count from the collection metadata, which also changes on writes that
+    bypass the API. Neither reads any document of the collection.
+
+    Args:
+        **client_options: MongoClient options, e.g. `serverSelectionTimeoutMS`.
+
+    Returns:
+        dict: `version`, `updated_at` (None if never counted) and `documents`.
+    """
+    client = get_mongo_client(**client_options)
+    try:
+        db = client[db_name]
+        document = db[versions_collection].find_one({"_id": collection_name}) or {}
+        return {
+            "version": document.get("version", 0),
+            "updated_at": document.get("updated_at"),
+            "documents": db[collection_name].estimated_document_count(),
+        }
+    finally:
+        client.close()
+
+
+@traced_db("mongodb", "collection_name")
 def delete_all_from_mongo(db_name: str, collection_name: str):
     """
     Deletes all documents from the specified MongoDB collection.
@@ -45,6 +242,7 @@ def delete_all_from_mongo(db_name: str, collection_name: str):
 
         # Delete all documents
         result = collection.delete_many({})
+        current_span().set_attribute("db.rows", result.deleted_count)
         logger.info(
             f"Deleted {result.deleted_count} documents from {db_name}.{collection_name}"
         )
@@ -55,13 +253,85 @@ def delete_all_from_mongo(db_name: str, collection_name: str):
         client.close()
 
 
+@traced_db("mongodb", "collection_name")
+def drop_and_recreate_mongo_collection(db_name: str, collection_name: str):
+    """
+    Empties a MongoDB collection by dropping it and recreating it together with
+    its collection options and secondary indexes. Unlike `delete_many({})` this
+    does not remove (and log) every document individually.
+
+    The drop and the recreation are not atomic: a write in between recreates
+    the collection implicitly, with default options. That collection is kept,
+    and the indexes are recreated on it idempotently; existing indexes of the
+    same name and key are left as they are.
+
+    Args:
+        db_name (str): MongoDB database name.
+        collection_name (str): MongoDB collection name.
+
+    Returns:
+        int: Estimated number of documents held by the collection before the drop.
+    """
+    try:
+        client = get_mongo_client()
+        db = client[db_name]
+        collection = db[collection_name]
+
+        # Remember what has to be rebuilt after the drop
+        options = collection.options()
+        indexes = [
+            (name, dict(spec))
+            for name, spec in collection.index_information().items()
+            if name != "_id_"
+        ]
+        dropped_count = collection.estimated_document_count()
+        current_span().set_attribute("db.rows", dropped_count)
+
+        collection.drop()
+        try:
+            db.create_collection(collection_name, **options)
+        except pymongo.errors.CollectionInvalid:
+            logger.warning(
+                f"{db_name}.{collection_name} was recreated by a concurrent write; "
+                "keeping it without its previous collection options"
+            )
+        for name, spec in indexes:
+            keys = spec.pop("key")
+            for internal_field in ("v", "ns"):
+                spec.pop(internal_field, None)
+            try:
+                collection.create_index(keys, name=name, **spec)
+            except pymongo.errors.OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    raise
+                logger.warning(f"Keeping the existing index {name} on {collection_name}: {e}")
+
+        logger.info(
+            f"Dropped and recreated {db_name}.{collection_name} "
+            f"(~{dropped_count} documents, {len(indexes)} indexes restored)"
+        )
+        return dropped_count
+    except Exception as e:
+        logger.error(f"Error recreating collection {db_name}.{collection_name}: {e}")
+        raise
+    finally:
+        client.close()
+
+
 # PostgreSQL Queries
+@traced_db("postgresql", "table_name")
 def save_to_postgres(df: pd.DataFrame, db_name: str, table_name: str):
     """
-    Save a DataFrame to a PostgreSQL table with versioning.
+    Save predictions to a PostgreSQL table, idempotently.
+
+    Every row is keyed by the document it was computed from (`source_id`) and
+    the model version, backed by a unique index. Rows are bulk-loaded into a
+    temporary staging table with COPY and merged with a single
+    `INSERT ... ON CONFLICT DO UPDATE`, so reprocessing the same documents
+    updates their predictions instead of appending duplicates.
 
     Args:
-        df (pd.DataFrame): DataFrame to save.
+        df (pd.DataFrame): DataFrame to save, including `source_id` and `model_version`.
         db_name (str): PostgreSQL database name.
         table_name (str): Table name.
     """
@@ -73,6 +343,7 @@ def save_to_postgres(df: pd.DataFrame, db_name: str, table_name: str):
         create_table_query = f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             id SERIAL PRIMARY KEY,
+            source_id TEXT,
             longitude REAL,
             latitude REAL,
             housing_median_age REAL,
@@ -87,22 +358,85 @@ def save_to_postgres(df: pd.DataFrame, db_name: str, table_name: str):
             ocean_proximity_NEAR_BAY REAL,
             ocean_proximity_NEAR_OCEAN REAL,
             predictions REAL,
+            model_version TEXT,
+            shadow BOOLEAN DEFAULT FALSE,
             prediction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS model_version TEXT;
+        ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS shadow BOOLEAN DEFAULT FALSE;
+        ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS source_id TEXT;
         """
+        # Optional prediction interval columns (quantiles, standard deviation)
+        for column in df.columns:
+            if column.startswith("prediction_") and column != "prediction_timestamp":
+                create_table_query += (
+                    f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column} REAL;\n"
+                )
         cursor.execute(create_table_query)
+        hypertable = _is_hypertable(cursor, table_name)
+        if not hypertable:
+            # Rows written before source ids existed have NULL keys and never conflict
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_source_version_key "
+                f"ON {table_name} (source_id, model_version);"
+            )
+            # Hypertables index their time column already; the version token
+            # of reads needs min/max of it without a scan
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_timestamp_idx "
+                f"ON {table_name} (prediction_timestamp);"
+            )
         conn.commit()
         logger.info(f"Table {table_name} created (if not exists).")
 
-        # Prepare data for insertion
+        # Bulk-load the batch into a staging table
         columns = list(df.columns)
-        values = [tuple(x) for x in df.to_numpy()]
-        insert_query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s"
+        column_list = ", ".join(columns)
+        staging_table = f"{table_name}_staging"
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS
+            SELECT {column_list} FROM {table_name} WITH NO DATA;
+            """
+        )
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        current_span().set_attributes({"db.rows": len(df), "db.bytes": buffer.tell()})
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
 
-        # Insert data
-        execute_values(cursor, insert_query, values)
+        # Merge the batch in one statement, keeping the last row per key
+        latest_rows = f"""
+            SELECT DISTINCT ON (source_id, model_version) {column_list}
+            FROM {staging_table}
+            ORDER BY source_id, model_version, prediction_timestamp DESC
+        """
+        if hypertable:
+            # TimescaleDB unique indexes must include the time column, so replace
+            # the stored rows of the batch instead of upserting them
+            cursor.execute(
+                f"""
+                DELETE FROM {table_name} AS t USING {staging_table} AS s
+                WHERE t.source_id = s.source_id AND t.model_version = s.model_version;
+                INSERT INTO {table_name} ({column_list}) {latest_rows};
+                """
+            )
+        else:
+            updates = ", ".join(
+                f"{column} = EXCLUDED.{column}"
+                for column in columns
+                if column not in ("source_id", "model_version")
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {table_name} ({column_list}) {latest_rows}
+                ON CONFLICT (source_id, model_version) DO UPDATE SET {updates};
+                """
+            )
         conn.commit()
-        logger.info(f"Inserted {len(values)} records into {table_name}.")
+        logger.info(f"Upserted {len(df)} records into {table_name}.")
 
         # Close the connection
         cursor.close()
@@ -113,6 +447,7 @@ def save_to_postgres(df: pd.DataFrame, db_name: str, table_name: str):
         raise
 
 
+@traced_db("postgresql", "table_name")
 def fetch_predictions(conn, table_name: str, limit: int = 10, skip: int = 0):
     """
     Fetch predictions from the PostgreSQL table.
@@ -129,6 +464,7 @@ def fetch_predictions(conn, table_name: str, limit: int = 10, skip: int = 0):
 
         cursor.execute(query)
         results = cursor.fetchall()
+        current_span().set_attribute("db.rows", len(results))
 
         if not results:
             logger.warning("No rows fetched from the database.")
@@ -151,3 +487,219 @@ def fetch_predictions(conn, table_name: str, limit: int = 10, skip: int = 0):
     except Exception as e:
         logger.error(f"Error fetching predictions: {e}")
         raise
+
+
+@traced_db("postgresql", "table_name")
+def fetch_predictions_version(conn, table_name: str):
+    """
+    Cheap version token of a predictions table, answered from its indexes.
+
+    The highest id changes with every insert, the newest timestamp with every
+    upsert of a scoring run, and the oldest timestamp when old predictions
+    are purged.
+
+    Returns:
+        tuple: Highest id, oldest and newest `prediction_timestamp` (None for an empty table).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT max(id), min(prediction_timestamp), max(prediction_timestamp)
+            FROM public.{table_name};
+            """
+        )
+        return tuple(cursor.fetchone())
+    finally:
+        cursor.close()
+
+
+@traced_db("postgresql", "table_name")
+def fetch_latest_prediction_points(conn, table_name: str):
+    """
+    Fetch coordinates and served predictions of the most recent prediction run.
+
+    Returns:
+        tuple: Lists of longitudes, latitudes and predictions.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT longitude, latitude, predictions FROM {table_name}
+            WHERE shadow IS NOT TRUE
+              AND prediction_timestamp = (SELECT max(prediction_timestamp) FROM {table_name});
+            """
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        current_span().set_attribute("db.rows", len(rows))
+        logger.info(f"Fetched {len(rows)} prediction points from {table_name}.")
+        if not rows:
+            return [], [], []
+        longitudes, latitudes, predictions = zip(*rows)
+        return list(longitudes), list(latitudes), list(predictions)
+    except Exception as e:
+        logger.error(f"Error fetching prediction points: {e}")
+        raise
+
+
+@traced_db("postgresql", "table_name")
+def save_grid_rollup(rollup: pd.DataFrame, db_name: str, table_name: str, mode: str = "replace"):
+    """
+    Store precomputed grid cells of predictions.
+
+    Args:
+        rollup (pd.DataFrame): Cells as returned by `compute_grid_rollup`.
+        db_name (str): PostgreSQL database name.
+        table_name (str): Grid table name.
+        mode (str): "replace" swaps the whole table content in one transaction,
+            "merge" adds the cells to the existing aggregates.
+    """
+    if mode not in ("replace", "merge"):
+        raise ValueError(f"Unknown grid rollup mode: {mode}")
+
+    conn = get_postgres_connection(db_name)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                zoom SMALLINT NOT NULL,
+                cell_x INTEGER NOT NULL,
+                cell_y INTEGER NOT NULL,
+                count BIGINT NOT NULL,
+                sum DOUBLE PRECISION NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (zoom, cell_x, cell_y)
+            );
+            """
+        )
+        if mode == "replace":
+            cursor.execute(f"TRUNCATE TABLE {table_name};")
+
+        columns = ["zoom", "cell_x", "cell_y", "count", "sum", "min", "max"]
+        values = list(rollup[columns].itertuples(index=False, name=None))
+        current_span().set_attribute("db.rows", len(values))
+        psycopg2_extras.execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s
+            ON CONFLICT (zoom, cell_x, cell_y) DO UPDATE SET
+                count = {table_name}.count + EXCLUDED.count,
+                sum = {table_name}.sum + EXCLUDED.sum,
+                min = LEAST({table_name}.min, EXCLUDED.min),
+                max = GREATEST({table_name}.max, EXCLUDED.max),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            values,
+            page_size=10_000,
+        )
+        conn.commit()
+        cursor.close()
+        logger.info(f"Saved {len(values)} grid cells to {table_name} ({mode}).")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to save grid rollup to {table_name}: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+@traced_db("postgresql", "table_name")
+def fetch_grid_cells(conn, table_name: str, zoom: int, x_min: int, x_max: int, y_min: int, y_max: int):
+    """
+    Fetch the precomputed cells of a zoom level within a cell range.
+
+    Returns:
+        list: Cells as dicts with `cell_x`, `cell_y`, `count`, `mean`, `min` and `max`.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT cell_x, cell_y, count, sum / count AS mean, min, max
+            FROM {table_name}
+            WHERE zoom = %s AND cell_x BETWEEN %s AND %s AND cell_y BETWEEN %s AND %s;
+            """,
+            (zoom, x_min, x_max, y_min, y_max),
+        )
+        columns = [desc[0] for desc in cursor.description]
+        cells = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.close()
+        current_span().set_attribute("db.rows", len(cells))
+        logger.info(f"Fetched {len(cells)} grid cells at zoom {zoom} from {table_name}.")
+        return cells
+    except Exception as e:
+        logger.error(f"Error fetching grid cells: {e}")
+        raise
+
+
+def _is_hypertable(cursor, table_name: str) -> bool:
+    """
+    Check whether a table is a TimescaleDB hypertable.
+    """
+    cursor.execute(
+        "SELECT to_regclass('timescaledb_information.hypertables') IS NOT NULL;"
+    )
+    if not cursor.fetchone()[0]:
+        return False
+
+    cursor.execute(
+        "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = %s;",
+        (table_name,),
+    )
+    return cursor.fetchone() is not None
+
+
+@traced_db("postgresql", "table_name")
+def purge_predictions(db_name: str, table_name: str, older_than=None):
+    """
+    Remove predictions from a PostgreSQL table without row-level deletes where possible.
+
+    Without a cutoff the table is truncated. With a cutoff, TimescaleDB chunks
+    older than it are dropped; plain tables fall back to a `DELETE` on
+    `prediction_timestamp`.
+
+    Args:
+        db_name (str): PostgreSQL database name.
+        table_name (str): Table name.
+        older_than (datetime, optional): Only purge predictions older than this.
+
+    Returns:
+        dict: The purge method used and, where known, the number of removed rows or chunks.
+    """
+    conn = get_postgres_connection(db_name)
+    try:
+        cursor = conn.cursor()
+
+        if older_than is None:
+            cursor.execute(f"TRUNCATE TABLE {table_name};")
+            result = {"method": "truncate"}
+        elif _is_hypertable(cursor, table_name):
+            cursor.execute(
+                "SELECT drop_chunks(%s, older_than => %s);", (table_name, older_than)
+            )
+            result = {"method": "drop_chunks", "chunks_dropped": cursor.rowcount}
+        else:
+            logger.warning(
+                f"Table {table_name} is not a hypertable, falling back to row-level delete."
+            )
+            cursor.execute(
+                f"DELETE FROM {table_name} WHERE prediction_timestamp < %s;",
+                (older_than,),
+            )
+            result = {"method": "delete", "rows_deleted": cursor.rowcount}
+
+        conn.commit()
+        cursor.close()
+        logger.info(f"Purged predictions from {table_name}: {result}")
+        return result
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to purge predictions from {table_name}: {e}")
+        raise
+    finally:
+        conn.close()
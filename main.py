@@ -1,9 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes.routes import router
 import uvicorn
 from config import logger, Config
+from monitoring.health import health_monitor
+from monitoring.profiling import profiling_middleware
+from monitoring.startup import startup_report, warmup
+from monitoring.tracing import tracing_middleware
+from monitoring.traffic import TrafficCaptureMiddleware
+from workers.change_stream import change_stream_consumer
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in a worker thread so that /health answers while heavy modules load
+    warmup_task = None
+    if Config.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warmup))
+    else:
+        startup_report.warmup_complete = True
+    if Config.HEALTH_CHECKS_ENABLED:
+        health_monitor.start()
+    if Config.CHANGE_STREAM_ENABLED:
+        change_stream_consumer.start()
+    yield
+    if Config.CHANGE_STREAM_ENABLED:
+        change_stream_consumer.stop()
+    if Config.HEALTH_CHECKS_ENABLED:
+        health_monitor.stop()
+    if warmup_task is not None and not warmup_task.done():
+        logger.info("Waiting for warmup to finish before shutdown...")
+        await warmup_task
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Profiling is opt-in; without the middleware requests carry no profiling cost
+if Config.PROFILING_ENABLED:
+    if not Config.PROFILE_TOKEN:
+        logger.error(
+            "PROFILING_ENABLED is set without PROFILE_TOKEN: all profiling requests "
+            "will be refused with 403. Set PROFILE_TOKEN to use profiling."
+        )
+    app.middleware("http")(profiling_middleware)
+if Config.TRACING_ENABLED:
+    app.middleware("http")(tracing_middleware)
+# Outermost, so that captured durations include the other middlewares
+if Config.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware)
 
 # Include routes
 try:
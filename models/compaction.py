@@ -0,0 +1,343 @@
+import io
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+TREE_LEAF = -1
+PREDICT_BATCH_ROWS = 65_536
+
+
+class CompactForest:
+    """
+    Regression forest stored as flat float32/int32 node arrays.
+
+    All trees share one set of arrays; `roots` holds the index of each tree's
+    root node and leaves have `left == right == TREE_LEAF`. Prediction walks
+    every tree for a whole batch of rows at once, one tree level per step.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_forest(cls, forest, tree_indices=None, max_depth=None):
+        """
+        Convert a fitted sklearn forest (or a subset of its trees) to a compact forest.
+
+        Args:
+            forest: Fitted RandomForestRegressor (or any forest with `estimators_`).
+            tree_indices (list, optional): Trees to keep; all trees by default.
+            max_depth (int, optional): Turn nodes at this depth into leaves.
+
+        Returns:
+            CompactForest: The compact forest.
+        """
+        if tree_indices is None:
+            tree_indices = range(len(forest.estimators_))
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        depth = 0
+        for tree_index in tree_indices:
+            tree = forest.estimators_[tree_index].tree_
+            roots.append(len(values))
+
+            # Breadth-first copy so that pruned subtrees are simply not visited
+            queue = deque([(0, 0, None, None)])  # (node, depth, parent position, is left child)
+            while queue:
+                node, node_depth, parent, is_left = queue.popleft()
+                position = len(values)
+                if parent is not None:
+                    (lefts if is_left else rights)[parent] = position
+
+                is_leaf = tree.children_left[node] == TREE_LEAF or (
+                    max_depth is not None and node_depth >= max_depth
+                )
+                features.append(0 if is_leaf else tree.feature[node])
+                thresholds.append(0.0 if is_leaf else tree.threshold[node])
+                lefts.append(TREE_LEAF)
+                rights.append(TREE_LEAF)
+                values.append(tree.value[node, 0, 0])
+                depth = max(depth, node_depth)
+
+                if not is_leaf:
+                    queue.append((tree.children_left[node], node_depth + 1, position, True))
+                    queue.append((tree.children_right[node], node_depth + 1, position, False))
+
+        return cls(
+            feature=np.asarray(features, dtype=np.int32),
+            threshold=_float32_floor(np.asarray(thresholds, dtype=np.float64)),
+            left=np.asarray(lefts, dtype=np.int32),
+            right=np.asarray(rights, dtype=np.int32),
+            value=np.asarray(values, dtype=np.float32),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=depth,
+            n_features=forest.n_features_in_,
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.value)
+
+    def predict_all(self, X) -> np.ndarray:
+        """
+        Predict with every tree.
+
+        Returns:
+            np.ndarray: Array of shape (n_trees, n_rows) with per-tree predictions.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((self.n_trees, X.shape[0]), dtype=np.float32)
+        for start in range(0, X.shape[0], PREDICT_BATCH_ROWS):
+            batch = X[start : start + PREDICT_BATCH_ROWS]
+            rows = np.arange(batch.shape[0])
+            nodes = np.repeat(self.roots[:, None], batch.shape[0], axis=1)
+            for _ in range(self.depth):
+                go_left = batch[rows, self.feature[nodes]] <= self.threshold[nodes]
+                children = np.where(go_left, self.left[nodes], self.right[nodes])
+                # Leaves have no children and keep pointing at themselves
+                nodes = np.where(children == TREE_LEAF, nodes, children)
+            out[:, start : start + batch.shape[0]] = self.value[nodes]
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_all(X).mean(axis=0, dtype=np.float64)
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """
+    Round float64 thresholds down to float32, so that `x <= threshold` gives the
+    same result for every float32 input as with the original threshold.
+    """
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def greedy_tree_order(per_tree: np.ndarray, y: np.ndarray):
+    """
+    Order trees greedily: each step adds the tree that lowers the ensemble MAE
+    the most.
+
+    Args:
+        per_tree (np.ndarray): Per-tree predictions, shape (n_trees, n_rows).
+        y (np.ndarray): True values.
+
+    Returns:
+        tuple: Tree indices in selection order and the ensemble MAE after each step.
+    """
+    per_tree = per_tree.astype(np.float64)
+    order, remaining = [], list(range(per_tree.shape[0]))
+    running_sum = np.zeros(per_tree.shape[1])
+    maes = []
+
+    while remaining:
+        candidate_sums = running_sum + per_tree[remaining]
+        candidate_maes = np.abs(candidate_sums / (len(order) + 1) - y).mean(axis=1)
+        best = int(np.argmin(candidate_maes))
+        running_sum = candidate_sums[best]
+        maes.append(float(candidate_maes[best]))
+        order.append(remaining.pop(best))
+    return order, np.asarray(maes)
+
+
+def artifact_size(model) -> int:
+    """
+    Size in bytes of a model serialized the way `save_model` stores it.
+    """
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer, compress=3)
+    return buffer.tell()
+
+
+def time_predict(model, X, repeats: int = 5) -> float:
+    """
+    Median wall time of `model.predict(X)` over `repeats` runs.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def compact_forest(forest, X_select, y_select, X_verify, y_verify, tolerance=0.01, depths=(None,)):
+    """
+    Find the cheapest compact version of `forest` whose MAE stays within
+    `tolerance` (relative) of the full forest.
+
+    Everything is chosen on the selection split: for every candidate depth,
+    trees are ranked greedily and the shortest prefix of that ranking within
+    tolerance is kept, and the candidate with the fewest visited nodes per
+    row (trees x depth) wins. Only that winner is then checked on the
+    verification split, which took no part in the choice, so the reported
+    MAE is an unbiased estimate.
+
+    Returns:
+        tuple: The CompactForest and a report dict.
+
+    Raises:
+        ValueError: If no candidate stays within the tolerance on the selection
+            split, or the winner does not on the verification split.
+    """
+    full_select_mae = float(np.abs(forest.predict(X_select) - y_select).mean())
+    target_mae = full_select_mae * (1 + tolerance)
+
+    candidates = []
+    for depth in depths:
+        pruned = CompactForest.from_forest(forest, max_depth=depth)
+        order, select_maes = greedy_tree_order(pruned.predict_all(X_select), y_select)
+
+        passing = np.flatnonzero(select_maes <= target_mae)
+        if not len(passing):
+            logging.info(f"Depth {depth}: no tree subset stays within the tolerance")
+            continue
+        n_trees = int(passing[0]) + 1
+        compact = CompactForest.from_forest(
+            forest, tree_indices=sorted(order[:n_trees]), max_depth=depth
+        )
+        logging.info(
+            f"Depth {depth}: {n_trees} trees, selection MAE {select_maes[n_trees - 1]:.2f}"
+        )
+        candidates.append(
+            (n_trees * max(compact.depth, 1), compact, float(select_maes[n_trees - 1]))
+        )
+
+    if not candidates:
+        raise ValueError(f"No compact forest stays within a {tolerance:.1%} MAE tolerance.")
+
+    _, compact, select_mae = min(candidates, key=lambda candidate: candidate[0])
+    full_verify_mae = float(np.abs(forest.predict(X_verify) - y_verify).mean())
+    verify_mae = float(np.abs(compact.predict(X_verify) - y_verify).mean())
+    if verify_mae > full_verify_mae * (1 + tolerance):
+        raise ValueError(
+            f"The compact forest ({compact.n_trees} trees, depth {compact.depth}) has a "
+            f"verification MAE of {verify_mae:.2f} against {full_verify_mae:.2f}, beyond "
+            f"the {tolerance:.1%} tolerance."
+        )
+
+    full_seconds = time_predict(forest, X_verify)
+    compact_seconds = time_predict(compact, X_verify)
+    full_size, compact_size = artifact_size(forest), artifact_size(compact)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "tolerance": tolerance,
+        "n_trees": {"full": len(forest.estimators_), "compact": compact.n_trees},
+        "depth": {
+            "full": max(tree.get_depth() for tree in forest.estimators_),
+            "compact": compact.depth,
+        },
+        "mae": {"full": full_verify_mae, "compact": verify_mae},
+        "selection_mae": {"full": full_select_mae, "compact": select_mae},
+        "predict_seconds": {"full": full_seconds, "compact": compact_seconds},
+        "speedup": full_seconds / compact_seconds if compact_seconds else None,
+        "artifact_bytes": {"full": full_size, "compact": compact_size},
+        "size_reduction": 1 - compact_size / full_size,
+    }
+    return compact, report
+
+
+def holdout_data(args):
+    """
+    Rows the model to compact was not trained on.
+
+    Either the `--holdout` CSV, or the test split of `--data` when the model's
+    metadata shows it was trained with `train` on exactly that split. Other
+    models, e.g. from `train-mongo` or another file, may have trained on any
+    row of `--data`.
+
+    Returns:
+        tuple: Features, targets and a description of their source.
+
+    Raises:
+        ValueError: If no holdout is given and the model's split is unknown.
+    """
+    from models.model import (
+        file_hash,
+        load_cached_data,
+        load_matrices,
+        metadata_path,
+        prepare_data_cached,
+    )
+
+    if args.holdout:
+        X, y = load_matrices(args.holdout)
+        return X, y, {"holdout": args.holdout, "sha256": file_hash(args.holdout)}
+
+    metadata = {}
+    if os.path.exists(metadata_path(args.model)):
+        with open(metadata_path(args.model)) as f:
+            metadata = json.load(f)
+    source = metadata.get("source", {})
+    cache_file, data_hash = prepare_data_cached(args.data, args.cache_dir)
+    _, X_test, _, y_test = load_cached_data(cache_file)
+    if (
+        source.get("type") != "csv"
+        or source.get("sha256") != data_hash
+        or metadata.get("n_test_rows") != len(y_test)
+    ):
+        raise ValueError(
+            f"{args.model} was not trained on the split of {args.data} used here, so "
+            "its test rows may overlap its training rows. Pass --holdout with rows "
+            "the model never saw."
+        )
+    return X_test, y_test, {"data": args.data, "sha256": data_hash, "split": "test"}
+
+
+def run_compaction(args):
+    """
+    Compact a saved forest and save the result with its compaction report.
+    """
+    from sklearn.model_selection import train_test_split
+    from models.model import (
+        RANDOM_STATE,
+        load_model,
+        parse_param_values,
+        save_model_with_metadata,
+    )
+
+    X_holdout, y_holdout, holdout = holdout_data(args)
+    X_select, X_verify, y_select, y_verify = train_test_split(
+        X_holdout, y_holdout, test_size=0.5, random_state=RANDOM_STATE
+    )
+
+    forest = load_model(args.model)
+    compact, report = compact_forest(
+        forest,
+        X_select,
+        y_select,
+        X_verify,
+        y_verify,
+        tolerance=args.tolerance,
+        depths=parse_param_values(args.depths),
+    )
+    report["source"] = {"model": args.model, **holdout}
+    save_model_with_metadata(compact, args.output, {"compaction": report})
+
+    logging.info(
+        f"Compacted {report['n_trees']['full']} -> {report['n_trees']['compact']} trees, "
+        f"depth {report['depth']['full']} -> {report['depth']['compact']}: "
+        f"MAE {report['mae']['full']:.2f} -> {report['mae']['compact']:.2f}, "
+        f"{report['speedup']:.2f}x faster, {report['size_reduction']:.1%} smaller"
+    )
+    return report
@@ -1,4 +1,14 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
@@ -6,11 +16,18 @@ from sklearn.metrics import mean_absolute_error
 import joblib
 import logging
 
+from config import Config
+
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
 TRAIN_DATA = "housing.csv"
 MODEL_NAME = "model.joblib"
 RANDOM_STATE = 100
+TEST_SIZE = 0.2
+CACHE_DIR = os.path.join("models", ".cache")
+
+# Bump when the preparation of cached matrices changes
+PREPARE_VERSION = 1
 
 
 def prepare_data(input_data_path):
@@ -24,22 +41,179 @@ def prepare_data(input_data_path):
     y = df["median_house_value"].values
 
     X_train, X_test, y_train, y_test = train_test_split(
-        df_features, y, test_size=0.2, random_state=RANDOM_STATE
+        df_features, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
     )
 
     return (X_train, X_test, y_train, y_test)
 
 
-def train(X_train, y_train):
-    # what columns are expected by the model
-    X_train.columns
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file without reading it into memory at once.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_data_cached(input_data_path, cache_dir=CACHE_DIR):
+    """
+    Prepare train/test matrices with the serving preprocessor and cache them on
+    disk, keyed by the hash of the input file and the split settings.
+
+    Args:
+        input_data_path (str): Path to the raw housing CSV file.
+        cache_dir (str): Directory holding the cached matrices.
+
+    Returns:
+        tuple: Path of the cache file and the input file hash.
+    """
+    data_hash = file_hash(input_data_path)
+    key = f"{data_hash[:16]}_v{PREPARE_VERSION}_t{TEST_SIZE}_r{RANDOM_STATE}"
+    cache_file = os.path.join(cache_dir, f"{key}.npz")
+
+    if os.path.exists(cache_file):
+        logging.info(f"Using cached training matrices from {cache_file}")
+        return cache_file, data_hash
+
+    logging.info(f"No cached matrices for {input_data_path}, preprocessing...")
+    X, y = load_matrices(input_data_path)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so a crash never leaves a corrupt cache entry
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_file, X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
+    os.replace(tmp_file, cache_file)
+    logging.info(f"Cached training matrices in {cache_file}")
+    return cache_file, data_hash
+
+
+def load_matrices(input_data_path):
+    """
+    Preprocess a housing CSV with the serving preprocessor into float32
+    features and float64 targets.
+    """
+    # Imported here so that the evaluation entry point keeps working standalone
+    from analytics.preprocessor import preprocess_housing_data
+
+    X, y = preprocess_housing_data(input_data_path)
+    X = X.to_numpy(dtype=np.float32)
+    y = pd.to_numeric(y, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    return X, y
+
+
+def load_cached_data(cache_file):
+    with np.load(cache_file) as data:
+        return (data["X_train"], data["X_test"], data["y_train"], data["y_test"])
 
-    regr = RandomForestRegressor(max_depth=12)
+
+def train(X_train, y_train, n_jobs=-1, **params):
+    params.setdefault("max_depth", 12)
+    regr = RandomForestRegressor(n_jobs=n_jobs, random_state=RANDOM_STATE, **params)
     regr.fit(X_train, y_train)
 
     return regr
 
 
+def evaluate_candidate(
+    cache_file, params, max_estimators, step, min_improvement, time_budget
+):
+    """
+    Grow a forest with the given parameters in steps of `step` trees and stop
+    early once the validation MAE stops improving or the time budget is spent.
+
+    Returns:
+        dict: Parameters, best tree count, validation MAE and timings.
+    """
+    X_train, _, y_train, _ = load_cached_data(cache_file)
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+
+    model = RandomForestRegressor(
+        warm_start=True, n_jobs=1, random_state=RANDOM_STATE, **params
+    )
+    best_mae, best_n_estimators = float("inf"), 0
+    history = []
+    stop_reason = "max_estimators"
+    start = time.perf_counter()
+
+    n_estimators = 0
+    while n_estimators < max_estimators:
+        n_estimators = min(n_estimators + step, max_estimators)
+        model.set_params(n_estimators=n_estimators)
+        model.fit(X_fit, y_fit)
+        mae = float(mean_absolute_error(y_val, model.predict(X_val)))
+        history.append({"n_estimators": n_estimators, "val_mae": mae})
+
+        if mae >= best_mae * (1 - min_improvement):
+            stop_reason = "converged"
+            break
+        best_mae, best_n_estimators = mae, n_estimators
+
+        if time.perf_counter() - start > time_budget:
+            stop_reason = "time_budget"
+            break
+
+    return {
+        "params": {**params, "n_estimators": best_n_estimators},
+        "val_mae": best_mae,
+        "fit_seconds": time.perf_counter() - start,
+        "stop_reason": stop_reason,
+        "history": history,
+    }
+
+
+def sweep(
+    cache_file,
+    param_grid,
+    max_estimators=200,
+    step=25,
+    min_improvement=0.002,
+    time_budget=120.0,
+    workers=None,
+):
+    """
+    Evaluate every parameter combination of `param_grid` on a process pool.
+
+    Returns:
+        list: Candidate results sorted by validation MAE (best first).
+    """
+    keys = list(param_grid)
+    candidates = [
+        dict(zip(keys, values)) for values in itertools.product(*param_grid.values())
+    ]
+    logging.info(f"Sweeping {len(candidates)} candidates on {workers or os.cpu_count()} workers")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                evaluate_candidate,
+                cache_file,
+                params,
+                max_estimators,
+                step,
+                min_improvement,
+                time_budget,
+            )
+            for params in candidates
+        ]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        logging.info(
+            f"Candidate {result['params']}: val MAE {result['val_mae']:.2f} "
+            f"({result['stop_reason']}, {result['fit_seconds']:.1f}s)"
+        )
+    return sorted(results, key=lambda result: result["val_mae"])
+
+
 def predict(X, model):
     Y = model.predict(X)
     return Y
@@ -50,25 +224,110 @@ def save_model(model, filename):
         joblib.dump(model, filename, compress=3)
 
 
+def metadata_path(model_filename):
+    return f"{os.path.splitext(model_filename)[0]}.meta.json"
+
+
+def save_model_with_metadata(model, filename, metadata):
+    """
+    Save a model and its metadata next to it. The model is written to a
+    temporary file first and moved into place, so a serving process watching
+    `filename` never loads a partially written model.
+    """
+    tmp_filename = f"{filename}.tmp"
+    save_model(model, tmp_filename)
+    with open(metadata_path(filename), "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(tmp_filename, filename)
+
+
 def load_model(filename):
     model = joblib.load(filename)
     return model
 
 
-if __name__ == "__main__":
-    logging.info("Preparing the data...")
-    X_train, X_test, y_train, y_test = prepare_data(TRAIN_DATA)
+def parse_param_values(values):
+    """
+    Convert CLI values to ints, floats or None where possible ("none" -> None).
+    """
+    parsed = []
+    for value in values:
+        if value.lower() == "none":
+            parsed.append(None)
+            continue
+        for cast in (int, float):
+            try:
+                parsed.append(cast(value))
+                break
+            except ValueError:
+                continue
+        else:
+            parsed.append(value)
+    return parsed
+
+
+def run_training(args):
+    timings = {}
+
+    start = time.perf_counter()
+    cache_file, data_hash = prepare_data_cached(args.data, args.cache_dir)
+    timings["prepare_seconds"] = time.perf_counter() - start
+
+    param_grid = {
+        "max_depth": parse_param_values(args.max_depth),
+        "min_samples_leaf": parse_param_values(args.min_samples_leaf),
+        "max_features": parse_param_values(args.max_features),
+    }
+
+    start = time.perf_counter()
+    results = sweep(
+        cache_file,
+        param_grid,
+        max_estimators=args.max_estimators,
+        step=args.step,
+        min_improvement=args.min_improvement,
+        time_budget=args.time_budget,
+        workers=args.workers,
+    )
+    timings["sweep_seconds"] = time.perf_counter() - start
+    best = results[0]
+
+    logging.info(f"Training the winning model {best['params']} on all cores...")
+    X_train, X_test, y_train, y_test = load_cached_data(cache_file)
+    start = time.perf_counter()
+    model = train(X_train, y_train, n_jobs=args.n_jobs, **best["params"])
+    timings["fit_seconds"] = time.perf_counter() - start
 
-    # the model was already trained before
-    # logging.info('Training the model...')
-    # regr = train(TRAIN_DATA)
+    start = time.perf_counter()
+    y_pred_test = predict(X_test, model)
+    timings["predict_test_seconds"] = time.perf_counter() - start
 
-    # the model was already saved before into file 'model.joblib'
-    # logging.info('Exporting the model...')
-    # save_model(regr, MODEL_NAME)
+    metadata = {
+        "created_at": datetime.now().isoformat(),
+        "source": {"type": "csv", "path": args.data, "sha256": data_hash},
+        "params": best["params"],
+        "mae": {
+            "train": float(mean_absolute_error(y_train, predict(X_train, model))),
+            "validation": best["val_mae"],
+            "test": float(mean_absolute_error(y_test, y_pred_test)),
+        },
+        "timings": timings,
+        "features": Config.EXPECTED_FEATURES,
+        "n_train_rows": len(y_train),
+        "n_test_rows": len(y_test),
+        "candidates": results,
+    }
+    save_model_with_metadata(model, args.output, metadata)
+    logging.info(f"Model saved to {args.output} (test MAE {metadata['mae']['test']:.2f})")
+    return metadata
+
+
+def run_evaluation(args):
+    logging.info("Preparing the data...")
+    X_train, X_test, y_train, y_test = prepare_data(args.data)
 
     logging.info("Loading the model...")
-    model = load_model(MODEL_NAME)
+    model = load_model(args.model)
 
     logging.info("Calculating train dataset predictions...")
     y_pred_train = predict(X_train, model)
@@ -85,3 +344,101 @@ if __name__ == "__main__":
     logging.info(y_pred_test[:5])
     logging.info(f"Train error: {train_error}")
     logging.info(f"Test error: {test_error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train or evaluate the house price model.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Evaluate a saved model.")
+    evaluate_parser.add_argument("--data", default=TRAIN_DATA)
+    evaluate_parser.add_argument("--model", default=MODEL_NAME)
+
+    train_parser = subparsers.add_parser(
+        "train", help="Run a parallel hyperparameter sweep and save the best model."
+    )
+    train_parser.add_argument("--data", default=os.path.join("data", "housing.csv"))
+    train_parser.add_argument("--output", default=os.path.join("models", "model_retrained.joblib"))
+    train_parser.add_argument("--cache-dir", default=CACHE_DIR)
+    train_parser.add_argument("--max-depth", nargs="+", default=["8", "12", "16"])
+    train_parser.add_argument("--min-samples-leaf", nargs="+", default=["1", "4"])
+    train_parser.add_argument("--max-features", nargs="+", default=["1.0", "0.5"])
+    train_parser.add_argument("--max-estimators", type=int, default=200)
+    train_parser.add_argument("--step", type=int, default=25, help="Trees added per early-stopping round.")
+    train_parser.add_argument(
+        "--min-improvement",
+        type=float,
+        default=0.002,
+        help="Relative MAE improvement required to keep adding trees.",
+    )
+    train_parser.add_argument("--time-budget", type=float, default=120.0, help="Seconds per candidate.")
+    train_parser.add_argument("--workers", type=int, default=None, help="Sweep processes (default: all cores).")
+    train_parser.add_argument("--n-jobs", type=int, default=-1, help="Cores for the final fit.")
+    mongo_parser = subparsers.add_parser(
+        "train-mongo", help="Train out-of-core on the Mongo raw collection."
+    )
+    mongo_parser.add_argument("--db-name", default=Config.MONGO_DB_NAME)
+    mongo_parser.add_argument("--collection-name", default=Config.MONGO_COLLECTION)
+    mongo_parser.add_argument("--output", default=os.path.join("models", "model_mongo.joblib"))
+    mongo_parser.add_argument(
+        "--workdir",
+        default=os.path.join(CACHE_DIR, "mongo"),
+        help="Directory under which each run memory-maps its training matrix.",
+    )
+    mongo_parser.add_argument("--chunk-size", type=int, default=50_000)
+    mongo_parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=None,
+        help="Train on a reservoir sample of this many rows instead of all rows.",
+    )
+    mongo_parser.add_argument("--holdout-size", type=int, default=50_000)
+    mongo_parser.add_argument("--max-depth", type=int, default=12)
+    mongo_parser.add_argument("--n-estimators", type=int, default=100)
+    mongo_parser.add_argument("--n-jobs", type=int, default=-1)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="Shrink a forest within an MAE tolerance."
+    )
+    compact_parser.add_argument("--model", default=os.path.join("models", "model.joblib"))
+    compact_parser.add_argument("--data", default=os.path.join("data", "housing.csv"))
+    compact_parser.add_argument("--output", default=os.path.join("models", "model_compact.joblib"))
+    compact_parser.add_argument("--cache-dir", default=CACHE_DIR)
+    compact_parser.add_argument(
+        "--holdout",
+        help="CSV of rows the model never saw. Required unless the model was "
+        "trained with `train` on --data, whose test split is then used.",
+    )
+    compact_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.01,
+        help="Allowed relative MAE increase on the held-out split.",
+    )
+    compact_parser.add_argument(
+        "--depths",
+        nargs="+",
+        default=["none", "10", "8"],
+        help="Candidate depth limits ('none' keeps the full depth).",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    if args.command == "train":
+        run_training(args)
+    elif args.command == "train-mongo":
+        from models.mongo_training import run_mongo_training
+
+        run_mongo_training(args)
+    elif args.command == "compact":
+        from models.compaction import run_compaction
+
+        run_compaction(args)
+    else:
+        if args.command is None:
+            # the model was already trained before, keep the original behaviour
+            args = build_parser().parse_args(["evaluate"])
+        run_evaluation(args)
@@ -0,0 +1,326 @@
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+
+from config import Config
+from database_handler.db_connector import get_mongo_client
+from models.model import RANDOM_STATE, TEST_SIZE, train, save_model_with_metadata
+
+TARGET_FIELD = "target"
+
+# BSON element types and the fixed size of their values
+_BSON_DOUBLE = 0x01
+_BSON_BOOL = 0x08
+_BSON_INT32 = 0x10
+_BSON_INT64 = 0x12
+_BSON_OBJECT_ID = 0x07
+_BSON_FIXED_SIZES = {
+    0x01: 8,  # double
+    0x06: 0,  # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,  # bool
+    0x09: 8,  # UTC datetime
+    0x0A: 0,  # null
+    0x10: 4,  # int32
+    0x11: 8,  # timestamp
+    0x12: 8,  # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,  # max key
+    0xFF: 0,  # min key
+}
+_BSON_LENGTH_PREFIXED = {0x02, 0x0D, 0x0E}  # string, JavaScript code, symbol
+_BSON_EMBEDDED = {0x03, 0x04, 0x0F}  # document, array, code with scope
+
+_INT32 = struct.Struct("<i")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+
+
+def decode_numeric_batch(batch: bytes, field_index: dict, out: np.ndarray, ids: list):
+    """
+    Decode a raw batch of BSON documents straight into a numeric array.
+
+    Only the fields in `field_index` are read; every other element is skipped
+    without being decoded, and no per-document dict is built. Missing or
+    non-numeric fields stay 0, which matches how /process fills missing features.
+
+    Args:
+        batch (bytes): Concatenated BSON documents as returned by `find_raw_batches`.
+        field_index (dict): Encoded field name -> column in `out`.
+        out (np.ndarray): Array with at least as many rows as documents in the batch.
+        ids (list): Receives the raw 12-byte ObjectId of each document.
+
+    Returns:
+        int: Number of documents decoded.
+    """
+    view = memoryview(batch)
+    offset, row, end = 0, 0, len(batch)
+    while offset < end:
+        doc_end = offset + _INT32.unpack_from(batch, offset)[0]
+        position = offset + 4
+        out[row] = 0
+        while position < doc_end - 1:
+            element_type = batch[position]
+            name_end = batch.index(b"\x00", position + 1)
+            column = field_index.get(bytes(view[position + 1 : name_end]))
+            position = name_end + 1
+
+            if element_type == _BSON_DOUBLE:
+                if column is not None:
+                    out[row, column] = _DOUBLE.unpack_from(batch, position)[0]
+                position += 8
+            elif element_type == _BSON_INT32:
+                if column is not None:
+                    out[row, column] = _INT32.unpack_from(batch, position)[0]
+                position += 4
+            elif element_type == _BSON_INT64:
+                if column is not None:
+                    out[row, column] = _INT64.unpack_from(batch, position)[0]
+                position += 8
+            elif element_type == _BSON_BOOL:
+                if column is not None:
+                    out[row, column] = batch[position]
+                position += 1
+            elif element_type == _BSON_OBJECT_ID:
+                ids.append(bytes(view[position : position + 12]))
+                position += 12
+            elif element_type in _BSON_FIXED_SIZES:
+                position += _BSON_FIXED_SIZES[element_type]
+            elif element_type in _BSON_LENGTH_PREFIXED:
+                position += 4 + _INT32.unpack_from(batch, position)[0]
+            elif element_type in _BSON_EMBEDDED:
+                position += _INT32.unpack_from(batch, position)[0]
+            elif element_type == 0x05:  # binary
+                position += 5 + _INT32.unpack_from(batch, position)[0]
+            elif element_type == 0x0B:  # regex: two cstrings
+                position = batch.index(b"\x00", position) + 1
+                position = batch.index(b"\x00", position) + 1
+            elif element_type == 0x0C:  # DBPointer
+                position += 4 + _INT32.unpack_from(batch, position)[0] + 12
+            else:
+                raise ValueError(f"Unsupported BSON element type 0x{element_type:02x}")
+        offset = doc_end
+        row += 1
+    return row
+
+
+def iter_mongo_chunks(db_name: str, collection_name: str, chunk_size: int = 50_000):
+    """
+    Stream the feature/target matrix of a collection in chunks of float32 rows.
+
+    Yields:
+        tuple: (chunk, ids) where `chunk` has one column per entry in
+        Config.EXPECTED_FEATURES plus the target, and `ids` holds the raw
+        ObjectIds of the chunk's documents.
+    """
+    columns = Config.EXPECTED_FEATURES + [TARGET_FIELD]
+    field_index = {name.encode(): i for i, name in enumerate(columns)}
+    projection = {name: 1 for name in columns}
+
+    client = get_mongo_client()
+    try:
+        collection = client[db_name][collection_name]
+        batches = collection.find_raw_batches(
+            {}, projection, batch_size=chunk_size, sort=[("_id", 1)]
+        )
+        buffer = np.zeros((chunk_size, len(columns)), dtype=np.float32)
+        # A raw batch holds at most `chunk_size` documents but may hold fewer
+        batch_rows = np.zeros((chunk_size, len(columns)), dtype=np.float32)
+        filled, ids = 0, []
+        for batch in batches:
+            batch_ids = []
+            decoded = decode_numeric_batch(batch, field_index, batch_rows, batch_ids)
+            start = 0
+            while start < decoded:
+                take = min(chunk_size - filled, decoded - start)
+                buffer[filled : filled + take] = batch_rows[start : start + take]
+                ids.extend(batch_ids[start : start + take])
+                filled += take
+                start += take
+                if filled == chunk_size:
+                    yield buffer.copy(), ids
+                    filled, ids = 0, []
+        if filled:
+            yield buffer[:filled].copy(), ids
+    finally:
+        client.close()
+
+
+class ReservoirSample:
+    """
+    Uniform fixed-size sample of a stream of rows (Algorithm R), updated chunk by chunk.
+    """
+
+    def __init__(self, size: int, n_columns: int, seed: int = RANDOM_STATE):
+        self.size = size
+        self.rows = np.zeros((size, n_columns), dtype=np.float32)
+        self.filled = 0
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, chunk: np.ndarray):
+        take = min(self.size - self.filled, len(chunk))
+        self.rows[self.filled : self.filled + take] = chunk[:take]
+        self.filled += take
+        self.seen += take
+
+        rest = chunk[take:]
+        if len(rest):
+            # Row i (0-based) replaces a random slot with probability size / (i + 1)
+            positions = self.seen + np.arange(len(rest))
+            slots = self.rng.integers(0, positions + 1)
+            keep = slots < self.size
+            self.rows[slots[keep]] = rest[keep]
+            self.seen += len(rest)
+
+    @property
+    def sample(self) -> np.ndarray:
+        return self.rows[: self.filled]
+
+
+def build_training_matrix(
+    db_name: str,
+    collection_name: str,
+    workdir: str,
+    chunk_size: int = 50_000,
+    sample_size: int = None,
+    holdout_size: int = 50_000,
+    seed: int = RANDOM_STATE,
+):
+    """
+    Build float32 training arrays from a Mongo collection without holding the
+    collection in memory.
+
+    Without `sample_size` the training rows are appended to files in `workdir`
+    and memory-mapped, so the collection may be larger than RAM. The file
+    names are fixed, so every run needs a `workdir` of its own. With
+    `sample_size` a reservoir sample of that many rows is kept in memory
+    instead. About TEST_SIZE of the rows are routed to a bounded hold-out
+    reservoir and never used for training.
+
+    Returns:
+        tuple: (X_train, y_train, X_holdout, y_holdout, lineage)
+    """
+    n_features = len(Config.EXPECTED_FEATURES)
+    rng = np.random.default_rng(seed)
+    holdout = ReservoirSample(holdout_size, n_features + 1, seed)
+    sample = ReservoirSample(sample_size, n_features + 1, seed) if sample_size else None
+
+    os.makedirs(workdir, exist_ok=True)
+    X_path = os.path.join(workdir, "X_train.f32")
+    y_path = os.path.join(workdir, "y_train.f32")
+
+    ids_digest = hashlib.sha256()
+    first_id = last_id = None
+    n_documents = n_train = 0
+    started_at = datetime.now()
+
+    with open(X_path, "wb") as X_file, open(y_path, "wb") as y_file:
+        for chunk, ids in iter_mongo_chunks(db_name, collection_name, chunk_size):
+            for raw_id in ids:
+                ids_digest.update(raw_id)
+            if ids:
+                first_id = first_id or ids[0].hex()
+                last_id = ids[-1].hex()
+            n_documents += len(chunk)
+
+            is_holdout = rng.random(len(chunk)) < TEST_SIZE
+            holdout.update(chunk[is_holdout])
+            train_rows = chunk[~is_holdout]
+
+            if sample is not None:
+                sample.update(train_rows)
+            else:
+                X_file.write(np.ascontiguousarray(train_rows[:, :n_features]).tobytes())
+                y_file.write(np.ascontiguousarray(train_rows[:, n_features]).tobytes())
+                n_train += len(train_rows)
+
+            logging.info(f"Streamed {n_documents} documents from {db_name}.{collection_name}")
+
+    if n_documents == 0:
+        raise ValueError(f"No documents found in {db_name}.{collection_name}.")
+
+    if sample is not None:
+        X_train = np.ascontiguousarray(sample.sample[:, :n_features])
+        y_train = np.ascontiguousarray(sample.sample[:, n_features])
+        n_train = len(X_train)
+    else:
+        X_train = np.memmap(X_path, dtype=np.float32, mode="r", shape=(n_train, n_features))
+        y_train = np.memmap(y_path, dtype=np.float32, mode="r", shape=(n_train,))
+
+    lineage = {
+        "type": "mongo",
+        "db_name": db_name,
+        "collection_name": collection_name,
+        "read_started_at": started_at.isoformat(),
+        "n_documents": n_documents,
+        "first_id": first_id,
+        "last_id": last_id,
+        "ids_sha256": ids_digest.hexdigest(),
+        "n_train_rows": n_train,
+        "n_holdout_rows": holdout.filled,
+        "sampled": sample is not None,
+        "sample_size": sample_size,
+        "seed": seed,
+    }
+    return (
+        X_train,
+        y_train,
+        holdout.sample[:, :n_features],
+        holdout.sample[:, n_features],
+        lineage,
+    )
+
+
+def run_mongo_training(args):
+    """
+    Train a model on the Mongo raw collection and save it with its lineage.
+    """
+    timings = {}
+
+    # A directory per run, so concurrent runs never write each other's matrix
+    os.makedirs(args.workdir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="train-", dir=args.workdir) as run_dir:
+        start = time.perf_counter()
+        X_train, y_train, X_holdout, y_holdout, lineage = build_training_matrix(
+            args.db_name,
+            args.collection_name,
+            run_dir,
+            chunk_size=args.chunk_size,
+            sample_size=args.sample_size,
+            holdout_size=args.holdout_size,
+        )
+        timings["read_seconds"] = time.perf_counter() - start
+
+        logging.info(
+            f"Training on {len(y_train)} rows from {args.db_name}.{args.collection_name}..."
+        )
+        start = time.perf_counter()
+        model = train(
+            X_train,
+            y_train,
+            n_jobs=args.n_jobs,
+            max_depth=args.max_depth,
+            n_estimators=args.n_estimators,
+        )
+        timings["fit_seconds"] = time.perf_counter() - start
+        del X_train, y_train
+
+    metadata = {
+        "created_at": datetime.now().isoformat(),
+        "source": lineage,
+        "params": {"max_depth": args.max_depth, "n_estimators": args.n_estimators},
+        "mae": {"holdout": float(mean_absolute_error(y_holdout, model.predict(X_holdout)))},
+        "timings": timings,
+        "features": Config.EXPECTED_FEATURES,
+    }
+    save_model_with_metadata(model, args.output, metadata)
+    logging.info(f"Model saved to {args.output} (hold-out MAE {metadata['mae']['holdout']:.2f})")
+    return metadata
@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config, logger
+from models.serving import get_model
+from models.uncertainty import predict_with_intervals
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# registry_file -> (mtime, models)
+_registry_cache = {}
+_registry_lock = threading.Lock()
+
+
+def default_registry() -> list:
+    """
+    Registry used when no registry file exists: the single model in Config.MODEL_FILE.
+    """
+    return [
+        {
+            "version": Config.DEFAULT_MODEL_VERSION,
+            "path": Config.MODEL_FILE,
+            "weight": 1.0,
+            "shadow": False,
+        }
+    ]
+
+
+def _validate_registry(models: list) -> list:
+    versions = [model["version"] for model in models]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Model versions in the registry must be unique.")
+
+    live = [model for model in models if not model["shadow"]]
+    total_weight = sum(model["weight"] for model in live)
+    if not live or total_weight <= 0:
+        raise ValueError("The registry needs at least one live model with a positive weight.")
+
+    for model in live:
+        model["weight"] = model["weight"] / total_weight
+    return models
+
+
+def load_registry(registry_file: str = Config.MODEL_REGISTRY_FILE) -> list:
+    """
+    Load the registered model versions.
+
+    The registry is a JSON file of the form
+    `{"models": [{"version": "v2", "path": "models/v2.joblib", "weight": 0.1, "shadow": false}]}`.
+    Live models share the traffic by their (normalized) weights; shadow models
+    score every row but are never served. The file is re-read when it changes.
+
+    Args:
+        registry_file (str): Path to the registry JSON file.
+
+    Returns:
+        list: Registered models as dicts with `version`, `path`, `weight` and `shadow`.
+
+    Raises:
+        ValueError: If the registry is invalid.
+    """
+    if not os.path.exists(registry_file):
+        return default_registry()
+
+    mtime = os.stat(registry_file).st_mtime
+    cached = _registry_cache.get(registry_file)
+    if cached is None or cached[0] != mtime:
+        with _registry_lock:
+            with open(registry_file) as f:
+                entries = json.load(f)["models"]
+            models = _validate_registry(
+                [
+                    {
+                        "version": str(entry["version"]),
+                        "path": entry["path"],
+                        "weight": float(entry.get("weight", 0.0)),
+                        "shadow": bool(entry.get("shadow", False)),
+                    }
+                    for entry in entries
+                ]
+            )
+            cached = (mtime, models)
+            _registry_cache[registry_file] = cached
+            logger.info(f"Loaded model registry with versions {[m['version'] for m in models]}")
+    return cached[1]
+
+
+def assign_versions(keys, live_models: list):
+    """
+    Assign each row to a live model by its key, proportionally to the weights.
+
+    The assignment is a hash of the key, so the same source row always goes to
+    the same model version as long as the weights do not change.
+
+    Args:
+        keys (iterable): One key per row, e.g. the source document `_id`.
+        live_models (list): Live registry entries.
+
+    Returns:
+        np.ndarray: Index into `live_models` for every row.
+    """
+    buckets = np.fromiter(
+        (zlib.crc32(str(key).encode()) / 2**32 for key in keys), dtype=np.float64
+    )
+    cumulative_weights = np.cumsum([model["weight"] for model in live_models])
+    cumulative_weights[-1] = 1.0
+    return np.searchsorted(cumulative_weights, buckets, side="right")
+
+
+def feature_matrix(features):
+    """
+    Copy features into one C-contiguous float32 matrix, column by column.
+
+    This is the layout and dtype sklearn trees predict on, so the estimators
+    use it without another conversion, and mixed float32/uint8 frames are
+    not first consolidated into an intermediate array.
+    """
+    X = np.empty(features.shape, dtype=np.float32)
+    for j, column in enumerate(features.columns):
+        X[:, j] = features[column].to_numpy()
+    return X
+
+
+def score_with_registry(
+    features, keys, registry: list = None, quantiles: tuple = (), std: bool = False
+):
+    """
+    Score one aligned feature matrix with every active model version.
+
+    Live models only predict the rows assigned to them; shadow models predict
+    all rows. The predictions run in parallel threads (tree traversal releases
+    the GIL), and the feature matrix is shared rather than rebuilt per model.
+
+    Args:
+        features (pd.DataFrame): Features in Config.EXPECTED_FEATURES order.
+        keys (list): One key per row used for the traffic split.
+        registry (list, optional): Registry entries; loaded from disk by default.
+        quantiles (tuple): Quantiles of the per-tree predictions to add as columns.
+        std (bool): Add the standard deviation across trees as a column.
+
+    Returns:
+        pd.DataFrame: Feature rows with `predictions`, `model_version` and
+        `shadow` columns (plus any interval columns); rows scored by several
+        models appear once per model, each keeping its index label from `features`.
+    """
+    registry = registry if registry is not None else load_registry()
+    X = feature_matrix(features)
+
+    live_models = [model for model in registry if not model["shadow"]]
+    assignment = assign_versions(keys, live_models)
+
+    tasks = []
+    for i, model in enumerate(live_models):
+        rows = np.flatnonzero(assignment == i)
+        if len(rows):
+            tasks.append((model, rows))
+    for model in registry:
+        if model["shadow"]:
+            tasks.append((model, None))
+
+    def predict(task):
+        model, rows = task
+        estimator = get_model(model["path"])
+        X_model = X if rows is None else X[rows]
+        if quantiles or std:
+            return predict_with_intervals(estimator, X_model, quantiles, std)
+        return {"predictions": estimator.predict(X_model)}
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        predictions = list(executor.map(predict, tasks))
+
+    frames = []
+    for (model, rows), columns in zip(tasks, predictions):
+        frame = features if rows is None else features.iloc[rows]
+        frames.append(
+            frame.assign(
+                **columns,
+                model_version=model["version"],
+                shadow=model["shadow"],
+            )
+        )
+        logger.info(
+            f"Model {model['version']}{' (shadow)' if model['shadow'] else ''} "
+            f"scored {len(columns['predictions'])} rows."
+        )
+    return pd.concat(frames)
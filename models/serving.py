@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+
+from config import Config, logger
+from utils.lazy_import import lazy_import
+
+joblib = lazy_import("joblib")
+
+# model_file -> (mtime, model)
+_model_cache = {}
+_model_lock = threading.Lock()
+
+
+def get_model(model_file: str = Config.MODEL_FILE):
+    """
+    Return the model stored in `model_file`, loading it only on first use.
+
+    The file's modification time is checked on every call, so a model written
+    in place by the training CLI is picked up without restarting the service.
+
+    Args:
+        model_file (str): Path to the joblib model file.
+
+    Returns:
+        object: The deserialized model.
+
+    Raises:
+        FileNotFoundError: If the model file does not exist.
+    """
+    mtime = os.stat(model_file).st_mtime
+    cached = _model_cache.get(model_file)
+    if cached is None or cached[0] != mtime:
+        with _model_lock:
+            cached = _model_cache.get(model_file)
+            if cached is None or cached[0] != mtime:
+                logger.info(f"Loading model from {model_file}")
+                cached = (mtime, joblib.load(model_file))
+                _model_cache[model_file] = cached
+    return cached[1]
+
+
+def get_model_metadata(model_file: str = Config.MODEL_FILE) -> dict:
+    """
+    Read the metadata written next to a model by the training CLI.
+
+    Args:
+        model_file (str): Path to the joblib model file.
+
+    Returns:
+        dict: Training metadata, or an empty dict for models without metadata.
+    """
+    metadata_file = f"{os.path.splitext(model_file)[0]}.meta.json"
+    if not os.path.exists(metadata_file):
+        return {}
+    with open(metadata_file) as f:
+        return json.load(f)
+
+
+def is_model_loaded(model_file: str = Config.MODEL_FILE) -> bool:
+    """
+    Check whether a model file is already held in memory.
+    """
+    return model_file in _model_cache
+
+
+def clear_model_cache():
+    """
+    Drop all cached models so that the next request reloads them from disk.
+    """
+    with _model_lock:
+        _model_cache.clear()
+    logger.info("Model cache cleared.")
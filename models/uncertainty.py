@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+# Rows per batch; bounds the per-tree array to n_trees x PREDICT_BATCH_ROWS values
+PREDICT_BATCH_ROWS = 65_536
+
+
+def quantile_column(quantile: float) -> str:
+    """
+    Name of the column holding a prediction quantile, e.g. 0.05 -> "prediction_q5".
+
+    The percentage is written in fixed point with up to two decimals, never
+    in exponent notation, so the name is always a valid SQL identifier.
+    """
+    percent = f"{quantile * 100:.2f}".rstrip("0").rstrip(".")
+    return f"prediction_q{percent}".replace(".", "_")
+
+
+def parse_quantiles(value: str) -> tuple:
+    """
+    Parse a comma-separated list of quantiles such as "0.05,0.95".
+
+    Raises:
+        ValueError: If a value is not a number strictly between 0 and 1, or has
+            more than 4 decimals (which its column name could not tell apart).
+    """
+    quantiles = tuple(float(item) for item in value.split(",") if item.strip())
+    if any(not 0 < quantile < 1 for quantile in quantiles):
+        raise ValueError("Quantiles must be between 0 and 1.")
+    if any(round(quantile, 4) != quantile for quantile in quantiles):
+        raise ValueError("Quantiles may have at most 4 decimals.")
+    return quantiles
+
+
+def predict_all_trees(model, X, executor=None):
+    """
+    Predict with every tree of a forest in one pass over the trees.
+
+    Args:
+        model: Fitted sklearn forest (`estimators_`) or CompactForest (`predict_all`).
+        X (np.ndarray): C-contiguous float32 features.
+        executor (ThreadPoolExecutor, optional): Pool to run the trees on.
+
+    Returns:
+        np.ndarray: Array of shape (n_trees, n_rows).
+
+    Raises:
+        ValueError: If the model does not expose its trees.
+    """
+    if hasattr(model, "predict_all"):
+        return model.predict_all(X)
+    if not hasattr(model, "estimators_"):
+        raise ValueError(f"{type(model).__name__} does not expose per-tree predictions.")
+
+    out = np.empty((len(model.estimators_), X.shape[0]), dtype=np.float64)
+
+    def predict_tree(index):
+        # Inputs are already float32 and C-contiguous, the dtype trees predict on
+        out[index] = model.estimators_[index].predict(X, check_input=False)
+
+    if executor is None:
+        for index in range(len(model.estimators_)):
+            predict_tree(index)
+    else:
+        # Tree traversal releases the GIL
+        list(executor.map(predict_tree, range(len(model.estimators_))))
+    return out
+
+
+def predict_with_intervals(model, X, quantiles: tuple = (), std: bool = False) -> dict:
+    """
+    Forest mean plus uncertainty columns from the same per-tree outputs.
+
+    Rows are processed in batches; for each batch all tree outputs are
+    gathered into one (n_trees, n_rows) array, from which the mean, the
+    requested quantiles and the standard deviation are taken. No tree is
+    evaluated twice.
+
+    Args:
+        model: Fitted sklearn forest or CompactForest.
+        X (np.ndarray): C-contiguous float32 features.
+        quantiles (tuple): Quantiles of the per-tree predictions, e.g. (0.05, 0.95).
+        std (bool): Also return the standard deviation across trees.
+
+    Returns:
+        dict: Column name -> array; `predictions` holds the mean, quantiles
+        are named by `quantile_column`, the deviation is `prediction_std`.
+    """
+    n_rows = X.shape[0]
+    columns = {"predictions": np.empty(n_rows)}
+    for quantile in quantiles:
+        columns[quantile_column(quantile)] = np.empty(n_rows)
+    if std:
+        columns["prediction_std"] = np.empty(n_rows)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for start in range(0, n_rows, PREDICT_BATCH_ROWS):
+            rows = slice(start, start + PREDICT_BATCH_ROWS)
+            per_tree = predict_all_trees(model, X[rows], executor)
+            columns["predictions"][rows] = per_tree.mean(axis=0)
+            if quantiles:
+                values = np.quantile(per_tree, quantiles, axis=0)
+                for quantile, quantile_values in zip(quantiles, values):
+                    columns[quantile_column(quantile)][rows] = quantile_values
+            if std:
+                columns["prediction_std"][rows] = per_tree.std(axis=0)
+    return columns
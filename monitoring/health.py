@@ -0,0 +1,157 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from config import Config, logger
+from database_handler.db_connector import get_mongo_client, get_postgres_connection
+from monitoring.startup import startup_report
+
+
+class HealthMonitor:
+    """
+    Background checks of the service dependencies with cached results.
+
+    A daemon thread pings MongoDB and PostgreSQL over long-lived connections
+    and makes sure every live model is loaded, once per `interval` seconds.
+    Probes read the latest snapshot from memory instead of opening
+    connections themselves.
+    """
+
+    def __init__(
+        self,
+        interval: float = Config.HEALTH_CHECK_INTERVAL,
+        timeout: float = Config.HEALTH_CHECK_TIMEOUT,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        # A snapshot older than this is reported as stale (not ready)
+        self.stale_after = 3 * interval
+        self.checks = {
+            "mongodb": self.check_mongo,
+            "postgres": self.check_postgres,
+            "model": self.check_model,
+        }
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._mongo_client = None
+        self._postgres_conn = None
+        self.results = {}
+        self.last_run = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # Lifecycle
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="health-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Health monitor started (every {self.interval}s)")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_connections()
+        logger.info("Health monitor stopped")
+
+    def _close_connections(self):
+        if self._mongo_client is not None:
+            self._mongo_client.close()
+            self._mongo_client = None
+        if self._postgres_conn is not None:
+            self._postgres_conn.close()
+            self._postgres_conn = None
+
+    # Checks
+    def check_mongo(self):
+        if self._mongo_client is None:
+            self._mongo_client = get_mongo_client(
+                serverSelectionTimeoutMS=int(self.timeout * 1000)
+            )
+        self._mongo_client.admin.command("ping")
+
+    def check_postgres(self):
+        if self._postgres_conn is None or self._postgres_conn.closed:
+            self._postgres_conn = get_postgres_connection(
+                Config.POSTGRES_DB, connect_timeout=max(1, int(self.timeout))
+            )
+        try:
+            with self._postgres_conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+                cursor.fetchone()
+            self._postgres_conn.rollback()
+        except Exception:
+            # Reconnect on the next check
+            self._postgres_conn.close()
+            self._postgres_conn = None
+            raise
+
+    def check_model(self):
+        # Imported here so that the monitor does not pull in the model stack at import
+        from models.registry import load_registry
+        from models.serving import get_model
+
+        for model in load_registry():
+            # Loads the model on first use, then only compares the file's mtime
+            get_model(model["path"])
+
+    def run_checks(self) -> dict:
+        """
+        Run every check once and publish the results.
+        """
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                check()
+                result = {"status": "up"}
+            except Exception as e:
+                result = {"status": "down", "error": str(e)}
+                logger.warning(f"Health check '{name}' failed: {e}")
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            result["checked_at"] = datetime.now(timezone.utc).isoformat()
+            results[name] = result
+
+        # Swap the whole snapshot so readers never see a partial update
+        self.results = results
+        self.last_run = time.monotonic()
+        return results
+
+    def run(self):
+        while not self._stop.is_set():
+            self.run_checks()
+            self._stop.wait(self.interval)
+
+    # Probes
+    def readiness(self) -> tuple:
+        """
+        Readiness from the cached snapshot.
+
+        Returns:
+            tuple: (ready, report) where the report holds per-dependency
+            status and latency of the last check.
+        """
+        results, last_run = self.results, self.last_run
+        age = None if last_run is None else time.monotonic() - last_run
+        stale = age is None or age > self.stale_after
+        ready = (
+            startup_report.warmup_complete
+            and not stale
+            and all(result["status"] == "up" for result in results.values())
+        )
+        report = {
+            "status": "ready" if ready else "not ready",
+            "warmup_complete": startup_report.warmup_complete,
+            "checked_seconds_ago": None if age is None else round(age, 3),
+            "stale": stale,
+            "dependencies": results,
+        }
+        return ready, report
+
+
+health_monitor = HealthMonitor()
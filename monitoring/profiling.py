@@ -0,0 +1,233 @@
+import asyncio
+import cProfile
+import hmac
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+from config import Config, logger
+
+MODES = ("cprofile", "sample")
+
+# Profile of the request being handled, if it asked for one
+_current_profile = ContextVar("current_profile", default=None)
+# cProfile cannot nest, and samples of concurrent profiles would mix
+_profile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Sampling profiler: a thread records the stack of every other thread every
+    `interval` seconds. Cheap enough for production, and unlike cProfile it
+    sees worker threads.
+    """
+
+    def __init__(self, interval: float = Config.PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class RequestProfile:
+    """
+    Profile of one request: cProfile on the event loop thread plus one per
+    `run_in_thread` call, or a stack sampler over all threads.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.thread_profiles = []
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(Config.PROFILE_SAMPLE_INTERVAL)
+            self.profiler.start()
+
+    def finish(self, label: str) -> str:
+        """
+        Stop profiling and write the result to PROFILE_DIR.
+
+        Returns:
+            str: File name of the `.pstats` or collapsed-stack `.folded` file.
+        """
+        if self.mode == "cprofile":
+            self.profiler.disable()
+            stats = pstats.Stats(self.profiler)
+            for profiler in self.thread_profiles:
+                stats.add(profiler)
+            path = profile_path(label, "pstats")
+            stats.dump_stats(path)
+        else:
+            path = profile_path(label, "folded")
+            write_collapsed(self.profiler.stop(), path)
+        logger.info(f"Profile of {label} written to {path}")
+        return os.path.basename(path)
+
+
+def profile_path(label: str, extension: str) -> str:
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+    return os.path.join(Config.PROFILE_DIR, f"{timestamp}_{slug}.{extension}")
+
+
+def write_collapsed(counts: Counter, path: str):
+    """
+    Write stacks in the collapsed format read by flamegraph.pl and speedscope:
+    `thread;outer;...;inner count`, one stack per line.
+    """
+    with open(path, "w") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def authorized(token) -> bool:
+    # Without a configured token, profiling stays closed rather than open to anyone
+    if not Config.PROFILE_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), Config.PROFILE_TOKEN.encode())
+
+
+def start_profile(mode: str):
+    """
+    Start profiling the current request, or return None if another profile runs.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profile = RequestProfile(mode)
+    except BaseException:
+        _profile_lock.release()
+        raise
+    _current_profile.set(profile)
+    return profile
+
+
+def finish_profile(profile: RequestProfile, label: str) -> str:
+    try:
+        return profile.finish(label)
+    finally:
+        _current_profile.set(None)
+        _profile_lock.release()
+
+
+async def run_in_thread(func, *args):
+    """
+    `asyncio.to_thread` that extends a cProfile of the current request to the
+    worker thread. Without an active profile it only adds a context lookup.
+    """
+    profile = _current_profile.get()
+    if profile is None or profile.mode != "cprofile":
+        return await asyncio.to_thread(func, *args)
+
+    def profiled():
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            profile.thread_profiles.append(profiler)
+
+    return await asyncio.to_thread(profiled)
+
+
+async def profiling_middleware(request, call_next):
+    """
+    Profile requests sent with `X-Profile: cprofile` or `X-Profile: sample`
+    plus an `X-Profile-Token` matching PROFILE_TOKEN; without PROFILE_TOKEN
+    every profiling request is refused. The file name of the profile is
+    returned in the `X-Profile-File` header. Only installed when
+    PROFILING_ENABLED is set, so other deployments pay nothing.
+    """
+    mode = request.headers.get("x-profile")
+    if mode is None:
+        return await call_next(request)
+    if mode not in MODES:
+        return JSONResponse(
+            status_code=400, content={"detail": f"X-Profile must be one of {list(MODES)}."}
+        )
+    if not authorized(request.headers.get("x-profile-token")):
+        return JSONResponse(status_code=403, content={"detail": "Invalid profiling token."})
+
+    profile = start_profile(mode)
+    if profile is None:
+        response = await call_next(request)
+        response.headers["X-Profile-File"] = "busy"
+        return response
+
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        name = finish_profile(profile, f"{request.method} {request.url.path}")
+    response.headers["X-Profile-File"] = name
+    response.headers["X-Profile-Seconds"] = f"{time.perf_counter() - start:.3f}"
+    return response
+
+
+async def profile_window(seconds: float) -> dict:
+    """
+    Sample all threads for `seconds` and store the collapsed stacks.
+
+    Returns:
+        dict: The file name and the number of samples, or None if another
+        profile is running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = StackSampler(Config.PROFILE_SAMPLE_INTERVAL)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            counts = sampler.stop()
+        path = profile_path(f"window {seconds:g}s", "folded")
+        write_collapsed(counts, path)
+    finally:
+        _profile_lock.release()
+    logger.info(f"Profile of a {seconds}s window written to {path}")
+    return {"file": os.path.basename(path), "samples": sampler.samples}
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    return sorted(os.listdir(Config.PROFILE_DIR), reverse=True)
@@ -0,0 +1,177 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+import time
+
+from config import Config, logger
+
+# Imported during warmup instead of at module import time
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "joblib",
+    "sklearn.ensemble",
+    "pymongo",
+    "psycopg2",
+    "psycopg2.extras",
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<name>.+)$"
+)
+
+
+class StartupReport:
+    """
+    Collects timings of the application startup: how long the heavy imports
+    took during warmup and how long it took until the first prediction.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.import_times = {}
+        self.stages = {}
+        self.warmup_complete = False
+        self.model_loaded = False
+        self.time_to_first_prediction = None
+        self.error = None
+
+    def record_stage(self, name: str, seconds: float):
+        self.stages[name] = seconds
+        logger.debug(f"Startup stage '{name}' took {seconds:.4f}s")
+
+    def to_dict(self) -> dict:
+        return {
+            "uptime_seconds": time.perf_counter() - self.started_at,
+            "warmup_complete": self.warmup_complete,
+            "model_loaded": self.model_loaded,
+            "time_to_first_prediction": self.time_to_first_prediction,
+            "import_times": dict(self.import_times),
+            "stages": dict(self.stages),
+            "error": self.error,
+        }
+
+
+startup_report = StartupReport()
+
+
+def import_heavy_modules(report: StartupReport = startup_report):
+    """
+    Import the heavy dependencies one by one and record how long each took.
+
+    Modules already imported by an earlier entry are cached, so each timing is
+    the incremental cost of that module.
+    """
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not import '{name}' during warmup: {e}")
+            continue
+        report.import_times[name] = time.perf_counter() - start
+
+
+def warmup(report: StartupReport = startup_report, model_files: list = None):
+    """
+    Import heavy modules, load the models and run one prediction so that the
+    first real request does not pay for any of it.
+
+    Args:
+        report (StartupReport): Report to record the timings into.
+        model_files (list, optional): Models to load; all registered models by default.
+    """
+    # Imported here so that importing this module stays cheap
+    from models.registry import load_registry
+    from models.serving import get_model
+
+    logger.info("Starting warmup...")
+    try:
+        start = time.perf_counter()
+        import_heavy_modules(report)
+        report.record_stage("imports", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        if model_files is None:
+            model_files = [model["path"] for model in load_registry()]
+        models = [get_model(model_file) for model_file in model_files]
+        report.model_loaded = True
+        report.record_stage("model_load", time.perf_counter() - start)
+
+        import numpy as np
+
+        start = time.perf_counter()
+        models[0].predict(np.zeros((1, len(Config.EXPECTED_FEATURES)), dtype=np.float32))
+        report.record_stage("first_prediction", time.perf_counter() - start)
+        report.time_to_first_prediction = time.perf_counter() - report.started_at
+        logger.info(
+            f"Warmup completed. Time to first prediction: {report.time_to_first_prediction:.3f}s"
+        )
+    except Exception as e:
+        report.error = str(e)
+        logger.error(f"Warmup failed: {e}")
+    finally:
+        report.warmup_complete = True
+
+
+def parse_importtime(output: str, top: int = None) -> list:
+    """
+    Parse the stderr output of `python -X importtime`.
+
+    Args:
+        output (str): Raw `-X importtime` output.
+        top (int, optional): Only return the `top` entries by cumulative time.
+
+    Returns:
+        list: Dictionaries with `module`, `self_us` and `cumulative_us`,
+        sorted by cumulative time (descending).
+    """
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        entries.append(
+            {
+                "module": match.group("name").strip(),
+                "self_us": int(match.group("self")),
+                "cumulative_us": int(match.group("cumulative")),
+            }
+        )
+    entries.sort(key=lambda entry: entry["cumulative_us"], reverse=True)
+    return entries[:top] if top else entries
+
+
+def profile_imports(target: str = "main", top: int = 25) -> dict:
+    """
+    Import `target` in a fresh interpreter with `-X importtime` and report the
+    most expensive imports.
+
+    Args:
+        target (str): Module to import.
+        top (int): Number of entries to return.
+
+    Returns:
+        dict: Total wall time and the parsed import breakdown.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT,
+    )
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        logger.error(f"Import profiling of '{target}' failed: {result.stderr[-500:]}")
+        raise RuntimeError(f"Importing '{target}' failed.")
+
+    return {
+        "target": target,
+        "wall_time_seconds": wall_time,
+        "imports": parse_importtime(result.stderr, top=top),
+    }
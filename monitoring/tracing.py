@@ -0,0 +1,416 @@
+"""
+Lightweight tracing with W3C trace-context propagation.
+
+Spans follow the OpenTelemetry data model and are exported as OTLP/JSON, one
+`ExportTraceServiceRequest` per line, which the OpenTelemetry Collector's
+`otlpjsonfile` receiver (and most tracing backends' importers) can ingest.
+The console exporter logs one line per span instead.
+
+Sampling is decided once per trace: a new trace is sampled with probability
+TRACE_SAMPLE_RATIO, and a trace continued from a `traceparent` header keeps
+the caller's decision. Spans of unsampled traces, and all spans when
+TRACING_ENABLED is off, are a shared no-op object.
+"""
+
+import functools
+import inspect
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import Config, logger
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current_span = ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """
+    Identifiers of a span, as carried in a `traceparent` header.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header):
+    """
+    Parse a W3C `traceparent` header.
+
+    Returns:
+        SpanContext: The remote parent, or None if the header is missing or invalid.
+    """
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if (
+        len(trace_id) != 32
+        or len(span_id) != 16
+        or len(flags) != 2
+        or trace_id == "0" * 32
+        or span_id == "0" * 16
+    ):
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(trace_id, span_id, sampled)
+
+
+class NoopSpan:
+    """
+    Stand-in for spans that are not recorded. Still carries the context, so
+    unsampled traces propagate their decision downstream.
+    """
+
+    recording = False
+
+    def __init__(self, context: SpanContext = None):
+        self.context = context
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def set_attributes(self, attributes: dict):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    """
+    A recorded span. Spans of the same trace started in this process are
+    exported together when their local root ends.
+    """
+
+    recording = True
+
+    def __init__(self, name: str, context: SpanContext, parent_span_id, kind: int, local_root):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = {}
+        self.events = []
+        self.status = {"code": STATUS_OK}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        # Finished spans waiting for the local root to end, guarded by its lock
+        # since children may end in other threads
+        self.local_root = local_root or self
+        self.finished = [] if local_root is None else None
+        self._lock = threading.Lock() if local_root is None else None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exception: BaseException):
+        self.status = {"code": STATUS_ERROR, "message": str(exception)}
+        self.events.append(
+            {
+                "timeUnixNano": str(time.time_ns()),
+                "name": "exception",
+                "attributes": _otlp_attributes(
+                    {
+                        "exception.type": type(exception).__name__,
+                        "exception.message": str(exception),
+                    }
+                ),
+            }
+        )
+
+    def end(self):
+        root = self.local_root
+        with root._lock:
+            self.end_ns = time.time_ns()
+            if root is self:
+                self.finished.append(self)
+                tracer.export(self.finished)
+                return
+            if root.end_ns is None:
+                root.finished.append(self)
+                return
+        # Outlived its local root, e.g. in a background thread
+        tracer.export([self])
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": self.status,
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            value = {"boolValue": value}
+        elif isinstance(value, int):
+            value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            value = {"doubleValue": value}
+        else:
+            value = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": value})
+    return encoded
+
+
+class Tracer:
+    """
+    Creates spans and exports finished traces to a JSON lines file or the log.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = Config.TRACING_ENABLED,
+        sample_ratio: float = Config.TRACE_SAMPLE_RATIO,
+        exporter: str = Config.TRACE_EXPORTER,
+        path: str = Config.TRACE_FILE,
+        service_name: str = Config.SERVICE_NAME,
+    ):
+        self.enabled = enabled
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self.path = path
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, parent: SpanContext = None):
+        """
+        Start a span under `parent`, or under the current span of this context.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        current = _current_span.get()
+        if parent is None and current is not None:
+            parent = current.context
+            local_root = current.local_root if current.recording else None
+        else:
+            local_root = None
+
+        if parent is None:
+            context = SpanContext(
+                f"{random.getrandbits(128):032x}",
+                f"{random.getrandbits(64):016x}",
+                random.random() < self.sample_ratio,
+            )
+        else:
+            context = SpanContext(parent.trace_id, f"{random.getrandbits(64):016x}", parent.sampled)
+        if not context.sampled:
+            return NoopSpan(context)
+        return Span(name, context, parent.span_id if parent else None, kind, local_root)
+
+    def export(self, spans: list):
+        if self.exporter == "console":
+            for span in spans:
+                logger.info(
+                    f"span {span.name} trace={span.context.trace_id} span={span.context.span_id} "
+                    f"parent={span.parent_span_id} "
+                    f"duration_ms={(span.end_ns - span.start_ns) / 1e6:.3f} "
+                    f"status={span.status['code']} {span.attributes}"
+                )
+            return
+
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": self.resource,
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "housing-api"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Failed to export {len(spans)} spans to {self.path}: {e}")
+
+
+tracer = Tracer()
+
+
+class _DisabledSpan:
+    """
+    Context manager handed out while tracing is off, so `span()` costs one
+    attribute check and no generator.
+    """
+
+    def __enter__(self):
+        return NOOP_SPAN
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+def span(name: str, kind: int = KIND_INTERNAL, parent: SpanContext = None, **attributes):
+    """
+    Trace the enclosed block as a child of the current span.
+
+    Example:
+        with span("process.score", rows=len(documents)) as current:
+            ...
+            current.set_attribute("rows.scored", len(df))
+    """
+    if not tracer.enabled:
+        return _DISABLED_SPAN
+    return _span(name, kind, parent, attributes)
+
+
+@contextmanager
+def _span(name: str, kind: int, parent: SpanContext, attributes: dict):
+    current = tracer.start_span(name, kind, parent)
+    if not current.recording:
+        # Unsampled: only carry the context, so children inherit the decision
+        token = _current_span.set(current)
+        try:
+            yield current
+        finally:
+            _current_span.reset(token)
+        return
+
+    current.set_attributes(attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def current_span():
+    """
+    The span of the current context, or a no-op span.
+    """
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_traceparent():
+    """
+    `traceparent` of the current span, for handing the trace to another process.
+    """
+    current = _current_span.get()
+    return current.context.traceparent() if current is not None and current.context else None
+
+
+def traced(name: str = None, kind: int = KIND_INTERNAL, **attributes):
+    """
+    Decorator tracing every call of a function. Static `attributes` are added
+    to each span; the function can add more via `current_span()`.
+    """
+
+    def decorate(function):
+        span_name = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with span(span_name, kind, **attributes):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def traced_db(system: str, target: str):
+    """
+    `traced` for database queries: a client span with `db.system`, `db.name`
+    and the collection or table (`target` names the argument holding it).
+    """
+
+    def decorate(function):
+        signature = inspect.signature(function)
+        span_name = f"{system} {function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with span(span_name, KIND_CLIENT, **{"db.system": system}) as current:
+                if current.recording:
+                    bound = signature.bind_partial(*args, **kwargs).arguments
+                    current.set_attributes(
+                        {
+                            "db.name": bound.get("db_name"),
+                            "db.collection" if system == "mongodb" else "db.sql.table": bound.get(
+                                target
+                            ),
+                        }
+                    )
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+async def tracing_middleware(request, call_next):
+    """
+    Server span per request, continuing the caller's `traceparent`. The
+    response carries the `traceparent` of the server span.
+    """
+    parent = parse_traceparent(request.headers.get("traceparent"))
+    with span(
+        f"{request.method} {request.url.path}",
+        KIND_SERVER,
+        parent,
+        **{"http.request.method": request.method, "url.path": request.url.path},
+    ) as current:
+        response = await call_next(request)
+        current.set_attribute("http.response.status_code", response.status_code)
+        if current.recording and response.status_code >= 500:
+            current.status = {"code": STATUS_ERROR}
+        if current.context is not None:
+            response.headers["traceparent"] = current.context.traceparent()
+        return response
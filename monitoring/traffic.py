@@ -0,0 +1,219 @@
+"""
+Capture of live request traffic, for replay with `benchmarks.replay`.
+
+Every captured request becomes one JSON line in TRAFFIC_FILE:
+
+    {"ts": 1700000000.123, "method": "GET", "path": "/api/predicted_data/",
+     "query": [["limit", "10"]], "headers": {"accept": "*/*"}, "body": null,
+     "status": 200, "duration_ms": 12.3, "response_bytes": 2048}
+
+Request bodies are referenced rather than inlined: `body` holds their size
+and SHA-256, and bodies up to TRAFFIC_MAX_BODY_MB are stored once per hash
+in TRAFFIC_BODY_DIR, so repeated uploads of the same file cost one copy.
+Bodies are written while they stream in and never held in memory. Only
+headers needed to replay a request are kept, so tokens and cookies are not
+captured.
+
+Hashing and file IO run on one writer thread per recorder, not on the event
+loop. A request awaits each of its body chunks being written before reading
+the next, so a slow disk slows captured uploads down instead of buffering
+them in memory, and its line is appended after the response was sent.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from config import Config, logger
+
+# Headers a replayed request needs to be answered the same way
+CAPTURED_HEADERS = ("accept", "content-type", "if-none-match")
+
+
+class BodyCapture:
+    """
+    Hashes a request body chunk by chunk and spools it to a temporary file in
+    the body directory, unless it grows beyond `max_bytes`.
+    """
+
+    def __init__(self, body_dir: str, max_bytes: int):
+        self.body_dir = body_dir
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._path = None
+        self._file = None
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self.size > self.max_bytes:
+            self._discard()
+            return
+        try:
+            if self._file is None and self._path is None:
+                os.makedirs(self.body_dir, exist_ok=True)
+                self._path = os.path.join(self.body_dir, f".{uuid.uuid4().hex}.part")
+                self._file = open(self._path, "wb")
+            if self._file is not None:
+                self._file.write(chunk)
+        except OSError as e:
+            logger.warning(f"Failed to store a captured request body: {e}")
+            self._discard()
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        # Keep a marker so that later chunks are not stored either
+        self._path = ""
+
+    def finish(self):
+        """
+        Returns:
+            dict: `bytes`, `sha256` and the stored `file` name (None if the body
+            was too large), or None for an empty body.
+        """
+        if not self.size:
+            return None
+        digest = self._hash.hexdigest()
+        name = None
+        if self._file is not None:
+            self._file.close()
+            name = f"{digest}.body"
+            try:
+                # Bodies are stored once per content; os.replace is atomic
+                os.replace(self._path, os.path.join(self.body_dir, name))
+            except OSError as e:
+                logger.warning(f"Failed to store a captured request body: {e}")
+                name = None
+        return {"bytes": self.size, "sha256": digest, "file": name}
+
+
+class TrafficRecorder:
+    """
+    Appends captured requests to a JSON lines file.
+    """
+
+    def __init__(
+        self,
+        path: str = Config.TRAFFIC_FILE,
+        body_dir: str = Config.TRAFFIC_BODY_DIR,
+        max_body_mb: float = Config.TRAFFIC_MAX_BODY_MB,
+        sample_ratio: float = Config.TRAFFIC_SAMPLE_RATIO,
+        exclude: tuple = Config.TRAFFIC_EXCLUDE,
+    ):
+        self.path = path
+        self.body_dir = body_dir
+        self.max_body_bytes = int(max_body_mb * 2**20)
+        self.sample_ratio = sample_ratio
+        self.exclude = tuple(exclude)
+        self.captured = 0
+        self._lock = threading.Lock()
+        # A single thread keeps the appends of concurrent requests in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="traffic-capture")
+
+    def should_capture(self, path: str) -> bool:
+        if self.exclude and path.startswith(self.exclude):
+            return False
+        return self.sample_ratio >= 1 or random.random() < self.sample_ratio
+
+    def body_capture(self) -> BodyCapture:
+        return BodyCapture(self.body_dir, self.max_body_bytes)
+
+    async def run(self, function, *args):
+        """
+        Run blocking capture work on the recorder's writer thread.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def record(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(line)
+            self.captured += 1
+        except OSError as e:
+            logger.warning(f"Failed to capture a request to {self.path}: {e}")
+
+
+traffic_recorder = TrafficRecorder()
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording every request that `recorder` selects. Written
+    against the raw ASGI interface, unlike the other middlewares, so that the
+    request body can be teed to disk as it streams through. Only installed
+    when TRAFFIC_CAPTURE_ENABLED is set.
+    """
+
+    def __init__(self, app, recorder: TrafficRecorder = None):
+        self.app = app
+        self.recorder = recorder or traffic_recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.recorder.should_capture(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time.time()
+        start = time.perf_counter()
+        body = self.recorder.body_capture()
+        response = {"status": None, "bytes": 0}
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request" and message.get("body"):
+                await self.recorder.run(body.write, message["body"])
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            headers = {}
+            for name, value in scope.get("headers", []):
+                name = name.decode("latin-1")
+                if name in CAPTURED_HEADERS:
+                    headers[name] = value.decode("latin-1")
+            entry = {
+                "ts": round(timestamp, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": parse_qsl(
+                    scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True
+                ),
+                "headers": headers,
+                "body": None,
+                # No response started means the app raised: the server answers 500
+                "status": response["status"] or 500,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "response_bytes": response["bytes"],
+            }
+
+            def finish():
+                entry["body"] = body.finish()
+                self.recorder.record(entry)
+
+            await self.recorder.run(finish)
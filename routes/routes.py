@@ -1,18 +1,52 @@
-from fastapi import HTTPException, APIRouter, UploadFile, File
-from pymongo import MongoClient
-import pandas as pd
-from analytics.preprocessor import preprocess_housing_data
-from database_handler.db_connector import get_postgres_connection
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+from fastapi import HTTPException, APIRouter, UploadFile, File, BackgroundTasks, Header
+from analytics.drift import DriftProfile, compare_profiles, load_baseline
+from analytics.ingest import estimate_upload_memory_mb, ingest_files
+from analytics.parallel_scoring import score_collection_parallel
+from analytics.spatial_index import prediction_index
+from analytics.grid_rollup import (
+    GRID_ZOOM_LEVELS,
+    bbox_cell_range,
+    cell_bounds,
+    grid_cache,
+    parse_bbox,
+)
+from analytics.scoring import estimate_scoring_memory_mb, score_documents, store_predictions
+from database_handler.db_connector import get_mongo_client, get_postgres_connection
 from database_handler.db_queries import (
-    insert_data_to_mongo,
     delete_all_from_mongo,
-    save_to_postgres,
+    drop_and_recreate_mongo_collection,
+    purge_predictions,
     fetch_predictions,
+    fetch_latest_prediction_points,
+    find_raw_near,
+    fetch_grid_cells,
+    save_drift_profile,
+    fetch_drift_profiles,
+    bump_collection_version,
+    fetch_collection_version,
+    fetch_predictions_version,
 )
 from config import Config
-import joblib
 from datetime import datetime
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from models.registry import load_registry
+from models.serving import get_model_metadata, is_model_loaded
+from models.uncertainty import parse_quantiles
+from monitoring.health import health_monitor
+from monitoring.profiling import authorized, list_profiles, profile_window, run_in_thread
+from monitoring.startup import startup_report, profile_imports
+from monitoring.tracing import span
+from utils.admission import admission_controllers
+from utils.http_cache import conditional_response
+from utils.lazy_import import lazy_import
+from workers.change_stream import change_stream_consumer
+
+pd = lazy_import("pandas")
 
 logger = Config.setup_logger()
 router = APIRouter()
@@ -20,78 +54,187 @@ router = APIRouter()
 
 @router.post("/upload")
 async def upload_data(
-    file: UploadFile = File(...),
+    file: List[UploadFile] = File(...),
     db_name: str = Config.MONGO_DB_NAME,
     collection_name: str = Config.MONGO_COLLECTION,
 ):
-    logger.info(f"Received upload request for file: {file.filename}")
+    """
+    Upload one or more CSV files (repeat the `file` field). Files may be gzip or
+    zstd compressed, or zip/tar archives of CSVs; they are parsed and
+    preprocessed in parallel worker processes.
+    """
+    filenames = [upload.filename for upload in file]
+    logger.info(f"Received upload request for files: {filenames}")
     logger.info(f"Target database: {db_name}, collection: {collection_name}")
 
-    try:
-        # Load the file content
-        content = await file.read()
-        logger.info(
-            f"File '{file.filename}' read successfully. Size: {len(content)} bytes"
-        )
+    # Bound concurrent ingests by count and estimated memory; the files are
+    # already spooled to disk by the form parser
+    memory_mb = estimate_upload_memory_mb(filenames)
+    async with admission_controllers["upload"].admit(memory_mb):
+        workdir = tempfile.mkdtemp(prefix="upload_")
+        try:
+            # Stream the uploads to disk without holding them in memory
+            uploads = []
+            with span("upload.save_files", files=len(file)) as current:
+                for index, upload in enumerate(file):
+                    temp_file_path = os.path.join(
+                        workdir, f"{index}_{os.path.basename(upload.filename)}"
+                    )
+                    with open(temp_file_path, "wb") as f:
+                        shutil.copyfileobj(upload.file, f, 1024 * 1024)
+                    uploads.append((temp_file_path, upload.filename))
+                    logger.info(
+                        f"File '{upload.filename}' saved. Size: {os.path.getsize(temp_file_path)} bytes"
+                    )
+                current.set_attribute("bytes", sum(os.path.getsize(path) for path, _ in uploads))
+
+            # Parse, preprocess and insert every file in parallel, sketching feature
+            # distributions for drift checks on the way
+            with span("upload.ingest", files=len(uploads)) as current:
+                try:
+                    stats, profile = await run_in_thread(
+                        ingest_files, uploads, db_name, collection_name, workdir
+                    )
+                finally:
+                    # Also after a failure: some files may be inserted already.
+                    # Off the event loop, as MongoDB may be what failed
+                    await run_in_thread(record_write, db_name, collection_name)
+                total_records = sum(file_stats["rows"] for file_stats in stats)
+                current.set_attribute("rows", total_records)
+            logger.info(
+                f"Data successfully inserted into {db_name}.{collection_name}. Total records: {total_records}"
+            )
 
-        # Save the file temporarily
-        temp_file_path = f"temp_{file.filename}"
-        with open(temp_file_path, "wb") as f:
-            f.write(content)
+            if stats and all("error" in file_stats for file_stats in stats):
+                raise HTTPException(
+                    status_code=400,
+                    detail={"message": "No file could be ingested.", "files": stats},
+                )
+
+            try:
+                save_drift_profile(
+                    profile.to_dict(),
+                    "upload",
+                    ", ".join(filenames),
+                    db_name,
+                    Config.DRIFT_COLLECTION,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to store the drift profile of {filenames}: {e}")
+
+            return {
+                "message": "Data uploaded and stored successfully.",
+                "rows": total_records,
+                "files": stats,
+            }
+
+        except HTTPException as http_err:
+            logger.error(f"HTTP Exception: {http_err.detail}")
+            raise http_err
+        except Exception as e:
+            logger.error(f"Unexpected error occurred: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error.")
+        finally:
+            # Clean up the temporary files
+            shutil.rmtree(workdir, ignore_errors=True)
+            logger.info(f"Temporary directory '{workdir}' deleted.")
 
-        # Preprocess data
-        logger.info(f"Starting data preprocessing for file: {temp_file_path}")
-        X, y = preprocess_housing_data(temp_file_path)
-        logger.info(
-            f"Data preprocessing completed. Features shape: {X.shape}, Target shape: {y.shape}"
-        )
 
-        # Combine features and target into a list of dictionaries
-        processed_data = X.assign(target=y).to_dict(orient="records")
-        logger.info(
-            f"Processed data formatted for MongoDB. Total records: {len(processed_data)}"
-        )
+@router.delete("/delete_mongodb/")
+async def delete_mongodb(
+    background_tasks: BackgroundTasks,
+    db_name: str = Config.MONGO_DB_NAME,
+    collection_name: str = Config.MONGO_COLLECTION,
+    fast: bool = False,
+    background: bool = False,
+):
+    """
+    Delete all documents from a MongoDB collection.
 
-        # Insert into MongoDB
-        logger.info(
-            f"Inserting processed data into MongoDB: {db_name}.{collection_name}"
+    With `fast` the collection is dropped and recreated with its indexes instead
+    of deleting documents one by one. With `background` the deletion is scheduled
+    and the endpoint returns immediately.
+    """
+    logger.info(
+        f"Received request to delete all documents from {db_name}.{collection_name} "
+        f"(fast={fast}, background={background})"
+    )
+    purge = drop_and_recreate_mongo_collection if fast else delete_all_from_mongo
+    try:
+        if background:
+            background_tasks.add_task(purge, db_name, collection_name)
+            background_tasks.add_task(record_write, db_name, collection_name)
+            logger.info(f"Deletion of {db_name}.{collection_name} scheduled.")
+            return {
+                "message": f"Deletion of all documents in {db_name}.{collection_name} has been scheduled."
+            }
+
+        try:
+            await run_in_thread(purge, db_name, collection_name)
+        finally:
+            await run_in_thread(record_write, db_name, collection_name)
+        logger.info(f"All documents deleted from {db_name}.{collection_name}")
+        return {
+            "message": f"All documents in {db_name}.{collection_name} have been deleted successfully."
+        }
+    except Exception as e:
+        logger.error(f"Error deleting documents from {db_name}.{collection_name}: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to delete documents from MongoDB."
         )
-        insert_data_to_mongo(processed_data, db_name, collection_name)
-        logger.info(f"Data successfully inserted into {db_name}.{collection_name}")
-
-        # Clean up the temporary file
-        import os
-
-        os.remove(temp_file_path)
-        logger.info(f"Temporary file '{temp_file_path}' deleted.")
 
-        return {"message": "Data uploaded and stored successfully."}
 
-    except HTTPException as http_err:
-        logger.error(f"HTTP Exception: {http_err.detail}")
-        raise http_err
+def record_write(db_name: str, collection_name: str):
+    """
+    Bump the version of a collection after writing it, which invalidates
+    cached reads. Bumping afterwards means a read racing the write can only
+    cache the new data under the old version, never the old data under the
+    new one. Blocks for up to VERSION_TIMEOUT seconds, so run it in a thread.
+    """
+    try:
+        bump_collection_version(
+            db_name,
+            collection_name,
+            Config.VERSION_COLLECTION,
+            serverSelectionTimeoutMS=int(Config.VERSION_TIMEOUT * 1000),
+        )
     except Exception as e:
-        logger.error(f"Unexpected error occurred: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error.")
+        logger.warning(f"Failed to bump the version of {db_name}.{collection_name}: {e}")
 
 
-@router.delete("/delete_mongodb/")
-async def delete_mongodb(
-    db_name: str = Config.MONGO_DB_NAME, collection_name: str = Config.MONGO_COLLECTION
+@router.delete("/delete_predictions/")
+async def delete_predictions(
+    background_tasks: BackgroundTasks,
+    older_than: Optional[datetime] = None,
+    db_name: str = Config.POSTGRES_DB,
+    table_name: str = Config.POSTGRES_table,
+    background: bool = False,
 ):
+    """
+    Purge predictions from PostgreSQL by truncating the table, or by dropping
+    time chunks older than `older_than`.
+    """
     logger.info(
-        f"Received request to delete all documents from {db_name}.{collection_name}"
+        f"Received request to purge predictions from {table_name} "
+        f"(older_than={older_than}, background={background})"
     )
     try:
-        delete_all_from_mongo(db_name, collection_name)
-        logger.info(f"All documents deleted from {db_name}.{collection_name}")
+        if background:
+            background_tasks.add_task(
+                purge_predictions, db_name, table_name, older_than
+            )
+            logger.info(f"Purge of {table_name} scheduled.")
+            return {"message": f"Purge of predictions in {table_name} has been scheduled."}
+
+        result = purge_predictions(db_name, table_name, older_than)
         return {
-            "message": f"All documents in {db_name}.{collection_name} have been deleted successfully."
+            "message": f"Predictions in {table_name} have been purged successfully.",
+            **result,
         }
     except Exception as e:
-        logger.error(f"Error deleting documents from {db_name}.{collection_name}: {e}")
+        logger.error(f"Error purging predictions from {table_name}: {e}")
         raise HTTPException(
-            status_code=500, detail="Failed to delete documents from MongoDB."
+            status_code=500, detail="Failed to purge predictions from PostgreSQL."
         )
 
 
@@ -101,9 +244,15 @@ async def get_data(
     collection_name: str = Config.MONGO_COLLECTION,
     skip: int = 0,
     limit: int = 10,
+    if_none_match: Optional[str] = Header(None),
 ):
-    try:
-        client = MongoClient(f"mongodb://{Config.MONGO_IP}:27017")
+    """
+    Fetch raw documents. Answers `If-None-Match` with 304 while the collection
+    is unchanged, and serves unchanged pages from the response cache.
+    """
+
+    def render():
+        client = get_mongo_client()
         db = client[db_name]
         collection = db[collection_name]
 
@@ -115,76 +264,334 @@ async def get_data(
         total = collection.count_documents({})
         client.close()
         return {"data": data, "skip": skip, "limit": limit, "total": total}
+
+    try:
+        with span("raw_data.version"):
+            version = await run_in_thread(
+                fetch_raw_data_version, db_name, collection_name
+            )
+        key = (
+            "raw_data",
+            db_name,
+            collection_name,
+            skip,
+            limit,
+            version["version"],
+            version["documents"],
+        )
+        # Rendering reads MongoDB too
+        return await run_in_thread(
+            conditional_response, key, if_none_match, render, version["updated_at"]
+        )
     except Exception as e:
         logger.error(f"Error in /raw_data endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def fetch_raw_data_version(db_name: str, collection_name: str) -> dict:
+    return fetch_collection_version(
+        db_name,
+        collection_name,
+        Config.VERSION_COLLECTION,
+        serverSelectionTimeoutMS=int(Config.VERSION_TIMEOUT * 1000),
+    )
+
+
 @router.get("/health")
 async def health_check():
-    logger.info("Performing health check")
+    """
+    Liveness probe. Answers without touching any dependency so that it is
+    available as soon as the process accepts connections.
+    """
+    return {"status": "healthy"}
+
+
+@router.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe answered from memory, with the age of the last dependency check.
+    """
+    _, report = health_monitor.readiness()
+    return {
+        "status": "alive",
+        "health_monitor_running": health_monitor.running,
+        "checked_seconds_ago": report["checked_seconds_ago"],
+    }
+
+
+@router.get("/health/ready")
+async def health_readiness_check():
+    """
+    Readiness probe answered from the cached background checks of MongoDB,
+    PostgreSQL and the models, with per-dependency status and latency.
+    """
+    ready, report = health_monitor.readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe. The service is ready once warmup has finished and MongoDB
+    answers a ping. Answered from the health monitor's cache while it runs.
+    """
+    if not startup_report.warmup_complete:
+        raise HTTPException(status_code=503, detail="Service is warming up.")
+
+    if health_monitor.running:
+        ready, _ = health_monitor.readiness()
+        if not ready:
+            raise HTTPException(status_code=503, detail="Service not ready.")
+        return {"status": "ready"}
+
     try:
-        client = MongoClient(f"mongodb://{Config.MONGO_IP}:27017")
+        client = get_mongo_client()
         client.admin.command("ping")
         client.close()
-        return {"status": "healthy"}
+        return {"status": "ready"}
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        raise HTTPException(status_code=503, detail="Service not ready.")
+
+
+@router.get("/startup_report")
+async def get_startup_report(imports: bool = False, top: int = 25):
+    """
+    Report startup timings. With `imports` the `-X importtime` breakdown of
+    importing the application in a fresh interpreter is included.
+    """
+    report = startup_report.to_dict()
+    if imports:
+        try:
+            report["import_profile"] = profile_imports("main", top=top)
+        except Exception as e:
+            logger.error(f"Failed to profile imports: {e}")
+            raise HTTPException(status_code=500, detail="Failed to profile imports.")
+    return report
+
+
+def check_profiling_access(token: Optional[str]):
+    if not Config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+    if not authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token.")
+
+
+@router.post("/admin/profile")
+async def profile_time_window(
+    seconds: float = 10.0, x_profile_token: Optional[str] = Header(None)
+):
+    """
+    Sample the stacks of all threads for a time window and store them as a
+    collapsed-stack flamegraph file. Requires PROFILING_ENABLED.
+    """
+    check_profiling_access(x_profile_token)
+    if not 0 < seconds <= Config.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {Config.PROFILE_MAX_SECONDS:g}].",
+        )
+    result = await profile_window(seconds)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Another profile is running.")
+    return result
+
+
+@router.get("/admin/profiles")
+async def get_profiles(x_profile_token: Optional[str] = Header(None)):
+    """
+    List stored profiles, newest first.
+    """
+    check_profiling_access(x_profile_token)
+    return {"profiles": list_profiles()}
+
+
+@router.get("/admin/profiles/{name}")
+async def download_profile(name: str, x_profile_token: Optional[str] = Header(None)):
+    """
+    Download a stored `.pstats` or `.folded` profile.
+    """
+    check_profiling_access(x_profile_token)
+    if name not in list_profiles():
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(os.path.join(Config.PROFILE_DIR, name), filename=name)
+
+
+@router.get("/model")
+async def get_model_info():
+    """
+    Return the metadata of the served model (training parameters, timings, MAE).
+    """
+    try:
+        return {"model_file": Config.MODEL_FILE, "metadata": get_model_metadata()}
+    except Exception as e:
+        logger.error(f"Error reading model metadata: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read model metadata.")
+
+
+@router.get("/models")
+async def get_registered_models():
+    """
+    List the registered model versions with their traffic weights and shadow flags.
+    """
+    try:
+        return {
+            "models": [
+                {**model, "loaded": is_model_loaded(model["path"])}
+                for model in load_registry()
+            ]
+        }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        raise HTTPException(status_code=500, detail="Service unhealthy.")
+        logger.error(f"Error loading model registry: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load model registry.")
+
+
+@router.get("/stream/status")
+async def get_stream_status():
+    """
+    Report the change stream consumer's state: processed events, pending batch
+    and lag behind the newest consumed event.
+    """
+    return {"enabled": Config.CHANGE_STREAM_ENABLED, **change_stream_consumer.metrics}
 
 
 @router.get("/process")
 async def process_data(
     db_name: str = Config.MONGO_DB_NAME,
     collection_name: str = Config.MONGO_COLLECTION,
+    quantiles: Optional[str] = None,
+    std: Optional[bool] = None,
+    parallel: Optional[bool] = None,
+    partitions: Optional[int] = None,
+    table_name: str = Config.POSTGRES_table,
 ):
+    """
+    Score all uploaded documents into `table_name`. `quantiles` (e.g. "0.05,0.95") and `std`
+    add prediction intervals taken from the per-tree outputs of the forest;
+    they default to PREDICTION_QUANTILES and PREDICTION_STD. The read models
+    (spatial index, grid rollup, drift sketch) only follow POSTGRES_table.
+
+    With `parallel` (default PROCESS_PARALLEL) the collection is split into
+    `partitions` `_id` ranges scored on PROCESS_WORKERS processes. Ranges that
+    still fail after their retries are reported with a 500; the others stay
+    stored.
+    """
     logger.info(f"Starting data processing for {db_name}.{collection_name}")
     try:
-        client = MongoClient(f"mongodb://{Config.MONGO_IP}:27017")
-        db = client[db_name]
-        collection = db[collection_name]
+        quantiles = Config.PREDICTION_QUANTILES if quantiles is None else parse_quantiles(quantiles)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    std = Config.PREDICTION_STD if std is None else std
+    parallel = Config.PROCESS_PARALLEL if parallel is None else parallel
+    if partitions is not None and partitions < 1:
+        raise HTTPException(status_code=400, detail="partitions must be at least 1.")
 
-        data = list(collection.find())
-        client.close()
+    try:
+        with span("process.count_documents") as current:
+            # Off the event loop too: with MongoDB down this waits for the
+            # server selection timeout
+            n_documents = await run_in_thread(count_documents, db_name, collection_name)
+            current.set_attribute("rows", n_documents)
+    except Exception as e:
+        logger.error(f"Error during data processing: {e}")
+        raise HTTPException(status_code=500, detail="Failed to process data.")
 
-        if not data:
-            logger.error("No data found in the collection.")
-            raise HTTPException(
-                status_code=404, detail="No data found in the collection."
+    if parallel:
+        # Workers hold one batch each instead of the whole collection
+        workers = Config.PROCESS_WORKERS or os.cpu_count() or 1
+        n_resident = min(n_documents, workers * Config.PROCESS_BATCH_SIZE)
+    else:
+        n_resident = n_documents
+
+    # Bound concurrent runs by count and by the memory the collection needs
+    async with admission_controllers["process"].admit(estimate_scoring_memory_mb(n_resident)):
+        try:
+            # Off the event loop, so that other routes keep answering
+            if not parallel:
+                await run_in_thread(
+                    score_collection, db_name, collection_name, quantiles, std, table_name
+                )
+                return {"message": "Data processed and stored successfully in PostgreSQL."}
+
+            result = await run_in_thread(
+                score_collection_parallel,
+                db_name,
+                collection_name,
+                quantiles,
+                std,
+                Config.PROCESS_WORKERS,
+                partitions,
+                table_name,
             )
+            if result["failed"]:
+                return JSONResponse(
+                    status_code=500,
+                    content={"detail": "Some partitions failed to process.", **result},
+                )
+            if not result["rows"]:
+                logger.error("No data found in the collection.")
+                raise HTTPException(status_code=404, detail="No data found in the collection.")
+            return {"message": "Data processed and stored successfully in PostgreSQL.", **result}
+
+        except HTTPException as http_err:
+            raise http_err
+        except FileNotFoundError:
+            logger.error("Model file not found.")
+            raise HTTPException(status_code=500, detail="Model file not found.")
+        except Exception as e:
+            logger.error(f"Error during data processing: {e}")
+            raise HTTPException(status_code=500, detail="Failed to process data.")
+
+
+def count_documents(db_name: str, collection_name: str) -> int:
+    """
+    Estimated size of a collection, failing after PROCESS_COUNT_TIMEOUT
+    seconds when MongoDB cannot be reached.
+    """
+    client = get_mongo_client(serverSelectionTimeoutMS=int(Config.PROCESS_COUNT_TIMEOUT * 1000))
+    try:
+        return int(client[db_name][collection_name].estimated_document_count())
+    finally:
+        client.close()
 
-        df = pd.DataFrame(data)
-        if "_id" in df.columns:
-            df.drop(columns=["_id"], inplace=True)
-
-        missing_cols = [
-            col for col in Config.EXPECTED_FEATURES if col not in df.columns
-        ]
-        for col in missing_cols:
-            df[col] = 0
-        df = df[Config.EXPECTED_FEATURES]
 
-        logger.info(f"Loading model from {Config.MODEL_FILE}")
-        model = joblib.load(Config.MODEL_FILE)
+def score_collection(
+    db_name: str,
+    collection_name: str,
+    quantiles: tuple,
+    std: bool,
+    table_name: str = Config.POSTGRES_table,
+):
+    """
+    Score every document of a collection and store the predictions.
 
-        logger.info("Generating predictions...")
-        predictions = model.predict(df)
+    Raises:
+        HTTPException: 404 if the collection is empty.
+    """
+    with span("process.fetch_documents", **{"db.system": "mongodb"}) as current:
+        client = get_mongo_client()
+        data = list(client[db_name][collection_name].find())
+        client.close()
+        current.set_attribute("rows", len(data))
 
-        df["predictions"] = predictions
-        df["prediction_timestamp"] = datetime.now()
+    if not data:
+        logger.error("No data found in the collection.")
+        raise HTTPException(status_code=404, detail="No data found in the collection.")
 
-        logger.info("Saving predictions to PostgreSQL...")
-        save_to_postgres(df, Config.POSTGRES_DB, Config.POSTGRES_table)
-        logger.info("Predictions saved to PostgreSQL successfully.")
+    with span("process.score", rows=len(data)) as current:
+        df = score_documents(data, quantiles=quantiles, std=std)
+        current.set_attribute("predictions", len(df))
+    with span("process.store", rows=len(df)):
+        store_predictions(df, table_name=table_name)
 
-        return {"message": "Data processed and stored successfully in PostgreSQL."}
 
-    except FileNotFoundError:
-        logger.error("Model file not found.")
-        raise HTTPException(status_code=500, detail="Model file not found.")
-    except Exception as e:
-        logger.error(f"Error during data processing: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process data.")
+@router.get("/admission")
+async def get_admission_status():
+    """
+    Report each admission-controlled route class: running requests, queue
+    depth, reserved memory and rejection counts.
+    """
+    return {name: controller.metrics for name, controller in admission_controllers.items()}
 
 
 @router.get("/predicted_data/")
@@ -193,25 +600,182 @@ async def get_predicted_data(
     limit: int = 10,
     db_name: str = Config.POSTGRES_DB,
     table_name: str = Config.POSTGRES_table,
+    if_none_match: Optional[str] = Header(None),
 ):
     """
-    Fetch predicted data from PostgreSQL.
+    Fetch predicted data from PostgreSQL. Answers `If-None-Match` with 304
+    while the table is unchanged, and serves unchanged pages from the
+    response cache.
     """
     logger.info(f"Fetching predicted data from PostgreSQL table: {table_name}")
     try:
         with get_postgres_connection(db_name=db_name) as conn:
-            predicted_data = fetch_predictions(conn, table_name, limit, skip)
+            with span("predicted_data.version"):
+                version = fetch_predictions_version(conn, table_name)
 
-        if not predicted_data:
-            logger.warning("No predicted data found in the database.")
-            raise HTTPException(status_code=404, detail="No predicted data found.")
+            def render():
+                with span("predicted_data.fetch", limit=limit, skip=skip):
+                    predicted_data = fetch_predictions(conn, table_name, limit, skip)
 
-        # Encode the data to ensure compatibility
-        encoded_data = jsonable_encoder(predicted_data)
-        logger.info(f"Encoded data: {encoded_data}")
+                if not predicted_data:
+                    logger.warning("No predicted data found in the database.")
+                    raise HTTPException(status_code=404, detail="No predicted data found.")
 
-        return {"predicted_data": encoded_data, "skip": skip, "limit": limit}
+                # Encode the data to ensure compatibility
+                with span("predicted_data.encode", rows=len(predicted_data)):
+                    encoded_data = jsonable_encoder(predicted_data)
+                logger.info(f"Encoded data: {encoded_data}")
+
+                return {"predicted_data": encoded_data, "skip": skip, "limit": limit}
+
+            key = ("predicted_data", db_name, table_name, skip, limit, *version)
+            return conditional_response(key, if_none_match, render, version[2])
 
     except Exception as e:
         logger.error(f"Error fetching predicted data: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch predicted data.")
+
+
+@router.get("/predictions/near")
+async def get_predictions_near(
+    lon: float,
+    lat: float,
+    radius: Optional[float] = None,
+    k: Optional[int] = None,
+    limit: int = 1000,
+):
+    """
+    Find the latest predictions near a point, either within `radius` kilometres
+    or the `k` nearest ones.
+    """
+    if (radius is None) == (k is None):
+        raise HTTPException(status_code=400, detail="Specify exactly one of 'radius' or 'k'.")
+    if (radius is not None and radius <= 0) or (k is not None and k < 1) or limit < 1:
+        raise HTTPException(status_code=400, detail="radius must be > 0, and k and limit >= 1.")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise HTTPException(status_code=400, detail="Invalid coordinates.")
+
+    try:
+        if len(prediction_index) == 0:
+            logger.info("Spatial index is empty, loading the latest predictions...")
+            with get_postgres_connection(db_name=Config.POSTGRES_DB) as conn:
+                prediction_index.replace(
+                    *fetch_latest_prediction_points(conn, Config.POSTGRES_table)
+                )
+
+        if radius is not None:
+            results = prediction_index.query_radius(lon, lat, radius, limit=limit)
+        else:
+            results = prediction_index.query_knn(lon, lat, k)
+        return {"count": len(results), "results": results}
+    except Exception as e:
+        logger.error(f"Error querying predictions near ({lon}, {lat}): {e}")
+        raise HTTPException(status_code=500, detail="Failed to query nearby predictions.")
+
+
+@router.get("/raw_data/near")
+async def get_raw_data_near(
+    lon: float,
+    lat: float,
+    radius: float,
+    limit: int = 100,
+    db_name: str = Config.MONGO_DB_NAME,
+    collection_name: str = Config.MONGO_COLLECTION,
+):
+    """
+    Find uploaded documents within `radius` kilometres of a point using the
+    MongoDB 2dsphere index.
+    """
+    try:
+        data = find_raw_near(db_name, collection_name, lon, lat, radius, limit)
+        return {"count": len(data), "data": data}
+    except Exception as e:
+        logger.error(f"Error in /raw_data/near endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Failed to query nearby documents.")
+
+
+@router.get("/predictions/grid")
+async def get_predictions_grid(zoom: int, bbox: str):
+    """
+    Serve precomputed prediction aggregates (count, mean, min, max) for the grid
+    cells of a zoom level that intersect `bbox` ("min_lon,min_lat,max_lon,max_lat").
+    """
+    if zoom not in GRID_ZOOM_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Zoom must be between {Config.GRID_MIN_ZOOM} and {Config.GRID_MAX_ZOOM}.",
+        )
+    try:
+        cell_range = bbox_cell_range(zoom, parse_bbox(bbox))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cache_key = (zoom, cell_range)
+    cached = grid_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        with get_postgres_connection(db_name=Config.POSTGRES_DB) as conn:
+            cells = fetch_grid_cells(conn, Config.POSTGRES_GRID_TABLE, zoom, *cell_range)
+        for cell in cells:
+            cell["bbox"] = cell_bounds(zoom, cell["cell_x"], cell["cell_y"])
+
+        response = {"zoom": zoom, "cells": cells}
+        grid_cache.put(cache_key, response)
+        return response
+    except Exception as e:
+        logger.error(f"Error fetching prediction grid: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch prediction grid.")
+
+
+@router.get("/drift")
+async def get_drift(uploads: int = 1, runs: int = 1):
+    """
+    Compare the latest `uploads` uploads (feature sketches) and `runs` scoring
+    runs (prediction sketches) with the training baseline; 0 merges all of them.
+    Answered from the stored sketches, without rescanning any data.
+    """
+    if uploads < 0 or runs < 0:
+        raise HTTPException(status_code=400, detail="uploads and runs must be >= 0.")
+
+    try:
+        # Off the event loop: reads MongoDB, and the baseline may need building
+        return await run_in_thread(drift_report, uploads, runs)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing drift report: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute drift report.")
+
+
+def drift_report(uploads: int, runs: int) -> dict:
+    """
+    Merge the latest stored sketches and compare them with the baseline.
+
+    Raises:
+        HTTPException: 404 if no sketches are stored yet.
+    """
+    upload_profiles = fetch_drift_profiles(
+        Config.MONGO_DB_NAME, Config.DRIFT_COLLECTION, "upload", limit=uploads
+    )
+    prediction_profiles = fetch_drift_profiles(
+        Config.MONGO_DB_NAME, Config.DRIFT_COLLECTION, "predictions", limit=runs
+    )
+    if not upload_profiles and not prediction_profiles:
+        raise HTTPException(status_code=404, detail="No drift profiles stored yet.")
+
+    current = DriftProfile()
+    for document in upload_profiles + prediction_profiles:
+        current.merge(DriftProfile.from_dict(document["profile"]))
+
+    report = compare_profiles(current, load_baseline())
+    report["uploads"] = [
+        {"id": d["_id"], "source": d["source"], "created_at": d["created_at"]}
+        for d in upload_profiles
+    ]
+    report["runs"] = [
+        {"id": d["_id"], "source": d["source"], "created_at": d["created_at"]}
+        for d in prediction_profiles
+    ]
+    return jsonable_encoder(report)
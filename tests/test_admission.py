@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+async def hold(controller, seconds, memory_mb=0):
+    async with controller.admit(memory_mb):
+        await asyncio.sleep(seconds)
+
+
+async def run_all(*coroutines):
+    return await asyncio.gather(*coroutines, return_exceptions=True)
+
+
+def test_queue_bounds_concurrency_and_rejects_overflow():
+    controller = AdmissionController("test", max_concurrency=2, max_queue=2, queue_timeout=5)
+
+    results = asyncio.run(run_all(*(hold(controller, 0.05) for _ in range(6))))
+
+    rejected = [result for result in results if isinstance(result, AdmissionRejected)]
+    assert len(rejected) == 2
+    assert all(result.status_code == 429 for result in rejected)
+    assert all(result.headers["Retry-After"] == "1" for result in rejected)
+    metrics = controller.metrics
+    assert metrics["admitted"] == 4
+    assert metrics["rejected_queue_full"] == 2
+    assert metrics["max_queue_depth"] == 2
+    assert metrics["active"] == metrics["queued"] == 0
+
+
+def test_queue_wait_times_out_with_503():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=0.05)
+
+    results = asyncio.run(run_all(hold(controller, 0.3), hold(controller, 0)))
+
+    assert results[0] is None
+    assert isinstance(results[1], AdmissionRejected)
+    assert results[1].status_code == 503
+    assert controller.metrics["rejected_timeout"] == 1
+    assert controller.metrics["queued"] == 0
+
+
+def test_memory_budget_serializes_large_requests():
+    controller = AdmissionController(
+        "test", max_concurrency=4, memory_budget_mb=100, max_queue=4, queue_timeout=5
+    )
+    peak = {"reserved": 0, "active": 0}
+
+    async def tracked(memory_mb):
+        async with controller.admit(memory_mb):
+            peak["reserved"] = max(peak["reserved"], controller.reserved_mb)
+            peak["active"] = max(peak["active"], controller.active)
+            await asyncio.sleep(0.02)
+
+    # Two 60 MB requests cannot share the budget; 500 MB is capped to the budget
+    results = asyncio.run(run_all(tracked(60), tracked(60), tracked(500), tracked(10)))
+
+    assert results == [None] * 4
+    assert peak["reserved"] <= 100
+    assert peak["active"] <= 2
+    assert controller.reserved_mb == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=5)
+
+    async def scenario():
+        running = asyncio.create_task(hold(controller, 0.1))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold(controller, 0))
+        await asyncio.sleep(0.01)
+        assert controller.metrics["queued"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await running
+
+    asyncio.run(scenario())
+    assert controller.metrics["queued"] == 0
+    assert controller.active == 0
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from analytics.preprocessor import preprocess_housing_data
+from benchmarks.suite import compare_to_baseline
+from benchmarks.synthetic import HEADER, generate_housing_csv
+
+
+def test_synthetic_csv_has_upload_format(tmp_path):
+    path = str(tmp_path / "housing.csv")
+    generate_housing_csv(path, 1000, seed=1, null_fraction=0.05, chunk_size=300)
+
+    raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+    assert list(raw.columns) == HEADER
+    assert len(raw) == 1000
+    assert (raw["ROOMS"] == "Null").any()
+
+    # The same seed gives the same file, and the preprocessor accepts it
+    other = str(tmp_path / "again.csv")
+    generate_housing_csv(other, 1000, seed=1, null_fraction=0.05, chunk_size=300)
+    assert open(path).read() == open(other).read()
+    X, y = preprocess_housing_data(path)
+    assert len(X) == len(y) == 1000
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {"sizes": {"10k": {"preprocess": {"seconds": 1.0}, "predict": {"seconds": 1.0}}}}
+    results = {
+        "sizes": {
+            "10k": {
+                "preprocess": {"seconds": 1.1},
+                "predict": {"seconds": 1.5},
+                "mongo_insert": {"skipped": "MongoDB unreachable"},
+            },
+            "1m": {"preprocess": {"seconds": 9.0}},
+        }
+    }
+
+    comparisons = compare_to_baseline(results, baseline, tolerance=0.2)
+
+    assert [(c["stage"], c["ratio"], c["regression"]) for c in comparisons] == [
+        ("preprocess", 1.1, False),
+        ("predict", 1.5, True),
+    ]
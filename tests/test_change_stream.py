@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+
+from bson import Timestamp
+
+from workers.change_stream import ChangeStreamConsumer
+
+
+class FakeStream:
+    """
+    Change stream stand-in that replays `events` (None meaning "no new event")
+    and stops the consumer once they are exhausted.
+    """
+
+    def __init__(self, consumer, events):
+        self.consumer = consumer
+        self.events = list(events)
+        self.resume_token = {"_data": "post-batch"}
+
+    @property
+    def alive(self):
+        return True
+
+    def try_next(self):
+        if not self.events:
+            self.consumer._stop.set()
+            return None
+        return self.events.pop(0)
+
+
+def _insert_event(i):
+    return {
+        "_id": {"_data": f"token-{i}"},
+        "fullDocument": {"_id": i, "longitude": -122.0, "latitude": 37.0},
+        "clusterTime": Timestamp(1_700_000_000, i),
+    }
+
+
+def _consumer(batch_size, max_wait_seconds=60.0):
+    consumer = ChangeStreamConsumer(batch_size=batch_size, max_wait_seconds=max_wait_seconds)
+    consumer.write_batch = MagicMock()
+    consumer.save_resume_token = MagicMock()
+    return consumer
+
+
+def test_consume_flushes_by_size_and_saves_token():
+    consumer = _consumer(batch_size=2)
+    stream = FakeStream(consumer, [_insert_event(i) for i in range(5)])
+
+    consumer.consume(stream, client=MagicMock())
+
+    # Two full batches were written, the fifth event is still pending
+    written = [call.args[0] for call in consumer.write_batch.call_args_list]
+    assert [[doc["_id"] for doc in batch] for batch in written] == [[0, 1], [2, 3]]
+    saved_tokens = [call.args[1] for call in consumer.save_resume_token.call_args_list]
+    assert saved_tokens == [{"_data": "token-1"}, {"_data": "token-3"}]
+    assert consumer.metrics["events_processed"] == 4
+    assert consumer.metrics["pending_events"] == 1
+    assert consumer.metrics["lag_seconds"] > 0
+
+
+def test_consume_flushes_by_time():
+    consumer = _consumer(batch_size=100, max_wait_seconds=0.0)
+    stream = FakeStream(consumer, [_insert_event(0)])
+
+    consumer.consume(stream, client=MagicMock())
+
+    consumer.write_batch.assert_called_once()
+    assert consumer.metrics["batches_written"] == 1
+
+
+def test_consume_does_not_save_token_on_write_failure():
+    consumer = _consumer(batch_size=1)
+    consumer.write_batch.side_effect = RuntimeError("PostgreSQL down")
+    stream = FakeStream(consumer, [_insert_event(0)])
+
+    try:
+        consumer.consume(stream, client=MagicMock())
+    except RuntimeError:
+        pass
+
+    consumer.save_resume_token.assert_not_called()
+    assert consumer.metrics["events_processed"] == 0
@@ -0,0 +1,115 @@
+import json
+from argparse import Namespace
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from models.compaction import CompactForest, compact_forest, greedy_tree_order, holdout_data
+
+
+def _sample(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, 5)).astype(np.float32)
+    return X, 100 * X[:, 0] + 50 * X[:, 1] ** 2 + rng.normal(0, 5, n)
+
+
+def _fit_forest(n_estimators=20, max_depth=8):
+    X, y = _sample(2_000, seed=0)
+    forest = RandomForestRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=0
+    ).fit(X, y)
+    return forest, X, y
+
+
+def test_compact_forest_matches_sklearn():
+    forest, X, _ = _fit_forest()
+
+    compact = CompactForest.from_forest(forest)
+
+    assert compact.n_trees == 20
+    assert compact.threshold.dtype == np.float32
+    assert compact.value.dtype == np.float32
+    np.testing.assert_allclose(compact.predict(X), forest.predict(X), rtol=1e-5)
+    per_tree = compact.predict_all(X[:10])
+    assert per_tree.shape == (20, 10)
+    np.testing.assert_allclose(
+        per_tree[3], forest.estimators_[3].predict(X[:10]), rtol=1e-5
+    )
+
+
+def test_compact_forest_depth_pruning():
+    forest, X, _ = _fit_forest()
+
+    pruned = CompactForest.from_forest(forest, tree_indices=[0, 1], max_depth=3)
+
+    assert pruned.n_trees == 2
+    assert pruned.depth == 3
+    assert pruned.n_nodes <= 2 * (2**4 - 1)
+    assert len(np.unique(pruned.predict_all(X)[0])) <= 2**3
+
+
+def test_greedy_tree_order():
+    y = np.zeros(4)
+    per_tree = np.array([[4.0] * 4, [1.0] * 4, [-1.0] * 4])
+
+    order, maes = greedy_tree_order(per_tree, y)
+
+    assert order == [1, 2, 0]
+    np.testing.assert_allclose(maes, [1.0, 0.0, 4 / 3])
+
+
+def test_compact_forest_within_tolerance():
+    forest, _, _ = _fit_forest(n_estimators=40)
+    # Rows the forest was not trained on
+    X, y = _sample(2_000, seed=1)
+
+    compact, report = compact_forest(
+        forest, X[:1_000], y[:1_000], X[1_000:], y[1_000:], tolerance=0.05, depths=(None, 6)
+    )
+
+    assert compact.n_trees < 40
+    assert report["mae"]["compact"] <= report["mae"]["full"] * 1.05
+    assert report["artifact_bytes"]["compact"] < report["artifact_bytes"]["full"]
+    assert report["speedup"] > 0
+
+
+def test_compact_forest_is_chosen_on_the_selection_split_only():
+    forest, _, _ = _fit_forest(n_estimators=40)
+    X, y = _sample(2_000, seed=1)
+    X_verify, y_verify = _sample(1_000, seed=2)
+
+    first, _ = compact_forest(forest, X[:1_000], y[:1_000], X[1_000:], y[1_000:], tolerance=0.2)
+    second, _ = compact_forest(forest, X[:1_000], y[:1_000], X_verify, y_verify, tolerance=0.2)
+
+    assert first.n_trees == second.n_trees
+    np.testing.assert_array_equal(first.value, second.value)
+
+
+def test_compact_forest_failing_verification_is_rejected():
+    forest, _, _ = _fit_forest(n_estimators=40)
+    X, y = _sample(2_000, seed=1)
+    X_verify = X[1_000:]
+    # The full forest is exact on this split, so any smaller forest is beyond tolerance
+    y_verify = forest.predict(X_verify)
+
+    with pytest.raises(ValueError, match="verification MAE"):
+        compact_forest(forest, X[:1_000], y[:1_000], X_verify, y_verify, tolerance=0.05)
+
+
+def test_holdout_requires_the_model_split(tmp_path):
+    model = tmp_path / "model.joblib"
+    (tmp_path / "model.meta.json").write_text(
+        json.dumps({"source": {"type": "mongodb"}, "n_test_rows": 1})
+    )
+    args = Namespace(
+        model=str(model), data="tests/data/housing.csv", cache_dir=str(tmp_path), holdout=None
+    )
+
+    with pytest.raises(ValueError, match="--holdout"):
+        holdout_data(args)
+
+    args.holdout = "tests/data/housing.csv"
+    X, y, source = holdout_data(args)
+    assert len(X) == len(y) > 0
+    assert source["holdout"] == "tests/data/housing.csv"
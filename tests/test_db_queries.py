@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from database_handler.db_queries import drop_and_recreate_mongo_collection, save_to_postgres
+
+
+def scored_rows():
+    return pd.DataFrame(
+        {
+            "source_id": ["a", "b"],
+            "longitude": [-122.2, -118.2],
+            "predictions": [1.0, 2.0],
+            "model_version": ["v1", "v1"],
+            "shadow": [False, False],
+            "prediction_timestamp": pd.Timestamp("2024-01-01"),
+        }
+    )
+
+
+def executed_sql(cursor):
+    return [call.args[0] for call in cursor.execute.call_args_list]
+
+
+@patch("database_handler.db_queries._is_hypertable", return_value=False)
+@patch("database_handler.db_queries.get_postgres_connection")
+def test_save_to_postgres_upserts_through_staging(mock_connection, mock_hypertable):
+    cursor = mock_connection.return_value.cursor.return_value
+
+    save_to_postgres(scored_rows(), "db", "predictions")
+
+    statements = executed_sql(cursor)
+    assert any("UNIQUE INDEX" in sql and "(source_id, model_version)" in sql for sql in statements)
+    assert any("CREATE TEMP TABLE predictions_staging" in sql for sql in statements)
+
+    copy_sql, buffer = cursor.copy_expert.call_args.args
+    assert copy_sql.startswith("COPY predictions_staging (source_id, longitude")
+    assert buffer.getvalue().splitlines()[0].startswith("a,-122.2,1.0,v1,False")
+
+    # One set-based merge statement for the whole batch
+    merges = [sql for sql in statements if "INSERT INTO predictions" in sql]
+    assert len(merges) == 1
+    assert "ON CONFLICT (source_id, model_version) DO UPDATE" in merges[0]
+    assert "predictions = EXCLUDED.predictions" in merges[0]
+    assert "source_id = EXCLUDED" not in merges[0]
+
+
+@patch("database_handler.db_queries._is_hypertable", return_value=True)
+@patch("database_handler.db_queries.get_postgres_connection")
+def test_save_to_postgres_replaces_rows_of_hypertables(mock_connection, mock_hypertable):
+    cursor = mock_connection.return_value.cursor.return_value
+
+    save_to_postgres(scored_rows(), "db", "predictions")
+
+    statements = executed_sql(cursor)
+    assert not any("UNIQUE INDEX" in sql for sql in statements)
+    merge = next(sql for sql in statements if "INSERT INTO predictions" in sql)
+    assert "DELETE FROM predictions" in merge
+    assert "ON CONFLICT" not in merge
+
+
+@patch("database_handler.db_queries._is_hypertable", return_value=False)
+@patch("database_handler.db_queries.get_postgres_connection")
+def test_save_to_postgres_adds_interval_columns(mock_connection, mock_hypertable):
+    cursor = mock_connection.return_value.cursor.return_value
+
+    save_to_postgres(
+        scored_rows().assign(prediction_q5=0.5, prediction_std=0.1), "db", "predictions"
+    )
+
+    schema = executed_sql(cursor)[0]
+    assert "ADD COLUMN IF NOT EXISTS prediction_q5 REAL" in schema
+    assert "ADD COLUMN IF NOT EXISTS prediction_std REAL" in schema
+    assert "ADD COLUMN IF NOT EXISTS prediction_timestamp" not in schema
+
+
+def mongo_collection(mock_mongo_client):
+    collection = mock_mongo_client.return_value["housing"]["data"]
+    collection.options.return_value = {}
+    collection.index_information.return_value = {
+        "_id_": {"key": [("_id", 1)], "v": 2},
+        "location_2dsphere": {"key": [("location", "2dsphere")], "v": 2},
+    }
+    collection.estimated_document_count.return_value = 3
+    return collection
+
+
+@patch("database_handler.db_queries.get_mongo_client")
+def test_recreate_tolerates_a_concurrent_recreation(mock_mongo_client):
+    collection = mongo_collection(mock_mongo_client)
+    database = mock_mongo_client.return_value["housing"]
+    # A concurrent insert recreated the collection and its geo index in between
+    database.create_collection.side_effect = CollectionInvalid("collection already exists")
+
+    assert drop_and_recreate_mongo_collection("housing", "data") == 3
+
+    collection.drop.assert_called_once()
+    collection.create_index.assert_called_once_with(
+        [("location", "2dsphere")], name="location_2dsphere"
+    )
+
+
+@patch("database_handler.db_queries.get_mongo_client")
+def test_recreate_keeps_conflicting_indexes_but_raises_other_errors(mock_mongo_client):
+    collection = mongo_collection(mock_mongo_client)
+
+    collection.create_index.side_effect = OperationFailure("conflict", code=85)
+    assert drop_and_recreate_mongo_collection("housing", "data") == 3
+
+    collection.create_index.side_effect = OperationFailure("unauthorized", code=13)
+    with pytest.raises(OperationFailure):
+        drop_and_recreate_mongo_collection("housing", "data")
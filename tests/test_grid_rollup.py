@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from analytics.grid_rollup import (
+    bbox_cell_range,
+    cell_bounds,
+    cell_indices,
+    compute_grid_rollup,
+    parse_bbox,
+)
+from utils.cache import LRUCache
+
+
+def test_cell_indices_and_bounds_agree():
+    longitudes, latitudes = np.array([-122.25, -118.24]), np.array([37.85, 34.05])
+
+    cell_x, cell_y = cell_indices(longitudes, latitudes, zoom=10)
+
+    for lon, lat, x, y in zip(longitudes, latitudes, cell_x, cell_y):
+        min_lon, min_lat, max_lon, max_lat = cell_bounds(10, x, y)
+        assert min_lon <= lon < max_lon
+        assert min_lat <= lat < max_lat
+
+
+def test_compute_grid_rollup_aggregates():
+    longitudes = [-122.25, -122.25, -118.24]
+    latitudes = [37.85, 37.85, 34.05]
+    predictions = [100.0, 300.0, 50.0]
+
+    rollup = compute_grid_rollup(longitudes, latitudes, predictions, zooms=[0, 12])
+
+    # At zoom 0 everything lands in one cell
+    world = rollup[rollup["zoom"] == 0].iloc[0]
+    assert (world["count"], world["sum"], world["min"], world["max"]) == (3, 450.0, 50.0, 300.0)
+
+    fine = rollup[rollup["zoom"] == 12].sort_values("count", ascending=False)
+    assert list(fine["count"]) == [2, 1]
+    assert fine.iloc[0]["sum"] / fine.iloc[0]["count"] == 200.0
+
+
+def test_bbox_parsing():
+    assert parse_bbox("-124.5,32.5,-114.1,42.0") == (-124.5, 32.5, -114.1, 42.0)
+    with pytest.raises(ValueError):
+        parse_bbox("1,2,3")
+    with pytest.raises(ValueError):
+        parse_bbox("-114,32,-124,42")
+
+    x_min, x_max, y_min, y_max = bbox_cell_range(4, (-124.5, 32.5, -114.1, 42.0))
+    assert x_min <= x_max and y_min <= y_max
+
+
+def test_lru_cache_bounded():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from monitoring.health import HealthMonitor
+
+
+def make_monitor():
+    monitor = HealthMonitor(interval=1.0, timeout=0.5)
+    monitor.checks = {"mongodb": MagicMock(), "postgres": MagicMock(), "model": MagicMock()}
+    return monitor
+
+
+@patch("monitoring.health.startup_report")
+def test_readiness_from_cached_checks(mock_report):
+    mock_report.warmup_complete = True
+    monitor = make_monitor()
+
+    # Nothing checked yet: not ready
+    ready, report = monitor.readiness()
+    assert not ready
+    assert report["stale"]
+
+    monitor.run_checks()
+    ready, report = monitor.readiness()
+    assert ready
+    assert set(report["dependencies"]) == {"mongodb", "postgres", "model"}
+    assert all(dep["status"] == "up" for dep in report["dependencies"].values())
+    assert all("latency_ms" in dep for dep in report["dependencies"].values())
+
+
+@patch("monitoring.health.startup_report")
+def test_failed_dependency_is_not_ready(mock_report):
+    mock_report.warmup_complete = True
+    monitor = make_monitor()
+    monitor.checks["postgres"].side_effect = RuntimeError("connection refused")
+
+    monitor.run_checks()
+    ready, report = monitor.readiness()
+
+    assert not ready
+    assert report["dependencies"]["postgres"] == {
+        "status": "down",
+        "error": "connection refused",
+        "latency_ms": report["dependencies"]["postgres"]["latency_ms"],
+        "checked_at": report["dependencies"]["postgres"]["checked_at"],
+    }
+    assert report["dependencies"]["mongodb"]["status"] == "up"
+
+
+@patch("monitoring.health.startup_report")
+def test_stale_snapshot_is_not_ready(mock_report):
+    mock_report.warmup_complete = True
+    monitor = make_monitor()
+    monitor.run_checks()
+    monitor.last_run -= monitor.stale_after + 1
+
+    ready, report = monitor.readiness()
+
+    assert not ready
+    assert report["stale"]
+
+
+@patch("monitoring.health.get_postgres_connection")
+def test_postgres_check_reconnects_after_failure(mock_connect):
+    broken, healthy = MagicMock(closed=0), MagicMock(closed=0)
+    broken.cursor.return_value.__enter__.return_value.execute.side_effect = RuntimeError("gone")
+    mock_connect.side_effect = [broken, healthy]
+    monitor = HealthMonitor(interval=1.0, timeout=0.5)
+
+    with pytest.raises(RuntimeError):
+        monitor.check_postgres()
+    broken.close.assert_called_once()
+
+    monitor.check_postgres()
+    assert mock_connect.call_count == 2
+    # The healthy connection is kept for the next checks
+    monitor.check_postgres()
+    assert mock_connect.call_count == 2
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from utils.cache import LRUCache
+from utils.http_cache import conditional_response, etag_matches, http_date, make_etag
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    with patch("utils.http_cache.response_cache", LRUCache(max_size=2)) as cache:
+        yield cache
+
+
+def test_etag_depends_on_the_whole_key():
+    assert make_etag(("raw_data", 0, 10, 3)) == make_etag(("raw_data", 0, 10, 3))
+    assert make_etag(("raw_data", 0, 10, 3)) != make_etag(("raw_data", 0, 10, 4))
+    assert make_etag(("raw_data", 0, 10, 3)).startswith('"')
+
+
+def test_etag_matches():
+    etag = make_etag(("key",))
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_http_date():
+    moment = datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+    assert http_date(moment) == "Fri, 01 Mar 2024 12:30:00 GMT"
+
+
+def test_unchanged_version_is_rendered_once():
+    render = MagicMock(return_value={"rows": [1, 2]})
+
+    first = conditional_response(("rows", 1), None, render)
+    second = conditional_response(("rows", 1), None, render)
+
+    assert first.status_code == second.status_code == 200
+    assert first.body == second.body == b'{"rows":[1,2]}'
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    render.assert_called_once()
+
+
+def test_matching_etag_gets_304_without_rendering():
+    render = MagicMock()
+    etag = make_etag(("rows", 1))
+
+    response = conditional_response(("rows", 1), etag, render, datetime(2024, 3, 1))
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == etag
+    assert "Last-Modified" in response.headers
+    render.assert_not_called()
+
+
+def test_new_version_is_rendered_again(fresh_cache):
+    render = MagicMock(side_effect=[{"version": 1}, {"version": 2}])
+    old = conditional_response(("rows", 1), None, render)
+
+    new = conditional_response(("rows", 2), old.headers["ETag"], render)
+
+    assert new.status_code == 200
+    assert new.body == b'{"version":2}'
+    assert len(fresh_cache) == 2
+
+
+def test_errors_are_not_cached(fresh_cache):
+    render = MagicMock(side_effect=HTTPException(status_code=404))
+    with pytest.raises(HTTPException):
+        conditional_response(("rows", 1), None, render)
+    assert len(fresh_cache) == 0
+
+
+def test_large_bodies_are_not_cached(fresh_cache):
+    render = MagicMock(return_value={"rows": "x" * 2048})
+
+    with patch("utils.http_cache.Config.RESPONSE_CACHE_MAX_BODY_KB", 1):
+        conditional_response(("rows", 1), None, render)
+        response = conditional_response(("rows", 1), None, render)
+
+    assert response.status_code == 200
+    assert render.call_count == 2
+    assert len(fresh_cache) == 0
@@ -0,0 +1,81 @@
+import gzip
+import io
+import tarfile
+import zipfile
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from analytics.ingest import expand_upload, ingest_files, open_source
+
+CSV = b"longitude,lat,median_income,ocean_proximity,median_house_value\n-122.2,37.8,8.3,NEAR BAY,452600\n"
+
+
+def read_sources(sources):
+    frames = {}
+    for source in sources:
+        with open_source(source) as stream:
+            frames[source["name"]] = pd.read_csv(stream)
+    return frames
+
+
+def test_expand_zip_with_compressed_members(tmp_path):
+    path = tmp_path / "upload.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("north/a.csv", CSV)
+        archive.writestr("south/b.csv.gz", gzip.compress(CSV))
+        archive.writestr("README.txt", b"not data")
+
+    sources = expand_upload(str(path), "upload.zip", str(tmp_path))
+
+    frames = read_sources(sources)
+    assert sorted(frames) == ["upload.zip/north/a.csv", "upload.zip/south/b.csv.gz"]
+    assert all(frame["median_income"].tolist() == [8.3] for frame in frames.values())
+
+
+def test_expand_tar_gz(tmp_path):
+    path = tmp_path / "upload.tar.gz"
+    with tarfile.open(path, "w:gz") as archive:
+        for name in ("x/a.csv", "y/a.csv"):
+            info = tarfile.TarInfo(name)
+            info.size = len(CSV)
+            archive.addfile(info, io.BytesIO(CSV))
+
+    sources = expand_upload(str(path), "upload.tar.gz", str(tmp_path))
+
+    # Members with equal base names do not overwrite each other
+    assert len({source["path"] for source in sources}) == 2
+    assert len(read_sources(sources)) == 2
+
+
+def test_zstd_stream(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "a.csv.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(CSV))
+
+    frames = read_sources(expand_upload(str(path), "a.csv.zst", str(tmp_path)))
+
+    assert frames["a.csv.zst"].shape == (1, 5)
+
+
+@patch("analytics.ingest.insert_data_to_mongo")
+def test_ingest_files_reports_per_file_stats(mock_insert, tmp_path):
+    good = tmp_path / "good.csv.gz"
+    good.write_bytes(gzip.compress(CSV))
+    bad = tmp_path / "bad.csv"
+    bad.write_bytes(b"longitude,lat\n1,2\n")
+
+    stats, profile = ingest_files(
+        [(str(good), "good.csv.gz"), (str(bad), "bad.csv")], "db", "coll", str(tmp_path), workers=1
+    )
+
+    assert stats[0]["rows"] == 1 and "error" not in stats[0]
+    assert "median_house_value" in stats[1]["error"]
+    assert profile.count == 1
+    assert profile.categories["NEAR_BAY"] == 1
+    inserted = mock_insert.call_args[0][0]
+    # Features are stored at float32 precision, one-hot columns as integers
+    assert inserted[0]["latitude"] == pytest.approx(37.8)
+    assert inserted[0]["ocean_proximity_NEAR_BAY"] == 1
+    assert inserted[0]["target"] == 452600
@@ -1,3 +1,6 @@
+import os
+
+
 def test_model_predictions():
     from models.model import load_model, predict
     import pandas as pd
@@ -118,3 +121,46 @@ def test_model_invalid_file():
         assert False, "Model loading should fail for invalid file"
     except FileNotFoundError:
         pass
+
+
+def test_prepare_data_cached(tmpdir):
+    from models.model import prepare_data_cached, load_cached_data
+    from config import Config
+
+    cache_file, data_hash = prepare_data_cached("tests/data/housing.csv", str(tmpdir))
+    cached_mtime = os.path.getmtime(cache_file)
+
+    # Second call must hit the cache instead of preprocessing again
+    cache_file_again, data_hash_again = prepare_data_cached(
+        "tests/data/housing.csv", str(tmpdir)
+    )
+    assert cache_file_again == cache_file
+    assert data_hash_again == data_hash
+    assert os.path.getmtime(cache_file) == cached_mtime
+
+    X_train, X_test, y_train, y_test = load_cached_data(cache_file)
+    assert X_train.dtype == "float32"
+    assert X_train.shape[1] == len(Config.EXPECTED_FEATURES)
+    assert X_train.shape[0] == y_train.shape[0]
+    assert X_test.shape[0] == y_test.shape[0]
+
+
+def test_evaluate_candidate_early_stopping(tmpdir):
+    from models.model import prepare_data_cached, evaluate_candidate
+
+    cache_file, _ = prepare_data_cached("tests/data/housing.csv", str(tmpdir))
+
+    # Requiring a 100% improvement per round forces a stop after the second round
+    result = evaluate_candidate(
+        cache_file,
+        {"max_depth": 4},
+        max_estimators=20,
+        step=5,
+        min_improvement=1.0,
+        time_budget=60,
+    )
+
+    assert result["stop_reason"] == "converged"
+    assert result["params"] == {"max_depth": 4, "n_estimators": 5}
+    assert len(result["history"]) == 2
+    assert result["val_mae"] > 0
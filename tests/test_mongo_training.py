@@ -0,0 +1,137 @@
+from argparse import Namespace
+from unittest.mock import patch
+
+import numpy as np
+from bson import encode, ObjectId
+
+from config import Config
+from models.mongo_training import (
+    ReservoirSample,
+    TARGET_FIELD,
+    build_training_matrix,
+    decode_numeric_batch,
+    run_mongo_training,
+)
+
+COLUMNS = Config.EXPECTED_FEATURES + [TARGET_FIELD]
+FIELD_INDEX = {name.encode(): i for i, name in enumerate(COLUMNS)}
+
+
+def test_decode_numeric_batch():
+    documents = [
+        {
+            "_id": ObjectId(),
+            "longitude": -122.23,
+            "latitude": 37.88,
+            "total_rooms": 880,  # int32
+            "population": 2**40,  # int64
+            "ocean_proximity_NEAR_BAY": True,
+            "comment": "skipped",
+            "nested": {"longitude": 1.0},
+            TARGET_FIELD: 452600.0,
+        },
+        {"_id": ObjectId(), "longitude": -121.0, "households": None},
+    ]
+    batch = b"".join(encode(document) for document in documents)
+    out = np.full((4, len(COLUMNS)), -1, dtype=np.float32)
+    ids = []
+
+    decoded = decode_numeric_batch(batch, FIELD_INDEX, out, ids)
+
+    assert decoded == 2
+    assert ids == [document["_id"].binary for document in documents]
+    first = dict(zip(COLUMNS, out[0]))
+    assert np.isclose(first["longitude"], -122.23)
+    assert first["total_rooms"] == 880
+    assert first["population"] == np.float32(2**40)
+    assert first["ocean_proximity_NEAR_BAY"] == 1
+    assert first[TARGET_FIELD] == 452600.0
+    # Missing and null fields default to 0, nested fields are ignored
+    assert first["households"] == 0
+    second = dict(zip(COLUMNS, out[1]))
+    assert second["longitude"] == -121.0
+    assert second["households"] == 0
+    assert second[TARGET_FIELD] == 0
+
+
+def test_reservoir_sample_bounded_and_uniform():
+    sample = ReservoirSample(size=100, n_columns=1, seed=0)
+    stream = np.arange(10_000, dtype=np.float32).reshape(-1, 1)
+
+    for start in range(0, len(stream), 1_000):
+        sample.update(stream[start : start + 1_000])
+
+    assert sample.sample.shape == (100, 1)
+    assert sample.seen == 10_000
+    assert len(np.unique(sample.sample)) == 100
+    # A uniform sample of 0..9999 should have a mean close to 5000
+    assert 3_500 < sample.sample.mean() < 6_500
+
+
+def test_reservoir_sample_smaller_stream():
+    sample = ReservoirSample(size=100, n_columns=2, seed=0)
+    sample.update(np.ones((30, 2), dtype=np.float32))
+
+    assert sample.sample.shape == (30, 2)
+
+
+def _raw_batches(n_documents, batch_size):
+    documents = [
+        {"_id": ObjectId(), "longitude": float(i), "median_income": 1.0, TARGET_FIELD: 2.0 * i}
+        for i in range(n_documents)
+    ]
+    return [
+        b"".join(encode(document) for document in documents[start : start + batch_size])
+        for start in range(0, n_documents, batch_size)
+    ]
+
+
+@patch("models.mongo_training.get_mongo_client")
+def test_build_training_matrix_memory_maps_training_rows(mock_mongo_client, tmp_path):
+    collection = mock_mongo_client.return_value["housing"]["data"]
+    collection.find_raw_batches.return_value = _raw_batches(500, batch_size=70)
+
+    X_train, y_train, X_holdout, y_holdout, lineage = build_training_matrix(
+        "housing", "data", str(tmp_path), chunk_size=100, holdout_size=50
+    )
+
+    assert isinstance(X_train, np.memmap)
+    assert X_train.shape == (lineage["n_train_rows"], len(Config.EXPECTED_FEATURES))
+    assert lineage["n_documents"] == 500
+    assert lineage["n_train_rows"] + lineage["n_holdout_rows"] <= 500
+    assert len(X_holdout) == lineage["n_holdout_rows"] <= 50
+    # Rows keep their target through the split
+    longitude = Config.EXPECTED_FEATURES.index("longitude")
+    np.testing.assert_array_equal(y_train, 2 * X_train[:, longitude])
+    np.testing.assert_array_equal(y_holdout, 2 * X_holdout[:, longitude])
+    assert collection.find_raw_batches.call_args.kwargs["batch_size"] == 100
+
+
+@patch("models.mongo_training.get_mongo_client")
+def test_mongo_training_runs_in_a_directory_of_its_own(mock_mongo_client, tmp_path):
+    mock_mongo_client.return_value["housing"]["data"].find_raw_batches.return_value = (
+        _raw_batches(300, batch_size=100)
+    )
+    workdir = tmp_path / "work"
+    # Left over by another run; must not be read or overwritten
+    workdir.mkdir()
+    (workdir / "X_train.f32").write_bytes(b"other run")
+    args = Namespace(
+        db_name="housing",
+        collection_name="data",
+        workdir=str(workdir),
+        output=str(tmp_path / "model.joblib"),
+        chunk_size=100,
+        sample_size=None,
+        holdout_size=50,
+        n_jobs=1,
+        max_depth=3,
+        n_estimators=2,
+    )
+
+    metadata = run_mongo_training(args)
+
+    assert metadata["source"]["n_documents"] == 300
+    assert (tmp_path / "model.joblib").exists()
+    assert [path.name for path in workdir.iterdir()] == ["X_train.f32"]
+    assert (workdir / "X_train.f32").read_bytes() == b"other run"
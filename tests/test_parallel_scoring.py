@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from analytics.parallel_scoring import (
+    plan_partitions,
+    range_filter,
+    score_collection_parallel,
+    score_partition,
+)
+
+
+def _result(rows):
+    return {
+        "rows": rows,
+        "seconds": 0.1,
+        "longitudes": np.full(rows, -122.0),
+        "latitudes": np.full(rows, 37.0),
+        "predictions": np.arange(rows, dtype=np.float64),
+    }
+
+
+def test_plan_partitions_splits_at_bucket_minima():
+    collection = MagicMock()
+    collection.aggregate.return_value = [
+        {"_id": {"min": 1, "max": 10}, "count": 10},
+        {"_id": {"min": 10, "max": 20}, "count": 10},
+        {"_id": {"min": 20, "max": 25}, "count": 5},
+    ]
+
+    ranges = plan_partitions(collection, 3)
+
+    assert ranges == [(None, 10), (10, 20), (20, None)]
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[-1] == {"$bucketAuto": {"groupBy": "$_id", "buckets": 3}}
+
+
+def test_plan_partitions_of_empty_collection():
+    collection = MagicMock()
+    collection.aggregate.return_value = []
+    assert plan_partitions(collection, 4) == []
+
+
+def test_range_filter():
+    assert range_filter(None, None) == {}
+    assert range_filter(None, 10) == {"_id": {"$lt": 10}}
+    assert range_filter(10, 20) == {"_id": {"$gte": 10, "$lt": 20}}
+    assert range_filter(20, None) == {"_id": {"$gte": 20}}
+
+
+@patch("analytics.parallel_scoring.save_to_postgres")
+@patch("analytics.parallel_scoring.score_documents")
+@patch("analytics.parallel_scoring.get_mongo_client")
+def test_score_partition_streams_batches(mock_mongo_client, mock_score, mock_save):
+    documents = [{"_id": i} for i in range(5)]
+    mock_mongo_client.return_value["housing"]["data"].find.return_value = iter(documents)
+    mock_score.side_effect = lambda batch, **kwargs: pd.DataFrame(
+        {
+            "longitude": [-122.0] * len(batch),
+            "latitude": [37.0] * len(batch),
+            "predictions": [float(document["_id"]) for document in batch],
+            "shadow": [False] * len(batch),
+        }
+    )
+
+    result = score_partition("housing", "data", 0, 5, batch_size=2)
+
+    assert result["rows"] == 5
+    assert [len(call.args[0]) for call in mock_score.call_args_list] == [2, 2, 1]
+    assert mock_save.call_count == 3
+    np.testing.assert_array_equal(result["predictions"], [0, 1, 2, 3, 4])
+    mock_mongo_client.return_value["housing"]["data"].find.assert_called_once_with(
+        {"_id": {"$gte": 0, "$lt": 5}}, batch_size=2
+    )
+    mock_mongo_client.return_value.close.assert_called_once()
+
+
+@patch("analytics.parallel_scoring.refresh_read_models")
+@patch("analytics.parallel_scoring.score_partition")
+@patch("analytics.parallel_scoring.plan_partitions")
+@patch("analytics.parallel_scoring.get_mongo_client")
+def test_failed_range_is_retried_on_its_own(
+    mock_mongo_client, mock_plan, mock_score_partition, mock_refresh
+):
+    mock_plan.return_value = [(None, 10), (10, 20), (20, None)]
+    calls = []
+
+    def score(db_name, collection_name, lower, upper, *args):
+        calls.append(lower)
+        if lower == 10 and calls.count(10) == 1:
+            raise ConnectionError("connection reset")
+        return _result(10)
+
+    mock_score_partition.side_effect = score
+
+    result = score_collection_parallel("housing", "data", workers=1, partitions=3, retries=2)
+
+    assert calls == [None, 10, 20, 10]
+    assert result["rows"] == 30
+    assert result["failed"] == []
+    assert [stat["attempts"] for stat in result["partitions"]] == [1, 2, 1]
+    longitudes, latitudes, predictions = mock_refresh.call_args.args
+    assert len(predictions) == 30
+
+
+@patch("analytics.parallel_scoring.ProcessPoolExecutor")
+@patch("analytics.parallel_scoring.refresh_read_models")
+@patch("analytics.parallel_scoring.score_partition")
+@patch("analytics.parallel_scoring.plan_partitions")
+@patch("analytics.parallel_scoring.get_mongo_client")
+def test_range_failing_beyond_retries_is_reported(
+    mock_mongo_client, mock_plan, mock_score_partition, mock_refresh, mock_pool
+):
+    mock_pool.side_effect = lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)
+    mock_plan.return_value = [(None, 10), (10, None)]
+
+    def score(db_name, collection_name, lower, upper, *args):
+        if lower == 10:
+            raise ConnectionError("connection reset")
+        return _result(10)
+
+    mock_score_partition.side_effect = score
+
+    result = score_collection_parallel("housing", "data", workers=2, partitions=2, retries=1)
+
+    assert result["rows"] == 10
+    assert [stat["partition"] for stat in result["partitions"]] == [0]
+    assert result["failed"] == [{"partition": 1, "attempts": 2, "error": "connection reset"}]
+    assert mock_pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+    # A partial run must not replace the read models
+    mock_refresh.assert_not_called()
+
+
+@patch("analytics.parallel_scoring.refresh_read_models")
+@patch("analytics.parallel_scoring.score_partition", return_value=_result(10))
+@patch("analytics.parallel_scoring.plan_partitions", return_value=[(None, None)])
+@patch("analytics.parallel_scoring.get_mongo_client")
+def test_scratch_table_leaves_read_models_alone(
+    mock_mongo_client, mock_plan, mock_score_partition, mock_refresh
+):
+    result = score_collection_parallel("housing", "data", workers=1, table_name="scratch")
+
+    assert result["rows"] == 10
+    assert mock_score_partition.call_args.args[-1] == "scratch"
+    mock_refresh.assert_not_called()
+
+
+@patch("analytics.parallel_scoring.score_partition")
+@patch("analytics.parallel_scoring.plan_partitions", return_value=[])
+@patch("analytics.parallel_scoring.get_mongo_client")
+def test_empty_collection_scores_nothing(mock_mongo_client, mock_plan, mock_score_partition):
+    result = score_collection_parallel("housing", "data", workers=1)
+    assert result == {"rows": 0, "partitions": [], "failed": []}
+    mock_score_partition.assert_not_called()
@@ -2,7 +2,7 @@ import pytest
 import pandas as pd
 import os
 from unittest.mock import patch
-from analytics.preprocessor import preprocess_housing_data
+from analytics.preprocessor import preprocess_housing_data, transform_housing_data
 from config import Config
 
 
@@ -48,6 +48,22 @@ def test_preprocess_housing_data_valid(mock_logger):
         ), "Expected at least one 'NEAR BAY' entry to be encoded as 1"
 
 
+@patch("analytics.preprocessor.logger")
+def test_ocean_proximity_values_map_to_expected_features(mock_logger):
+    df = pd.DataFrame(
+        {
+            "longitude": [-122.2, -122.3, -121.0],
+            "ocean_proximity": ["<1H OCEAN", "NEAR BAY", "INLAND"],
+            "median_house_value": [1.0, 2.0, 3.0],
+        }
+    )
+
+    X, _ = transform_housing_data(df)
+
+    assert X["ocean_proximity__LT_1H_OCEAN"].tolist() == [1, 0, 0]
+    assert X["ocean_proximity_NEAR_BAY"].tolist() == [0, 1, 0]
+    assert X["ocean_proximity_INLAND"].tolist() == [0, 0, 1]
+
 @patch("analytics.preprocessor.logger")
 def test_preprocess_housing_data_missing_file(mock_logger):
     # Test for missing file
@@ -104,3 +120,51 @@ def test_preprocess_housing_data_missing_features(mock_logger, tmpdir):
         assert col in X.columns
         if col not in data:
             assert (X[col] == 0).all()
+
+
+def test_transform_housing_data_compact_dtypes():
+    from analytics.preprocessor import transform_housing_data
+
+    X, y = transform_housing_data(pd.read_csv("tests/data/housing.csv"), compact=True)
+
+    numeric = [col for col in Config.EXPECTED_FEATURES if not col.startswith("ocean_proximity_")]
+    assert (X[numeric].dtypes == "float32").all()
+    assert (X.drop(columns=numeric).dtypes == "uint8").all()
+    assert y.dtype == "float64"
+    # "Null" markers in the sample file become 0
+    assert not X.isna().any().any()
+
+
+def test_pyarrow_engine_streams_the_same_chunks():
+    pytest.importorskip("pyarrow")
+    from analytics.preprocessor import iter_preprocess_housing_data
+
+    arrow = list(iter_preprocess_housing_data("tests/data/housing.csv", chunksize=5000, engine="pyarrow"))
+    c = list(iter_preprocess_housing_data("tests/data/housing.csv", chunksize=5000, engine="c"))
+
+    assert [len(X) for X, _ in arrow] == [len(X) for X, _ in c]
+    pd.testing.assert_frame_equal(
+        pd.concat(X for X, _ in arrow).reset_index(drop=True),
+        pd.concat(X for X, _ in c).reset_index(drop=True),
+    )
+
+
+def test_pyarrow_engine_reads_decimals_after_integer_blocks(tmp_path):
+    pytest.importorskip("pyarrow")
+    from analytics.preprocessor import iter_preprocess_housing_data
+
+    # Well past pyarrow's 1 MB first block, which would infer int64 / null
+    rows = ["1,Null,3,4,5,6,7,8,9,INLAND"] * 60000 + ["1.5,2.5,3,4,5,6,7,8,9.5,NEAR BAY"]
+    path = tmp_path / "int_then_float.csv"
+    path.write_text("LONGITUDE,LAT,MEDIAN_AGE,ROOMS,BEDROOMS,POP,HOUSEHOLDS,MEDIAN_INCOME,"
+                    "MEDIAN_HOUSE_VALUE,OCEAN_PROXIMITY\n" + "\n".join(rows) + "\n")
+
+    with open(path, "rb") as stream:
+        chunks = list(iter_preprocess_housing_data(stream, chunksize=50000, engine="pyarrow"))
+    c = list(iter_preprocess_housing_data(str(path), chunksize=50000, engine="c"))
+
+    X = pd.concat(X for X, _ in chunks).reset_index(drop=True)
+    assert len(X) == 60001
+    assert X["latitude"].iloc[-1] == pytest.approx(2.5)
+    pd.testing.assert_frame_equal(X, pd.concat(X for X, _ in c).reset_index(drop=True))
+    assert pd.concat(y for _, y in chunks).iloc[-1] == 9.5
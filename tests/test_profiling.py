@@ -0,0 +1,92 @@
+import pstats
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import Config
+from monitoring.profiling import profiling_middleware, run_in_thread
+
+TOKEN = "secret"
+
+
+def busy_work():
+    # Enough pure-Python work for the sampler to catch
+    end = time.perf_counter() + 0.1
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(1000))
+    return total
+
+
+def make_app():
+    app = FastAPI()
+    app.middleware("http")(profiling_middleware)
+
+    @app.get("/work")
+    async def work():
+        await run_in_thread(busy_work)
+        return {"ok": True}
+
+    return app
+
+
+def test_cprofile_covers_worker_threads(tmp_path):
+    client = TestClient(make_app())
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)), patch.object(
+        Config, "PROFILE_TOKEN", TOKEN
+    ):
+        response = client.get(
+            "/work", headers={"X-Profile": "cprofile", "X-Profile-Token": TOKEN}
+        )
+
+    assert response.status_code == 200
+    name = response.headers["X-Profile-File"]
+    assert name.endswith("_GET_work.pstats")
+    stats = pstats.Stats(str(tmp_path / name))
+    assert any(function == "busy_work" for _, _, function in stats.stats)
+
+
+def test_sampling_writes_collapsed_stacks(tmp_path):
+    client = TestClient(make_app())
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)), patch.object(
+        Config, "PROFILE_SAMPLE_INTERVAL", 0.001
+    ), patch.object(Config, "PROFILE_TOKEN", TOKEN):
+        response = client.get("/work", headers={"X-Profile": "sample", "X-Profile-Token": TOKEN})
+
+    lines = (tmp_path / response.headers["X-Profile-File"]).read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("busy_work" in line for line in lines)
+
+
+def test_profiling_requires_token_and_known_mode(tmp_path):
+    client = TestClient(make_app())
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)), patch.object(
+        Config, "PROFILE_TOKEN", TOKEN
+    ):
+        assert client.get("/work", headers={"X-Profile": "cprofile"}).status_code == 403
+        assert (
+            client.get(
+                "/work", headers={"X-Profile": "cprofile", "X-Profile-Token": "wrong"}
+            ).status_code
+            == 403
+        )
+        assert client.get("/work", headers={"X-Profile": "perf"}).status_code == 400
+        # Requests without the header are passed through untouched
+        response = client.get("/work")
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_profiling_without_configured_token_is_refused(tmp_path):
+    client = TestClient(make_app())
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)), patch.object(
+        Config, "PROFILE_TOKEN", ""
+    ):
+        response = client.get("/work", headers={"X-Profile": "cprofile", "X-Profile-Token": ""})
+    assert response.status_code == 403
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,142 @@
+import json
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+from models.registry import assign_versions, load_registry, score_with_registry
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return np.full(len(X), self.value)
+
+
+def _write_registry(tmpdir, models):
+    registry_file = os.path.join(tmpdir, "registry.json")
+    with open(registry_file, "w") as f:
+        json.dump({"models": models}, f)
+    return registry_file
+
+
+def test_load_registry_default(tmpdir):
+    registry = load_registry(os.path.join(tmpdir, "missing.json"))
+
+    assert registry == [
+        {
+            "version": Config.DEFAULT_MODEL_VERSION,
+            "path": Config.MODEL_FILE,
+            "weight": 1.0,
+            "shadow": False,
+        }
+    ]
+
+
+def test_load_registry_normalizes_weights(tmpdir):
+    registry_file = _write_registry(
+        tmpdir,
+        [
+            {"version": "v1", "path": "a.joblib", "weight": 3},
+            {"version": "v2", "path": "b.joblib", "weight": 1},
+            {"version": "v3", "path": "c.joblib", "shadow": True},
+        ],
+    )
+
+    registry = load_registry(registry_file)
+
+    assert [model["weight"] for model in registry] == [0.75, 0.25, 0.0]
+    assert [model["shadow"] for model in registry] == [False, False, True]
+
+
+def test_load_registry_requires_live_model(tmpdir):
+    registry_file = _write_registry(
+        tmpdir, [{"version": "v1", "path": "a.joblib", "shadow": True}]
+    )
+
+    with pytest.raises(ValueError):
+        load_registry(registry_file)
+
+
+def test_assign_versions_is_sticky_and_weighted():
+    live_models = [{"weight": 0.9}, {"weight": 0.1}]
+    keys = [f"doc-{i}" for i in range(10_000)]
+
+    assignment = assign_versions(keys, live_models)
+
+    assert np.array_equal(assignment, assign_versions(keys, live_models))
+    assert set(assignment) == {0, 1}
+    assert 0.05 < assignment.mean() < 0.15
+
+
+def test_score_with_registry_shadow_costs_one_predict():
+    registry = [
+        {"version": "v1", "path": "v1", "weight": 0.5, "shadow": False},
+        {"version": "v2", "path": "v2", "weight": 0.5, "shadow": False},
+        {"version": "v3", "path": "v3", "weight": 0.0, "shadow": True},
+    ]
+    models = {"v1": ConstantModel(1.0), "v2": ConstantModel(2.0), "v3": ConstantModel(3.0)}
+    features = pd.DataFrame(
+        np.zeros((100, len(Config.EXPECTED_FEATURES))), columns=Config.EXPECTED_FEATURES
+    )
+
+    with patch("models.registry.get_model", side_effect=models.get):
+        result = score_with_registry(features, list(range(100)), registry)
+
+    served = result[~result["shadow"]]
+    shadow = result[result["shadow"]]
+    assert len(served) == 100
+    assert len(shadow) == 100
+    assert set(served["model_version"]) == {"v1", "v2"}
+    assert (shadow["predictions"] == 3.0).all()
+    assert all(model.calls == 1 for model in models.values())
+
+
+def test_score_documents_keys_rows_by_source():
+    from analytics.scoring import score_documents
+
+    registry = [
+        {"version": "v1", "path": "v1", "weight": 1.0, "shadow": False},
+        {"version": "v2", "path": "v2", "weight": 0.0, "shadow": True},
+    ]
+    models = {"v1": ConstantModel(1.0), "v2": ConstantModel(2.0)}
+    documents = [{"_id": i, "longitude": -122.0 + i} for i in range(3)]
+
+    with patch("models.registry.load_registry", return_value=registry), patch(
+        "models.registry.get_model", side_effect=models.get
+    ):
+        with_ids = score_documents(documents)
+        without_ids = [
+            score_documents([{"longitude": -122.0}, {"longitude": -121.0}]) for _ in range(2)
+        ]
+
+    # Served and shadow predictions of a document share its source id
+    assert sorted(with_ids["source_id"]) == ["0", "0", "1", "1", "2", "2"]
+    assert with_ids.groupby("source_id")["model_version"].nunique().eq(2).all()
+    # Without ids, rows are keyed by a stable hash of their features
+    assert without_ids[0]["source_id"].nunique() == 2
+    assert without_ids[0]["source_id"].tolist() == without_ids[1]["source_id"].tolist()
+
+
+def test_documents_to_features_handles_legacy_values():
+    from analytics.scoring import documents_to_features
+
+    features = documents_to_features(
+        [
+            {"longitude": -122.25, "ocean_proximity_INLAND": True},
+            {"longitude": "-121.5", "median_income": None, "ocean_proximity_INLAND": False},
+        ]
+    )
+
+    assert list(features.columns) == Config.EXPECTED_FEATURES
+    assert features["longitude"].tolist() == [-122.25, -121.5]
+    assert features["median_income"].tolist() == [0.0, 0.0]
+    assert features["ocean_proximity_INLAND"].tolist() == [1, 0]
+    assert features["longitude"].dtype == "float32"
@@ -1,11 +1,14 @@
+from datetime import datetime
+import pytest
 from fastapi.testclient import TestClient
 from main import app
+from monitoring.startup import startup_report
 from unittest.mock import patch
 
 client = TestClient(app)
 
 
-@patch("routes.routes.MongoClient")
+@patch("routes.routes.get_mongo_client")
 def test_health_endpoint(mock_mongo_client):
     print(f"Mock is active: {mock_mongo_client}")
     mock_client_instance = mock_mongo_client.return_value
@@ -17,7 +20,39 @@ def test_health_endpoint(mock_mongo_client):
     assert response.json() == {"status": "healthy"}
 
 
-@patch("routes.routes.MongoClient")
+@patch("routes.routes.get_mongo_client")
+def test_ready_endpoint(mock_mongo_client):
+    mock_mongo_client.return_value.admin.command.return_value = {"ok": 1}
+
+    with patch.object(startup_report, "warmup_complete", False):
+        assert client.get("/api/ready").status_code == 503
+
+    with patch.object(startup_report, "warmup_complete", True):
+        response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+@patch("routes.routes.health_monitor")
+def test_health_probes_answer_from_cache(mock_monitor):
+    mock_monitor.running = True
+    report = {
+        "status": "not ready",
+        "checked_seconds_ago": 0.5,
+        "dependencies": {"postgres": {"status": "down"}},
+    }
+    mock_monitor.readiness.return_value = (False, report)
+
+    assert client.get("/api/health/live").status_code == 200
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["dependencies"]["postgres"]["status"] == "down"
+
+    mock_monitor.readiness.return_value = (True, dict(report, status="ready"))
+    assert client.get("/api/health/ready").status_code == 200
+
+
+@patch("routes.routes.get_mongo_client")
 def test_process_endpoint(mock_mongo_client):
     mock_mongo_client.return_value["test_db"]["test_collection"].find.return_value = [
         {"feature1": 1, "feature2": 2, "feature3": 3}
@@ -32,8 +67,9 @@ def test_process_endpoint(mock_mongo_client):
     }
 
 
-@patch("routes.routes.MongoClient")
-def test_upload_endpoint(mock_mongo_client):
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.get_mongo_client")
+def test_upload_endpoint(mock_mongo_client, mock_bump):
     mock_mongo_client.return_value["test_db"][
         "test_collection"
     ].insert_many.return_value = None
@@ -43,11 +79,79 @@ def test_upload_endpoint(mock_mongo_client):
         data={"db_name": "test_db", "collection_name": "test_collection"},
     )
     assert response.status_code == 200
-    assert response.json() == {"message": "Data uploaded and stored successfully."}
+    assert response.json()["message"] == "Data uploaded and stored successfully."
+    assert response.json()["rows"] == 1
+
+
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.save_drift_profile")
+@patch("analytics.ingest.insert_data_to_mongo")
+def test_upload_multiple_files(mock_insert, mock_save_profile, mock_bump):
+    import gzip
+    from concurrent.futures import ThreadPoolExecutor
 
+    csv = b"longitude,lat,median_income,median_house_value\n-122.2,37.8,8.3,452600\n"
+    # Threads instead of processes so that the mocked insert is shared
+    with patch("analytics.ingest.ProcessPoolExecutor", ThreadPoolExecutor):
+        response = client.post(
+            "/api/upload",
+            files=[
+                ("file", ("a.csv", csv)),
+                ("file", ("b.csv.gz", gzip.compress(csv + b"-118.2,34.0,3.1,250000\n"))),
+            ],
+        )
 
-@patch("routes.routes.MongoClient")
-def test_delete_endpoint(mock_mongo_client):
+    assert response.status_code == 200
+    assert response.json()["rows"] == 3
+    assert [(f["file"], f["rows"]) for f in response.json()["files"]] == [
+        ("a.csv", 1),
+        ("b.csv.gz", 2),
+    ]
+    assert mock_insert.call_count == 2
+    mock_save_profile.assert_called_once()
+    mock_bump.assert_called_once_with(
+        "housing", "data", "collection_versions", serverSelectionTimeoutMS=2000
+    )
+
+
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.ingest_files")
+def test_upload_version_bump_does_not_block_liveness(mock_ingest, mock_bump):
+    import asyncio
+    import time
+
+    import httpx
+
+    def unreachable(*args, **kwargs):
+        time.sleep(0.5)
+        raise TimeoutError("No servers found yet")
+
+    mock_ingest.side_effect = ConnectionError("MongoDB is down")
+    mock_bump.side_effect = unreachable
+
+    async def stuck_upload():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            upload = asyncio.create_task(
+                http.post("/api/upload", files={"file": ("a.csv", b"a,b\n1,2\n")})
+            )
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            live = await http.get("/api/health/live")
+            live_seconds = time.perf_counter() - start
+            return await upload, live, live_seconds
+
+    upload, live, live_seconds = asyncio.run(stuck_upload())
+
+    assert live.status_code == 200
+    assert live_seconds < 0.3
+    assert upload.status_code == 500
+    assert mock_bump.call_args.kwargs == {"serverSelectionTimeoutMS": 2000}
+
+
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.get_mongo_client")
+def test_delete_endpoint(mock_mongo_client, mock_bump):
     mock_mongo_client.return_value["test_db"][
         "test_collection"
     ].delete_many.return_value.deleted_count = 1
@@ -61,6 +165,46 @@ def test_delete_endpoint(mock_mongo_client):
     }
 
 
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.drop_and_recreate_mongo_collection")
+def test_delete_endpoint_fast(mock_recreate, mock_bump):
+    response = client.delete(
+        "/api/delete_mongodb/",
+        params={"db_name": "test_db", "collection_name": "test_collection", "fast": True},
+    )
+    assert response.status_code == 200
+    mock_recreate.assert_called_once_with("test_db", "test_collection")
+    mock_bump.assert_called_once_with(
+        "test_db", "test_collection", "collection_versions", serverSelectionTimeoutMS=2000
+    )
+
+
+@patch("routes.routes.bump_collection_version")
+@patch("routes.routes.delete_all_from_mongo")
+def test_delete_endpoint_background(mock_delete, mock_bump):
+    response = client.delete(
+        "/api/delete_mongodb/",
+        params={
+            "db_name": "test_db",
+            "collection_name": "test_collection",
+            "background": True,
+        },
+    )
+    assert response.status_code == 200
+    assert "scheduled" in response.json()["message"]
+    # TestClient runs background tasks before returning the response
+    mock_delete.assert_called_once_with("test_db", "test_collection")
+
+
+@patch("routes.routes.purge_predictions")
+def test_delete_predictions_endpoint(mock_purge):
+    mock_purge.return_value = {"method": "truncate"}
+    response = client.delete("/api/delete_predictions/")
+    assert response.status_code == 200
+    assert response.json()["method"] == "truncate"
+    mock_purge.assert_called_once()
+
+
 def test_get_predicted_data():
     response = client.get("/api/predicted_data")
     assert (
@@ -69,3 +213,268 @@ def test_get_predicted_data():
     data = response.json()
     assert "predicted_data" in data, "Response missing 'predicted_data' field"
     assert isinstance(data["predicted_data"], list), "Predicted data is not a list"
+
+
+def test_predictions_near_requires_radius_or_k():
+    response = client.get("/api/predictions/near", params={"lon": -122.2, "lat": 37.8})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params", [{"radius": 0}, {"radius": -5}, {"k": 0}, {"k": 1, "limit": 0}])
+def test_predictions_near_rejects_invalid_ranges(params):
+    response = client.get(
+        "/api/predictions/near", params={"lon": -122.2, "lat": 37.8, **params}
+    )
+    assert response.status_code == 400
+
+
+@patch("routes.routes.prediction_index")
+def test_predictions_near_knn(mock_index):
+    mock_index.__len__.return_value = 1
+    mock_index.query_knn.return_value = [
+        {"longitude": -122.2, "latitude": 37.8, "prediction": 1.0, "distance_km": 0.0}
+    ]
+    response = client.get(
+        "/api/predictions/near", params={"lon": -122.2, "lat": 37.8, "k": 1}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+    mock_index.query_knn.assert_called_once_with(-122.2, 37.8, 1)
+
+
+@patch("routes.routes.fetch_grid_cells")
+@patch("routes.routes.get_postgres_connection")
+def test_predictions_grid_is_cached(mock_connection, mock_fetch):
+    mock_fetch.return_value = [
+        {"cell_x": 2, "cell_y": 10, "count": 3, "mean": 1.0, "min": 0.5, "max": 2.0}
+    ]
+    params = {"zoom": 5, "bbox": "-124.5,32.5,-114.1,42.0"}
+
+    first = client.get("/api/predictions/grid", params=params)
+    second = client.get("/api/predictions/grid", params=params)
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert first.json()["cells"][0]["bbox"]
+    mock_fetch.assert_called_once()
+
+
+def test_predictions_grid_rejects_invalid_zoom():
+    response = client.get(
+        "/api/predictions/grid", params={"zoom": 99, "bbox": "-124.5,32.5,-114.1,42.0"}
+    )
+    assert response.status_code == 400
+
+
+@patch("routes.routes.load_baseline")
+@patch("routes.routes.fetch_drift_profiles")
+def test_drift_endpoint(mock_fetch, mock_baseline):
+    from analytics.drift import DriftProfile
+
+    import asyncio
+
+    profile = DriftProfile()
+    profile.update_predictions([1.0, 2.0, 3.0])
+
+    def load_baseline():
+        # Loaded in a worker thread, not on the event loop
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return profile
+
+    mock_baseline.side_effect = load_baseline
+    mock_fetch.side_effect = lambda db, coll, kind, limit: (
+        [{"_id": "1", "source": "process", "created_at": "now", "profile": profile.to_dict()}]
+        if kind == "predictions"
+        else []
+    )
+
+    response = client.get("/api/drift")
+
+    assert response.status_code == 200
+    assert response.json()["predictions"]["drift"] is False
+    assert [run["id"] for run in response.json()["runs"]] == ["1"]
+
+
+@patch("routes.routes.fetch_drift_profiles", return_value=[])
+def test_drift_endpoint_without_profiles(mock_fetch):
+    assert client.get("/api/drift").status_code == 404
+
+
+def test_process_rejects_invalid_quantiles():
+    response = client.get("/api/process", params={"quantiles": "5,95"})
+    assert response.status_code == 400
+
+
+@patch("routes.routes.score_collection")
+@patch("routes.routes.get_mongo_client")
+def test_process_overload_is_shed_while_service_stays_up(mock_mongo_client, mock_score):
+    import asyncio
+    import time
+
+    import httpx
+
+    from utils.admission import AdmissionController
+
+    mock_mongo_client.return_value["housing"]["data"].estimated_document_count.return_value = 1000
+    mock_score.side_effect = lambda *args: time.sleep(0.2)
+    controller = AdmissionController("process", max_concurrency=1, max_queue=2, queue_timeout=5)
+
+    async def overload():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            burst = [asyncio.create_task(http.get("/api/process")) for _ in range(10)]
+            await asyncio.sleep(0.05)
+            # Other routes keep answering while the heavy ones run or queue
+            start = time.perf_counter()
+            live = await http.get("/api/health/live")
+            live_seconds = time.perf_counter() - start
+            admission = (await http.get("/api/admission")).json()
+            return await asyncio.gather(*burst), live, live_seconds, admission
+
+    with patch.dict("routes.routes.admission_controllers", {"process": controller}):
+        responses, live, live_seconds, admission = asyncio.run(overload())
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] * 3 + [429] * 7
+    assert all(
+        "Retry-After" in response.headers for response in responses if response.status_code == 429
+    )
+    assert live.status_code == 200
+    assert live_seconds < 0.2
+    assert admission["process"]["queued"] == 2
+    assert controller.metrics["rejected_queue_full"] == 7
+
+
+@patch("routes.routes.get_mongo_client")
+def test_process_count_does_not_block_liveness(mock_mongo_client):
+    import asyncio
+    import time
+
+    import httpx
+
+    def unreachable():
+        time.sleep(0.5)
+        raise TimeoutError("No servers found yet")
+
+    mock_mongo_client.return_value["housing"]["data"].estimated_document_count.side_effect = (
+        unreachable
+    )
+
+    async def stuck_process():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            process = asyncio.create_task(http.get("/api/process"))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            live = await http.get("/api/health/live")
+            live_seconds = time.perf_counter() - start
+            return await process, live, live_seconds
+
+    process, live, live_seconds = asyncio.run(stuck_process())
+
+    assert live.status_code == 200
+    assert live_seconds < 0.3
+    assert process.status_code == 500
+    assert "serverSelectionTimeoutMS" in mock_mongo_client.call_args.kwargs
+
+
+def test_profile_window_endpoint(tmp_path):
+    from config import Config
+
+    assert client.post("/api/admin/profile", params={"seconds": 0.05}).status_code == 404
+
+    with patch.object(Config, "PROFILING_ENABLED", True), patch.object(
+        Config, "PROFILE_DIR", str(tmp_path)
+    ):
+        # Enabled without a token, the endpoints stay closed
+        assert client.get("/api/admin/profiles").status_code == 403
+
+        token = {"X-Profile-Token": "secret"}
+        with patch.object(Config, "PROFILE_TOKEN", "secret"):
+            assert client.get("/api/admin/profiles").status_code == 403
+            assert (
+                client.post("/api/admin/profile", params={"seconds": 0}, headers=token).status_code
+                == 400
+            )
+            response = client.post("/api/admin/profile", params={"seconds": 0.05}, headers=token)
+            assert response.status_code == 200
+            name = response.json()["file"]
+            assert name.endswith(".folded")
+            assert client.get("/api/admin/profiles", headers=token).json() == {"profiles": [name]}
+            assert client.get(f"/api/admin/profiles/{name}", headers=token).status_code == 200
+            assert (
+                client.get("/api/admin/profiles/..%2Fconfig.py", headers=token).status_code == 404
+            )
+
+
+@patch("routes.routes.score_collection_parallel")
+@patch("routes.routes.get_mongo_client")
+def test_process_parallel_reports_failed_partitions(mock_mongo_client, mock_parallel):
+    mock_mongo_client.return_value["housing"]["data"].estimated_document_count.return_value = 20
+    mock_parallel.return_value = {
+        "rows": 10,
+        "partitions": [{"partition": 0, "rows": 10, "seconds": 0.1, "attempts": 1}],
+        "failed": [{"partition": 1, "attempts": 3, "error": "connection reset"}],
+    }
+
+    response = client.get("/api/process", params={"parallel": True, "partitions": 2})
+
+    assert response.status_code == 500
+    assert response.json()["failed"][0]["partition"] == 1
+    assert mock_parallel.call_args.args[-2:] == (2, "predictions")
+
+
+@patch("routes.routes.fetch_predictions")
+@patch("routes.routes.fetch_predictions_version")
+@patch("routes.routes.get_postgres_connection")
+def test_predicted_data_polls_are_revalidated(mock_connection, mock_version, mock_fetch):
+    from utils.cache import LRUCache
+
+    mock_version.return_value = (2, datetime(2024, 3, 1), datetime(2024, 3, 2))
+    mock_fetch.return_value = [{"id": 2, "predictions": 1.5}, {"id": 1, "predictions": 2.5}]
+
+    with patch("utils.http_cache.response_cache", LRUCache()):
+        first = client.get("/api/predicted_data/", params={"limit": 2})
+        etag = first.headers["ETag"]
+        unchanged = client.get(
+            "/api/predicted_data/", params={"limit": 2}, headers={"If-None-Match": etag}
+        )
+        other_client = client.get("/api/predicted_data/", params={"limit": 2})
+
+        mock_version.return_value = (3, datetime(2024, 3, 1), datetime(2024, 3, 3))
+        changed = client.get(
+            "/api/predicted_data/", params={"limit": 2}, headers={"If-None-Match": etag}
+        )
+
+    assert first.status_code == 200
+    assert first.json()["predicted_data"][0]["id"] == 2
+    assert "Last-Modified" in first.headers
+    assert unchanged.status_code == 304
+    assert other_client.status_code == 200
+    assert other_client.content == first.content
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    # Only the first poll and the one after the change read rows
+    assert mock_fetch.call_count == 2
+
+
+@patch("routes.routes.get_mongo_client")
+@patch("routes.routes.fetch_collection_version")
+def test_raw_data_version_includes_document_count(mock_version, mock_mongo_client):
+    from utils.cache import LRUCache
+
+    collection = mock_mongo_client.return_value["housing"]["data"]
+    collection.find.return_value.skip.return_value.limit.return_value = [{"_id": 1}]
+    collection.count_documents.return_value = 1
+    mock_version.return_value = {"version": 4, "updated_at": None, "documents": 1}
+
+    with patch("utils.http_cache.response_cache", LRUCache()):
+        first = client.get("/api/raw_data")
+        mock_version.return_value = {"version": 4, "updated_at": None, "documents": 2}
+        after_insert = client.get("/api/raw_data", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200
+    assert first.json()["data"] == [{"_id": "1"}]
+    assert after_insert.status_code == 200
+    assert collection.find.call_count == 2
@@ -0,0 +1,74 @@
+import numpy as np
+
+from analytics.spatial_index import EARTH_RADIUS_KM, PredictionSpatialIndex
+
+
+def _haversine_km(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    longitudes = rng.uniform(-124.3, -114.3, n)
+    latitudes = rng.uniform(32.5, 42.0, n)
+    return longitudes, latitudes, rng.uniform(50_000, 500_000, n)
+
+
+def test_query_radius_matches_brute_force():
+    longitudes, latitudes, predictions = _random_points(5_000)
+    index = PredictionSpatialIndex()
+    index.replace(longitudes, latitudes, predictions)
+
+    results = index.query_radius(-122.25, 37.85, 25)
+
+    distances = _haversine_km(-122.25, 37.85, longitudes, latitudes)
+    assert len(results) == (distances <= 25).sum()
+    assert [r["distance_km"] for r in results] == sorted(r["distance_km"] for r in results)
+    assert all(r["distance_km"] <= 25 for r in results)
+
+
+def test_query_knn_across_segments():
+    longitudes, latitudes, predictions = _random_points(3_000)
+    index = PredictionSpatialIndex(max_segments=8)
+    for start in range(0, 3_000, 1_000):
+        end = start + 1_000
+        index.add(longitudes[start:end], latitudes[start:end], predictions[start:end])
+
+    results = index.query_knn(-118.24, 34.05, 5)
+
+    distances = _haversine_km(-118.24, 34.05, longitudes, latitudes)
+    nearest = np.sort(distances)[:5]
+    np.testing.assert_allclose([r["distance_km"] for r in results], nearest, rtol=1e-6)
+    assert len(index) == 3_000
+
+
+def test_limited_radius_query_across_segments():
+    longitudes, latitudes, predictions = _random_points(3_000)
+    index = PredictionSpatialIndex(max_segments=8)
+    for start in range(0, 3_000, 1_000):
+        end = start + 1_000
+        index.add(longitudes[start:end], latitudes[start:end], predictions[start:end])
+
+    limited = index.query_radius(-118.24, 34.05, 100, limit=10)
+
+    assert limited == index.query_radius(-118.24, 34.05, 100)[:10]
+
+
+def test_segments_are_merged():
+    longitudes, latitudes, predictions = _random_points(300)
+    index = PredictionSpatialIndex(max_segments=2)
+
+    for start in range(0, 300, 100):
+        index.add(
+            longitudes[start : start + 100],
+            latitudes[start : start + 100],
+            predictions[start : start + 100],
+        )
+
+    assert len(index._segments) == 1
+    assert len(index) == 300
@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+import pytest
+
+from config import Config
+from monitoring.startup import StartupReport, parse_importtime, warmup
+
+HEAVY_MODULES = ["joblib", "pandas", "psycopg2", "pymongo", "sklearn"]
+
+
+def test_import_main_does_not_import_heavy_modules():
+    # Importing the app must stay cheap; heavy modules are loaded during warmup
+    code = (
+        "import sys, main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "", f"Eagerly imported: {result.stdout.strip()}"
+
+
+def test_parse_importtime():
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   _io",
+            "import time:      3000 |      45000 | pandas",
+            "import time:       900 |       1500 |   config",
+        ]
+    )
+
+    entries = parse_importtime(output)
+
+    assert [entry["module"] for entry in entries] == ["pandas", "config", "_io"]
+    assert entries[0] == {"module": "pandas", "self_us": 3000, "cumulative_us": 45000}
+    assert len(parse_importtime(output, top=1)) == 1
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    # A small forest instead of the trained model, which is not in the repository
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(0)
+    X = rng.random((50, len(Config.EXPECTED_FEATURES))).astype(np.float32)
+    model = RandomForestRegressor(n_estimators=2, max_depth=3, random_state=0).fit(X, X[:, 0])
+    path = tmp_path / "model.joblib"
+    joblib.dump(model, path)
+    return str(path)
+
+
+def test_warmup_records_time_to_first_prediction(model_file):
+    report = StartupReport()
+
+    warmup(report, model_files=[model_file])
+
+    assert report.warmup_complete
+    assert report.model_loaded
+    assert report.error is None
+    assert report.time_to_first_prediction > 0
+    assert "pandas" in report.import_times
+    assert set(report.stages) == {"imports", "model_load", "first_prediction"}
+
+
+def test_warmup_missing_model():
+    report = StartupReport()
+
+    warmup(report, model_files=["non_existent_model.joblib"])
+
+    assert report.warmup_complete
+    assert not report.model_loaded
+    assert report.error is not None
@@ -0,0 +1,168 @@
+import json
+import threading
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from monitoring.tracing import (
+    Tracer,
+    current_traceparent,
+    parse_traceparent,
+    span,
+    traced_db,
+    tracing_middleware,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def read_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            request = json.loads(line)
+            for resource_spans in request["resourceSpans"]:
+                for scope_spans in resource_spans["scopeSpans"]:
+                    spans.extend(scope_spans["spans"])
+    return spans
+
+
+def attributes(otlp_span):
+    return {
+        attribute["key"]: next(iter(attribute["value"].values()))
+        for attribute in otlp_span["attributes"]
+    }
+
+
+def file_tracer(tmp_path, sample_ratio=1.0):
+    return Tracer(
+        enabled=True, sample_ratio=sample_ratio, exporter="file", path=str(tmp_path / "traces.jsonl")
+    )
+
+
+def test_parse_traceparent():
+    context = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (TRACE_ID, PARENT_ID, True)
+    assert context.traceparent() == f"00-{TRACE_ID}-{PARENT_ID}-01"
+    assert not parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled
+
+    for invalid in (None, "", "garbage", f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{TRACE_ID}-xyz-01"):
+        assert parse_traceparent(invalid) is None
+
+
+def test_nested_spans_are_exported_as_one_otlp_request(tmp_path):
+    tracer = file_tracer(tmp_path)
+    with patch("monitoring.tracing.tracer", tracer):
+        with span("process", rows=3) as root:
+            with span("process.score") as child:
+                child.set_attribute("bytes", 1024)
+                assert current_traceparent() == child.context.traceparent()
+
+    lines = open(tracer.path).read().splitlines()
+    assert len(lines) == 1
+    spans = {otlp_span["name"]: otlp_span for otlp_span in read_spans(tracer.path)}
+    assert spans["process.score"]["parentSpanId"] == spans["process"]["spanId"]
+    assert spans["process.score"]["traceId"] == spans["process"]["traceId"] == root.context.trace_id
+    assert "parentSpanId" not in spans["process"]
+    assert attributes(spans["process"]) == {"rows": "3"}
+    assert attributes(spans["process.score"]) == {"bytes": "1024"}
+
+
+def test_child_ending_while_the_root_ends_is_not_lost(tmp_path):
+    tracer = file_tracer(tmp_path)
+    paused, resume = threading.Event(), threading.Event()
+
+    class PausingList(list):
+        # Holds the child between its "root still open" check and the append
+        def append(self, item):
+            if item.name == "request.background":
+                paused.set()
+                resume.wait(0.2)
+            super().append(item)
+
+    with patch("monitoring.tracing.tracer", tracer):
+        root = tracer.start_span("request")
+        root.finished = PausingList()
+        with patch("monitoring.tracing._current_span") as current_span:
+            current_span.get.return_value = root
+            child = tracer.start_span("request.background")
+
+        thread = threading.Thread(target=child.end)
+        thread.start()
+        paused.wait(1)
+        root.end()
+        resume.set()
+        thread.join()
+
+    names = [otlp_span["name"] for otlp_span in read_spans(tracer.path)]
+    assert sorted(names) == ["request", "request.background"]
+
+
+def test_remote_sampling_decision_is_kept(tmp_path):
+    tracer = file_tracer(tmp_path, sample_ratio=0.0)
+    with patch("monitoring.tracing.tracer", tracer):
+        # Not sampled locally, but the caller sampled the trace
+        with span("upload", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")):
+            pass
+        # Caller did not sample: nothing is recorded, the decision propagates
+        with span("upload", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")):
+            with span("upload.ingest") as child:
+                assert not child.recording
+                assert current_traceparent().endswith("-00")
+        with span("unsampled root"):
+            pass
+
+    spans = read_spans(tracer.path)
+    assert len(spans) == 1
+    assert spans[0]["traceId"] == TRACE_ID
+    assert spans[0]["parentSpanId"] == PARENT_ID
+
+
+def test_traced_db_records_target_and_errors(tmp_path):
+    @traced_db("postgresql", "table_name")
+    def save(df, db_name, table_name):
+        raise RuntimeError("connection lost")
+
+    tracer = file_tracer(tmp_path)
+    with patch("monitoring.tracing.tracer", tracer):
+        try:
+            save([], "predictions", table_name="predictions")
+        except RuntimeError:
+            pass
+
+    (otlp_span,) = read_spans(tracer.path)
+    assert otlp_span["name"] == "postgresql save"
+    assert otlp_span["kind"] == 3
+    assert attributes(otlp_span) == {
+        "db.system": "postgresql",
+        "db.name": "predictions",
+        "db.sql.table": "predictions",
+    }
+    assert otlp_span["status"] == {"code": 2, "message": "connection lost"}
+    assert otlp_span["events"][0]["name"] == "exception"
+
+
+def test_middleware_continues_incoming_trace(tmp_path):
+    app = FastAPI()
+    app.middleware("http")(tracing_middleware)
+
+    @app.get("/work")
+    async def work():
+        with span("work.stage"):
+            return {"ok": True}
+
+    tracer = file_tracer(tmp_path)
+    with patch("monitoring.tracing.tracer", tracer):
+        response = TestClient(app).get(
+            "/work", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        )
+
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    spans = {otlp_span["name"]: otlp_span for otlp_span in read_spans(tracer.path)}
+    server = spans["GET /work"]
+    assert server["kind"] == 2
+    assert server["parentSpanId"] == PARENT_ID
+    assert attributes(server)["http.response.status_code"] == "200"
+    assert spans["work.stage"]["parentSpanId"] == server["spanId"]
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import threading
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from benchmarks.replay import compare_reports, load_traffic, replay, summarize
+from monitoring.traffic import TrafficCaptureMiddleware, TrafficRecorder
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items(limit: int = 10):
+        return {"items": list(range(limit))}
+
+    @app.post("/api/upload")
+    async def upload(request: Request):
+        return {"bytes": len(await request.body())}
+
+    @app.get("/api/fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    @app.get("/api/health/live")
+    async def live():
+        return {"status": "alive"}
+
+    return app
+
+
+def _recorder(tmp_path, **options):
+    return TrafficRecorder(
+        path=str(tmp_path / "traffic.jsonl"),
+        body_dir=str(tmp_path / "bodies"),
+        **{"max_body_mb": 1, "sample_ratio": 1.0, "exclude": ("/api/health",), **options},
+    )
+
+
+def _captured(recorder):
+    with open(recorder.path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_capture_records_requests_and_stores_bodies(tmp_path):
+    recorder = _recorder(tmp_path)
+    app = _app()
+    app.add_middleware(TrafficCaptureMiddleware, recorder=recorder)
+    client = TestClient(app, raise_server_exceptions=False)
+    body = b"longitude,latitude\n-122.2,37.8\n"
+
+    client.get("/api/items", params={"limit": 3}, headers={"Authorization": "secret"})
+    client.post("/api/upload", content=body, headers={"Content-Type": "text/csv"})
+    client.post("/api/upload", content=body, headers={"Content-Type": "text/csv"})
+    client.get("/api/fail")
+    client.get("/api/health/live")
+
+    get, post, again, failed = _captured(recorder)
+    assert (get["method"], get["path"], get["query"], get["status"]) == (
+        "GET",
+        "/api/items",
+        [["limit", "3"]],
+        200,
+    )
+    assert get["body"] is None
+    assert get["response_bytes"] == len(b'{"items":[0,1,2]}')
+    assert get["duration_ms"] >= 0
+    assert "authorization" not in get["headers"]
+
+    digest = hashlib.sha256(body).hexdigest()
+    assert post["body"] == {"bytes": len(body), "sha256": digest, "file": f"{digest}.body"}
+    assert post["headers"]["content-type"] == "text/csv"
+    assert again["body"] == post["body"]
+    # Stored once per content, with no leftover spool files
+    assert [p.name for p in (tmp_path / "bodies").iterdir()] == [f"{digest}.body"]
+    assert (tmp_path / "bodies" / f"{digest}.body").read_bytes() == body
+
+    assert failed["status"] == 500
+
+
+def test_large_bodies_are_referenced_but_not_stored(tmp_path):
+    recorder = _recorder(tmp_path, max_body_mb=0.001)
+    app = _app()
+    app.add_middleware(TrafficCaptureMiddleware, recorder=recorder)
+    body = b"x" * 5000
+
+    response = TestClient(app).post("/api/upload", content=body)
+
+    assert response.json() == {"bytes": 5000}
+    (entry,) = _captured(recorder)
+    assert entry["body"] == {
+        "bytes": 5000,
+        "sha256": hashlib.sha256(body).hexdigest(),
+        "file": None,
+    }
+    bodies = tmp_path / "bodies"
+    assert not bodies.exists() or list(bodies.iterdir()) == []
+
+
+def test_capture_writes_off_the_event_loop(tmp_path):
+    recorder = _recorder(tmp_path)
+    app = _app()
+    app.add_middleware(TrafficCaptureMiddleware, recorder=recorder)
+    threads = set()
+    open_file = open
+
+    def tracking_open(*args, **kwargs):
+        threads.add(threading.current_thread().name)
+        return open_file(*args, **kwargs)
+
+    with patch("monitoring.traffic.open", tracking_open, create=True):
+        TestClient(app).post("/api/upload", content=b"a,b\n1,2\n")
+
+    # The body spool file and the traffic file are both opened on the writer thread
+    assert len(threads) == 1 and threads.pop().startswith("traffic-capture")
+    assert len(_captured(recorder)) == 1
+
+
+def test_replay_of_captured_traffic(tmp_path):
+    recorder = _recorder(tmp_path)
+    app = _app()
+    app.add_middleware(TrafficCaptureMiddleware, recorder=recorder)
+    client = TestClient(app, raise_server_exceptions=False)
+    for limit in (1, 2, 3):
+        client.get("/api/items", params={"limit": limit})
+    client.post("/api/upload", content=b"a,b\n1,2\n")
+    client.get("/api/fail")
+
+    records, skipped = load_traffic(recorder.path, recorder.body_dir)
+    assert len(records) == 5 and skipped == 0
+    assert len(load_traffic(recorder.path, recorder.body_dir, methods=["GET"])[0]) == 4
+
+    async def run(**pacing):
+        transport = httpx.ASGITransport(app=_app(), raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await replay(http, records, recorder.body_dir, **pacing)
+
+    for pacing in ({"concurrency": 2}, {"rate": 500}, {"speed": 100}):
+        report = summarize(asyncio.run(run(**pacing)), seconds=1.0)
+        assert report["overall"]["requests"] == 5
+        items = report["endpoints"]["GET /api/items"]
+        assert items["requests"] == 3
+        assert items["statuses"] == {"200": 3}
+        assert items["error_rate"] == 0
+        assert items["recorded_latency_ms"]["p50"] is not None
+        assert report["endpoints"]["POST /api/upload"]["statuses"] == {"200": 1}
+        assert report["endpoints"]["GET /api/fail"]["error_rate"] == 1
+
+
+def test_requests_without_stored_body_are_skipped(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    path.write_text(
+        json.dumps({"method": "POST", "path": "/api/upload", "body": {"bytes": 9, "file": None}})
+        + "\n"
+        + json.dumps({"method": "GET", "path": "/api/items", "body": None})
+        + "\n"
+    )
+    records, skipped = load_traffic(str(path), str(tmp_path))
+    assert [record["path"] for record in records] == ["/api/items"]
+    assert skipped == 1
+
+
+def test_compare_reports_flags_regressions():
+    def endpoint(p50, p99, error_rate=0.0):
+        return {"latency_ms": {"p50": p50, "p99": p99}, "error_rate": error_rate}
+
+    previous = {"endpoints": {"GET /a": endpoint(10, 20), "GET /b": endpoint(10, 20)}}
+    report = {
+        "endpoints": {
+            "GET /a": endpoint(11, 30),
+            "GET /b": endpoint(9, 19, error_rate=0.01),
+            "GET /c": endpoint(1, 1),
+        }
+    }
+
+    comparisons = compare_reports(report, previous, tolerance=0.2)
+
+    assert [
+        (c["endpoint"], c["p50_ratio"], c["p99_ratio"], c["regression"]) for c in comparisons
+    ] == [("GET /a", 1.1, 1.5, True), ("GET /b", 0.9, 0.95, True)]
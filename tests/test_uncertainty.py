@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from models.compaction import CompactForest
+from models.uncertainty import (
+    parse_quantiles,
+    predict_all_trees,
+    predict_with_intervals,
+    quantile_column,
+)
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 4)).astype(np.float32)
+    y = X[:, 0] * 3 + rng.normal(size=500)
+    return RandomForestRegressor(n_estimators=15, random_state=0).fit(X, y), X
+
+
+def test_per_tree_outputs_match_trees(forest):
+    model, X = forest
+
+    per_tree = predict_all_trees(model, X)
+
+    assert per_tree.shape == (15, len(X))
+    np.testing.assert_allclose(per_tree[3], model.estimators_[3].predict(X))
+
+
+def test_intervals_from_one_pass(forest, monkeypatch):
+    model, X = forest
+    monkeypatch.setattr("models.uncertainty.PREDICT_BATCH_ROWS", 128)
+
+    columns = predict_with_intervals(model, X, quantiles=(0.05, 0.95), std=True)
+
+    per_tree = np.stack([tree.predict(X) for tree in model.estimators_])
+    np.testing.assert_allclose(columns["predictions"], model.predict(X))
+    np.testing.assert_allclose(columns["prediction_q5"], np.quantile(per_tree, 0.05, axis=0))
+    np.testing.assert_allclose(columns["prediction_std"], per_tree.std(axis=0))
+    assert (columns["prediction_q5"] <= columns["prediction_q95"]).all()
+
+
+def test_intervals_for_compact_forest(forest):
+    model, X = forest
+    compact = CompactForest.from_forest(model)
+
+    columns = predict_with_intervals(compact, X, quantiles=(0.5,))
+
+    np.testing.assert_allclose(columns["predictions"], compact.predict(X), rtol=1e-6)
+    assert set(columns) == {"predictions", "prediction_q50"}
+
+
+def test_quantile_parsing_and_names():
+    assert parse_quantiles("0.05, 0.95") == (0.05, 0.95)
+    assert quantile_column(0.025) == "prediction_q2_5"
+    assert quantile_column(0.5) == "prediction_q50"
+    assert quantile_column(0.0001) == "prediction_q0_01"
+    assert quantile_column(1e-7) == "prediction_q0"
+    with pytest.raises(ValueError):
+        parse_quantiles("5,95")
+    with pytest.raises(ValueError, match="4 decimals"):
+        parse_quantiles("1e-7")
@@ -0,0 +1,198 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from config import Config
+
+
+class AdmissionRejected(HTTPException):
+    """
+    Raised when a request is not admitted. Answered with a `Retry-After` header.
+
+    Attributes:
+        status_code (int): 429 when the queue is full, 503 when the wait timed out.
+        retry_after (int): Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(status_code, detail=message, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency and memory budget for one class of routes.
+
+    A request is admitted while fewer than `max_concurrency` requests of the
+    class run and its estimated memory fits into what is left of
+    `memory_budget_mb`. A request estimated above the whole budget is only
+    admitted when nothing else of its class runs. Others wait in a FIFO queue
+    of at most `max_queue` requests for up to `queue_timeout` seconds.
+    Requests arriving at a full queue are rejected right away with 429; those
+    that time out in the queue are rejected with 503.
+
+    Waiters may live on different event loops (e.g. in tests), so they are
+    woken with `call_soon_threadsafe` and the state is guarded by a thread lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        memory_budget_mb: float = 0,
+        max_queue: int = 8,
+        queue_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.memory_budget_mb = memory_budget_mb
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.active = 0
+        self.reserved_mb = 0.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.max_queue_depth = 0
+        # Moving average of how long admitted requests run, for Retry-After
+        self.avg_seconds = None
+
+    def _cost(self, memory_mb: float) -> float:
+        # Anything larger than the budget takes the whole budget, i.e. runs alone
+        if self.memory_budget_mb:
+            return min(memory_mb, self.memory_budget_mb)
+        return 0.0
+
+    def _fits(self, cost: float) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        return not self.memory_budget_mb or self.reserved_mb + cost <= self.memory_budget_mb
+
+    def _take(self, cost: float):
+        self.active += 1
+        self.reserved_mb += cost
+        self.admitted += 1
+
+    def _release(self, cost: float, seconds: float = None):
+        with self._lock:
+            self.active -= 1
+            self.reserved_mb -= cost
+            if seconds is not None:
+                self.avg_seconds = (
+                    seconds if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * seconds
+                )
+            # Hand the freed capacity to the waiters in arrival order
+            while self._waiters and self._fits(self._waiters[0]["cost"]):
+                waiter = self._waiters.popleft()
+                self._take(waiter["cost"])
+                waiter["granted"] = True
+                waiter["loop"].call_soon_threadsafe(_wake, waiter["future"])
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely to free up, from the average run time.
+        """
+        if self.avg_seconds is None:
+            return 1
+        waves = (len(self._waiters) + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(self.avg_seconds * waves))
+
+    @asynccontextmanager
+    async def admit(self, memory_mb: float = 0):
+        """
+        Hold a slot of this class for the duration of the block.
+
+        Args:
+            memory_mb (float): Estimated peak memory of the request in MB.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out.
+        """
+        cost = self._cost(memory_mb)
+        with self._lock:
+            if not self._waiters and self._fits(cost):
+                self._take(cost)
+                waiter = None
+            elif len(self._waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(
+                    f"Too many '{self.name}' requests queued.", 429, self.retry_after()
+                )
+            else:
+                loop = asyncio.get_running_loop()
+                waiter = {"cost": cost, "future": loop.create_future(), "loop": loop, "granted": False}
+                self._waiters.append(waiter)
+                self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter["future"], self.queue_timeout)
+            except BaseException as e:
+                with self._lock:
+                    granted = waiter["granted"]
+                    if not granted:
+                        self._waiters.remove(waiter)
+                if not granted:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.rejected_timeout += 1
+                        raise AdmissionRejected(
+                            f"Timed out waiting for a '{self.name}' slot.", 503, self.retry_after()
+                        )
+                    raise
+                if not isinstance(e, asyncio.TimeoutError):
+                    # Cancelled right after being granted: give the slot back
+                    self._release(cost)
+                    raise
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(cost, time.monotonic() - start)
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "memory_budget_mb": self.memory_budget_mb,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "reserved_mb": round(self.reserved_mb, 1),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_seconds": None if self.avg_seconds is None else round(self.avg_seconds, 3),
+        }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+admission_controllers = {
+    "upload": AdmissionController(
+        "upload",
+        Config.ADMISSION_UPLOAD_CONCURRENCY,
+        Config.ADMISSION_UPLOAD_MEMORY_MB,
+        Config.ADMISSION_QUEUE_SIZE,
+        Config.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    "process": AdmissionController(
+        "process",
+        Config.ADMISSION_PROCESS_CONCURRENCY,
+        Config.ADMISSION_PROCESS_MEMORY_MB,
+        Config.ADMISSION_QUEUE_SIZE,
+        Config.ADMISSION_QUEUE_TIMEOUT,
+    ),
+}
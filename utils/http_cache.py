@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config import Config
+from utils.cache import LRUCache
+
+# Rendered JSON bodies keyed by endpoint, query parameters and data version.
+# Entries of outdated versions are never hit again and age out of the LRU.
+response_cache = LRUCache(max_size=Config.RESPONSE_CACHE_SIZE)
+
+
+def make_etag(key: tuple) -> str:
+    """
+    Strong ETag of a response, derived from its cache key.
+    """
+    return f'"{hashlib.sha1(repr(key).encode()).hexdigest()[:24]}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches `etag`, using the weak
+    comparison RFC 9110 prescribes for it.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def http_date(moment: datetime) -> str:
+    # Naive timestamps are local time, as written by `datetime.now()`
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def conditional_response(key: tuple, if_none_match, render, last_modified: datetime = None):
+    """
+    Answer a read request from its data version.
+
+    A request whose `If-None-Match` carries the current ETag gets an empty 304.
+    Otherwise the body is served from `response_cache`, and `render` is only
+    called, and its result serialized, when the cache has no entry for `key`.
+    Bodies over `RESPONSE_CACHE_MAX_BODY_KB` are not cached.
+
+    Args:
+        key (tuple): Endpoint, query parameters and data version.
+        if_none_match (str): The request's `If-None-Match` header.
+        render (callable): Returns the JSON content; may raise HTTPException.
+        last_modified (datetime): Time of the last write, sent as `Last-Modified`.
+
+    Returns:
+        Response: 304 or 200 with `ETag` and `Cache-Control: no-cache`, so
+        clients revalidate on every poll.
+    """
+    etag = make_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key)
+    if body is None:
+        body = JSONResponse(jsonable_encoder(render())).body
+        if len(body) <= Config.RESPONSE_CACHE_MAX_BODY_KB * 1024:
+            response_cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,52 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module proxy that defers the real import until an attribute is first accessed.
+
+    Heavy libraries (pandas, sklearn, pymongo, psycopg2) are only needed once a
+    request actually uses them, so importing them at module level slows down
+    process startup for no benefit.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_lazy_name"])
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_lazy_name']}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy for a module that is imported on first attribute access.
+
+    Args:
+        name (str): Fully qualified module name, e.g. "pandas" or "psycopg2.extras".
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the real module.
+    """
+    return LazyModule(name)
@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from config import Config, logger
+from database_handler.db_connector import get_mongo_client
+
+
+class ChangeStreamConsumer:
+    """
+    Background consumer that scores documents as they are inserted into the raw
+    collection.
+
+    It tails a MongoDB change stream (which requires a replica set), collects
+    inserted documents into micro-batches closed by size or age, scores each
+    batch with the in-memory models and bulk-writes it to PostgreSQL. The
+    resume token of the last written event is persisted after every batch, so
+    a restart continues after the last batch that reached PostgreSQL.
+    """
+
+    def __init__(
+        self,
+        db_name: str = Config.MONGO_DB_NAME,
+        collection_name: str = Config.MONGO_COLLECTION,
+        batch_size: int = Config.CHANGE_STREAM_BATCH_SIZE,
+        max_wait_seconds: float = Config.CHANGE_STREAM_MAX_WAIT,
+        state_collection: str = Config.CHANGE_STREAM_STATE_COLLECTION,
+    ):
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.state_collection = state_collection
+        self.state_id = f"{db_name}.{collection_name}"
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_token = None
+        self.metrics = {
+            "running": False,
+            "events_processed": 0,
+            "batches_written": 0,
+            "pending_events": 0,
+            "last_event_time": None,
+            "last_batch_at": None,
+            "lag_seconds": 0.0,
+            "errors": 0,
+            "last_error": None,
+        }
+
+    # Lifecycle
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="change-stream-consumer", daemon=True)
+        self._thread.start()
+        logger.info(f"Change stream consumer started for {self.state_id}")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(f"Change stream consumer stopped for {self.state_id}")
+
+    # Resume token persistence
+    def load_resume_token(self, client):
+        state = client[self.db_name][self.state_collection].find_one({"_id": self.state_id})
+        return state["resume_token"] if state else None
+
+    def save_resume_token(self, client, token):
+        if token == self._saved_token:
+            return
+        client[self.db_name][self.state_collection].update_one(
+            {"_id": self.state_id},
+            {"$set": {"resume_token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        self._saved_token = token
+
+    # Processing
+    def write_batch(self, documents: list):
+        """
+        Score a micro-batch and write it to PostgreSQL.
+        """
+        # Imported here so that the consumer module stays cheap to import
+        from analytics.scoring import score_documents, store_predictions
+
+        store_predictions(score_documents(documents), incremental=True)
+
+    def _update_lag(self, cluster_time):
+        if cluster_time is None:
+            self.metrics["lag_seconds"] = 0.0
+            return
+        event_time = cluster_time.as_datetime()
+        self.metrics["last_event_time"] = event_time.isoformat()
+        self.metrics["lag_seconds"] = max(
+            0.0, (datetime.now(timezone.utc) - event_time).total_seconds()
+        )
+
+    def consume(self, stream, client):
+        """
+        Read events from an open change stream until stopped, flushing batches.
+
+        Args:
+            stream: An open change stream (anything with `try_next`, `alive`
+                and `resume_token`).
+            client: MongoDB client used to persist resume tokens.
+        """
+        batch, batch_started, batch_token, batch_cluster_time = [], None, None, None
+
+        while not self._stop.is_set() and stream.alive:
+            change = stream.try_next()
+            if change is not None:
+                batch.append(change["fullDocument"])
+                batch_token = change["_id"]
+                batch_cluster_time = change.get("clusterTime")
+                batch_started = batch_started or time.monotonic()
+                self.metrics["pending_events"] = len(batch)
+                self._update_lag(batch_cluster_time)
+            elif not batch:
+                # Caught up: advance the stored position past events we do not consume
+                self.metrics["lag_seconds"] = 0.0
+                if stream.resume_token is not None:
+                    self.save_resume_token(client, stream.resume_token)
+
+            batch_full = len(batch) >= self.batch_size
+            batch_old = batch and time.monotonic() - batch_started >= self.max_wait_seconds
+            if batch_full or batch_old:
+                self.write_batch(batch)
+                self.save_resume_token(client, batch_token)
+                self.metrics["events_processed"] += len(batch)
+                self.metrics["batches_written"] += 1
+                self.metrics["last_batch_at"] = datetime.now(timezone.utc).isoformat()
+                self.metrics["pending_events"] = 0
+                logger.info(f"Change stream batch of {len(batch)} documents written.")
+                self._update_lag(batch_cluster_time)
+                batch, batch_started, batch_token, batch_cluster_time = [], None, None, None
+
+    def run(self):
+        self.metrics["running"] = True
+        backoff = 1.0
+        while not self._stop.is_set():
+            client = None
+            try:
+                client = get_mongo_client()
+                collection = client[self.db_name][self.collection_name]
+                with collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=self.load_resume_token(client),
+                    max_await_time_ms=int(self.max_wait_seconds * 1000),
+                ) as stream:
+                    backoff = 1.0
+                    self.consume(stream, client)
+            except Exception as e:
+                # Unwritten events are replayed from the last saved resume token
+                self.metrics["errors"] += 1
+                self.metrics["last_error"] = str(e)
+                logger.error(f"Change stream consumer error, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if client is not None:
+                    client.close()
+        self.metrics["running"] = False
+
+
+change_stream_consumer = ChangeStreamConsumer()